@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import threading
+from relogio import RelogioReal
+from logs import obter_logger
+
+log = obter_logger(__name__)
+
+class TarefaAgendada:
+    """
+    Evento agendado; cancelar() impede a execução sem precisar retirá-lo do heap
+    """
+    __slots__ = ('instante', 'funcao', 'args', 'cancelada')
+
+    def __init__(self, instante, funcao, args):
+        self.instante = instante
+        self.funcao = funcao
+        self.args = args
+        self.cancelada = False
+
+    def cancelar(self):
+        self.cancelada = True
+
+class Agendador:
+    """
+    Agendador único (heap de eventos) para os sorteios e contagens de todas as partidas
+
+    Uma só thread dorme até o próximo evento, em vez de uma thread ou greenlet
+    por partida acordando periodicamente para checar flags. As funções agendadas
+    rodam na thread do agendador e devem ser curtas (sem esperar pela rede).
+
+    Com um RelogioVirtual, a espera pelo próximo evento é um salto do relógio;
+    sem thread (thread=False), executar_pendentes() roda os eventos na thread atual.
+    """
+    def __init__(self, relogio=None, thread=True):
+        # Relógio usado nos instantes e nas esperas (RelogioReal ou RelogioVirtual)
+        self.relogio = relogio or RelogioReal()
+        self.usar_thread = thread
+
+        # Heap de (instante, sequência, tarefa); a sequência desempata eventos no mesmo instante
+        self.eventos = []
+        self.sequencia = itertools.count()
+        self.canceladas = 0
+
+        self.condicao = threading.Condition()
+        self.ativo = True
+
+        # A thread só é criada no primeiro agendamento
+        self.thread = None
+
+        # Histograma (metricas.Histograma) do atraso de cada tarefa em relação ao instante marcado, se houver
+        self.atraso = None
+
+    def agendar(self, atraso, funcao, *args):
+        """
+        Agenda uma função para daqui a `atraso` segundos
+
+        :return: TarefaAgendada, que pode ser cancelada
+        """
+        tarefa = TarefaAgendada(self.relogio.agora() + atraso, funcao, args)
+        with self.condicao:
+            if self.thread is None and self.usar_thread:
+                self.thread = threading.Thread(target=self.executar)
+                self.thread.daemon = True
+                self.thread.start()
+
+            heapq.heappush(self.eventos, (tarefa.instante, next(self.sequencia), tarefa))
+            # Só acorda a thread se o novo evento passou a ser o próximo
+            if self.eventos[0][2] is tarefa:
+                self.condicao.notify()
+        return tarefa
+
+    def cancelar(self, tarefa):
+        """
+        Cancela uma tarefa; o heap é compactado quando acumula muitas canceladas
+        """
+        if tarefa is None or tarefa.cancelada:
+            return
+        tarefa.cancelar()
+        with self.condicao:
+            self.canceladas += 1
+            if self.canceladas > 64 and self.canceladas > len(self.eventos) // 2:
+                self.eventos = [evento for evento in self.eventos if not evento[2].cancelada]
+                heapq.heapify(self.eventos)
+                self.canceladas = 0
+
+    def proximas_tarefas(self):
+        """
+        Espera até haver tarefas vencidas e as retira do heap
+
+        :return: Lista de tarefas a executar, ou None se o agendador foi encerrado
+        """
+        with self.condicao:
+            while self.ativo:
+                agora = self.relogio.agora()
+                vencidas = []
+                while self.eventos and self.eventos[0][0] <= agora:
+                    tarefa = heapq.heappop(self.eventos)[2]
+                    if tarefa.cancelada:
+                        self.canceladas = max(0, self.canceladas - 1)
+                    else:
+                        vencidas.append(tarefa)
+                if vencidas:
+                    return vencidas
+
+                espera = self.eventos[0][0] - agora if self.eventos else None
+                self.relogio.esperar(self.condicao, espera)
+            return None
+
+    def executar(self):
+        """
+        Loop da thread do agendador
+        """
+        while True:
+            tarefas = self.proximas_tarefas()
+            if tarefas is None:
+                return
+            for tarefa in tarefas:
+                # Pode ter sido cancelada por uma tarefa do mesmo lote
+                if not tarefa.cancelada:
+                    if self.atraso is not None:
+                        self.atraso.observar(self.relogio.agora() - tarefa.instante)
+                    self.executar_tarefa(tarefa)
+
+    def executar_tarefa(self, tarefa):
+        try:
+            tarefa.funcao(*tarefa.args)
+        except Exception:
+            log.exception("Erro em tarefa agendada", evento="erro_tarefa", tarefa=getattr(tarefa.funcao, '__name__', tarefa.funcao))
+
+    def executar_pendentes(self, limite=None):
+        """
+        Executa na thread atual todos os eventos, em ordem, saltando o relógio virtual até cada um
+
+        Inclui os eventos agendados pelas próprias tarefas; termina quando o heap esvazia.
+
+        :param limite: Máximo de tarefas a executar (None = sem limite)
+        :return: Quantidade de tarefas executadas
+        """
+        if not self.relogio.virtual or self.thread is not None:
+            raise RuntimeError("executar_pendentes exige relógio virtual e agendador sem thread")
+
+        executadas = 0
+        while limite is None or executadas < limite:
+            with self.condicao:
+                if not self.eventos:
+                    break
+                instante, _, tarefa = heapq.heappop(self.eventos)
+                if tarefa.cancelada:
+                    self.canceladas = max(0, self.canceladas - 1)
+                    continue
+            self.relogio.avancar_para(instante)
+            self.executar_tarefa(tarefa)
+            executadas += 1
+        return executadas
+
+    def encerrar(self):
+        """
+        Para a thread do agendador, descartando os eventos pendentes
+        """
+        with self.condicao:
+            self.ativo = False
+            self.eventos.clear()
+            self.condicao.notify()
@@ -4,109 +4,488 @@ import eventlet
 
 eventlet.monkey_patch()
 
-from flask import Flask, render_template, request, session, redirect, url_for
+import hashlib
+import os
+import sys
+from flask import Flask, Response, abort, render_template, request, session, redirect, url_for
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import random
 import string
-from cartela import GerenciadorCartelas
+from cartela import GerenciadorCartelas, PoolCartelas, BIT_CENTRO, MASCARA_COMPLETA
+from motor import MotorSala
+from padroes import RegistroPadroes, PADRAO_PADRAO
+from agendador import Agendador
+from relogio import RelogioParede
+from estado import criar_estado, normalizar_tipo_sala, ImpressoesSala, TIPOS_SALA
+from lobby import IndiceLobby, LIMITE_PAGINA
+from registro_eventos import RegistroEventos, nova_semente, ordem_sorteio
+from protocolo import nome_valido
+from metricas import MetricasBingo, TIPO_CONTEUDO
+from logs import obter_logger, configurar_logs
+from perfil import token_admin_valido, iniciar_perfil_de_parametros, PerfilEmAndamento
 import time
 
+# Logs estruturados em fila, escritos por uma thread própria (ver logs.py)
+configurar_logs()
+log = obter_logger(__name__)
+
+# BINGO_LOG_SOCKETIO=1 liga os logs (muito verbosos) do Socket.IO e do Engine.IO
+log_socketio = os.environ.get("BINGO_LOG_SOCKETIO") == "1"
+
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "bingo_secret_key"
 socketio = SocketIO(
     app,
     async_mode="eventlet",
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True,
+    logger=log_socketio,
+    engineio_logger=log_socketio,
+    # Fila de mensagens compartilhada pelos workers (ex.: redis://localhost:6379/0),
+    # para que um emit para uma sala chegue aos clientes conectados em qualquer worker
+    message_queue=os.environ.get("BINGO_FILA_MENSAGENS"),
 )
 
-# Dicionário para armazenar as partidas ativas
-partidas = {}  # Partidas da Sala Particular
-partidas_sala_2 = {}  # Partidas da Sala Pública
+# Estado das partidas ('1' = Sala Particular, '2' = Sala Pública) e das cartelas dos jogadores.
+# BINGO_ESTADO escolhe o backend: memoria (padrão, um worker), sqlite:///arquivo.db
+# (workers na mesma máquina) ou redis://host:porta/banco (workers em várias máquinas)
+estado = criar_estado(os.environ.get("BINGO_ESTADO"))
 
-# Dicionário para armazenar os gerenciadores de cartelas dos jogadores
-gerenciadores_cartelas = {}
+# Pool de cartelas pré-geradas, reabastecido em segundo plano
+pool_cartelas = PoolCartelas()
 tempo_da_contagem = 60  # Tempo de contagem em segundos
 
-def iniciar_jogo(codigo, tipo_sala="1"):
-    """Função auxiliar para iniciar o jogo"""
-    print(f"Iniciando jogo na sala {codigo}")
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
+# Motores de detecção de vencedores das salas em jogo, neste processo ((tipo_sala, codigo) -> MotorSala)
+motores = {}
+
+# Métricas deste worker, servidas em /metrics
+metricas = MetricasBingo()
+espera_lock_estado = metricas.histograma(
+    "bingo_espera_lock_estado_segundos",
+    "Espera pelas travas do estado (a de cada sala e a global do lobby)",
+)
+estado.espera = espera_lock_estado
+
+# Clientes Socket.IO conectados a este worker
+conexoes = 0
+
+# Agendador único para sorteios e contagens de todas as salas; o atraso das
+# tarefas em relação ao instante marcado é o lag do loop de eventos. O relógio
+# dele é a fonte de "agora" do app inteiro (ver usar_relogio)
+agendador = Agendador(RelogioParede())
+agendador.atraso = metricas.atraso_agendador
+
+# Intervalo da tarefa que mantém a medição do lag mesmo sem salas em jogo
+INTERVALO_SONDA_LOOP = 1.0
+
+# Próximo evento agendado de cada sala neste processo ((tipo_sala, codigo) -> TarefaAgendada)
+tarefas_salas = {}
+
+# Sala do Socket.IO dos clientes inscritos no lobby das Salas Públicas
+SALA_LOBBY = "lobby_publico"
+
+
+def agora():
+    """Instante atual no relógio do agendador"""
+    return agendador.relogio.agora()
+
+
+# Índice das Salas Públicas abertas, para as consultas paginadas do lobby.
+# Os instantes das salas (criada_em, fim_contagem) são do relógio do agendador,
+# de parede por padrão, comparáveis entre workers
+indice_lobby = IndiceLobby(relogio=agora)
+
+# Com estado compartilhado, o índice deste worker é reconstruído a partir do
+# estado no máximo a cada INTERVALO_RECARGA_LOBBY segundos
+INTERVALO_RECARGA_LOBBY = 1.0
+ultima_recarga_lobby = None
+
+# Registro binário de eventos das partidas, se BINGO_REGISTRO estiver definido
+# (com vários workers, use {pid} no caminho: um arquivo por worker, combinados por reproducao.py)
+registro = RegistroEventos.do_ambiente()
+
+# Eventos recentes guardados em cada sala ("eventos", com o número de sequência em
+# "sequencia"), para reenviar a quem reconecta só o que perdeu
+TAMANHO_FLUXO_SALA = 64
+
+
+def resumo_lobby(codigo, tipo_sala, partida):
+    """Resumo da sala como aparece no lobby, ou None se ela não aparece lá
+
+    Só as Salas Públicas aguardando jogadores ou em contagem aparecem no lobby.
+    """
+    if (
+        partida is None
+        or normalizar_tipo_sala(tipo_sala) != "2"
+        or partida["estado"] not in ("aguardando", "contagem")
+    ):
+        return None
+    return {
+        "codigo": codigo,
+        "jogadores": len(partida["jogadores"]),
+        "estado": partida["estado"],
+        "criada_em": partida.get("criada_em"),
+        "fim_contagem": partida.get("fim_contagem"),
+    }
 
-    if codigo not in partidas_dict:
-        print(f"Partida {codigo} não existe mais")
+
+def indexar_lobby(codigo, resumo):
+    """Reflete o resumo da sala (ou a saída dela do lobby) no índice"""
+    if resumo is None:
+        indice_lobby.remover(codigo)
+    else:
+        indice_lobby.atualizar(
+            codigo,
+            resumo["jogadores"],
+            resumo["estado"],
+            fim_contagem=resumo["fim_contagem"],
+            criacao=resumo["criada_em"],
+        )
+
+
+def publicar_lobby(codigo, antes, depois):
+    """Envia ao lobby apenas a diferença entre dois resumos da sala
+
+    Chamada dentro da transação que alterou a sala; toma a trava global, a mesma
+    de inscrever_lobby, para que os deltas nunca saiam antes do snapshot de um
+    novo inscrito.
+    """
+    if antes == depois:
         return
+    with estado.transacao():
+        indexar_lobby(codigo, depois)
+        if depois is None:
+            socketio.emit("lobby_sala_removida", {"codigo": codigo}, room=SALA_LOBBY)
+        elif antes is None:
+            socketio.emit("lobby_sala_adicionada", depois, room=SALA_LOBBY)
+        else:
+            # Só os campos que mudaram (quantidade de jogadores e/ou estado)
+            delta = {
+                chave: valor
+                for chave, valor in depois.items()
+                if antes.get(chave) != valor
+            }
+            delta["codigo"] = codigo
+            socketio.emit("lobby_sala_atualizada", delta, room=SALA_LOBBY)
+
+
+def obter_motor(codigo, tipo_sala, partida):
+    """Motor da sala neste processo, reconstruído a partir do estado se necessário
+
+    Com vários workers, o jogo pode ter começado em outro processo: o motor é
+    montado com as cartelas dos jogadores e recebe os sorteios que ainda não viu.
+    """
+    motor = motores.get((tipo_sala, codigo))
+    if motor is None:
+        motor = MotorSala(padroes=RegistroPadroes(partida["padroes"]))
+        for nome_jogador in partida["jogadores"]:
+            gerenciador = estado.obter_cartelas(nome_jogador)
+            if gerenciador:
+                motor.adicionar_jogador(nome_jogador, gerenciador)
+        motores[(tipo_sala, codigo)] = motor
+
+    for numero in partida["numeros_sorteados"][motor.total_sorteados:]:
+        motor.sortear(numero)
+    return motor
+
+
+def sala_do_jogador(nome_jogador, tipo_sala):
+    """Sala atual do jogador, pelo índice reverso jogador -> sala do estado
+
+    Retorna (codigo, partida), ou (None, None) se o jogador não está em nenhuma sala do tipo.
+    """
+    codigo = estado.obter_sala_jogador(tipo_sala, nome_jogador)
+    if codigo is None:
+        return None, None
+    partida = estado.obter_sala(tipo_sala, codigo)
+    if partida is None or nome_jogador not in partida["jogadores"]:
+        return None, None
+    return codigo, partida
+
+
+def remover_sala(codigo, tipo_sala, sala):
+    """Remove a sala do estado junto com as entradas dos seus jogadores no índice reverso"""
+    for nome_jogador in sala["jogadores"]:
+        estado.remover_sala_jogador(tipo_sala, nome_jogador, codigo)
+    estado.remover_sala(tipo_sala, codigo)
+
+
+def emitir_cartelas(codigo, tipo_sala):
+    """Cartelas de um novo jogador, sem repetir nenhuma cartela em jogo na sala
+
+    As impressões digitais das cartelas da sala ficam em um conjunto no estado, para
+    valerem entre workers; cada cartela nova custa uma consulta e um acréscimo.
+    """
+    return GerenciadorCartelas(
+        pool_cartelas, emitidas=ImpressoesSala(estado, tipo_sala, codigo)
+    )
 
-    partida = partidas_dict[codigo]
 
-    # Muda o estado para em_andamento e limpa os números sorteados
-    partida["estado"] = "em_andamento"
-    partida["numeros_sorteados"] = []
-    partida["vencedor"] = None
+def registrar_evento_sala(sala, evento, dados=None):
+    """Numera um evento da sala e o guarda no buffer circular de eventos recentes
 
-    # Notifica todos os jogadores que o jogo começou
-    socketio.emit("jogo_iniciado", room=codigo)
-    socketio.emit(
-        "atualizar_estado",
-        {"estado": "em_andamento", "mensagem": "O jogo começou! Boa sorte!"},
-        room=codigo,
+    Chamado com a sala carregada na transação, antes de salvá-la; o evento é emitido
+    depois, por emitir_eventos_sala. Eventos de estado completo ou passageiro
+    (atualizar_jogadores, atualizar_contagem) ficam fora do fluxo.
+
+    :return: (evento, dados com o número de sequência em "seq")
+    """
+    sala["sequencia"] = sala.get("sequencia", 0) + 1
+    dados = dict(dados or {}, seq=sala["sequencia"])
+    eventos = sala.setdefault("eventos", [])
+    eventos.append([evento, dados])
+    del eventos[:-TAMANHO_FLUXO_SALA]
+    return evento, dados
+
+
+def emitir_eventos_sala(codigo, *eventos):
+    """Emite para a sala eventos numerados por registrar_evento_sala"""
+    inicio = time.perf_counter()
+    for evento, dados in eventos:
+        socketio.emit(evento, dados, room=codigo)
+    metricas.difusao.observar(time.perf_counter() - inicio)
+
+
+def snapshot_sala(sala):
+    """Estado compacto da sala, para quem não pode recuperar só os eventos perdidos"""
+    snapshot = {
+        "seq": sala.get("sequencia", 0),
+        "estado": sala["estado"],
+        "jogadores": sala["jogadores"],
+        "numeros_sorteados": sala["numeros_sorteados"],
+        "vencedor": sala.get("vencedor"),
+    }
+    if sala["estado"] == "contagem" and sala.get("fim_contagem"):
+        snapshot["contagem"] = max(0, round(sala["fim_contagem"] - agora()))
+    return snapshot
+
+
+def registrar_entrada(codigo, nome_jogador, gerenciador):
+    """Registra a entrada do jogador e suas cartelas no registro de eventos, se houver"""
+    if registro:
+        registro.entrada(codigo, nome_jogador)
+        for indice, cartela in enumerate(gerenciador.cartelas):
+            registro.cartela(codigo, nome_jogador, indice, cartela)
+
+
+def cancelar_tarefa_sala(codigo, tipo_sala="1"):
+    """Cancela o próximo sorteio ou passo de contagem da sala"""
+    agendador.cancelar(tarefas_salas.pop((tipo_sala, codigo), None))
+
+
+def agendar_tarefa_sala(codigo, tipo_sala, atraso, funcao, *args):
+    """Agenda a próxima tarefa da sala, cancelando a que estiver no lugar dela"""
+    cancelar_tarefa_sala(codigo, tipo_sala)
+    tarefas_salas[(tipo_sala, codigo)] = agendador.agendar(
+        atraso, funcao, codigo, tipo_sala, *args
     )
 
-    # Inicia o sorteio de números em uma nova thread
-    eventlet.spawn(sortear_numeros, codigo, tipo_sala)
 
+def liberar_tarefa_sala(codigo, tipo_sala, funcao):
+    """Esquece a tarefa da sala que terminou, se outra ainda não a substituiu"""
+    tarefa = tarefas_salas.get((tipo_sala, codigo))
+    if tarefa is not None and tarefa.funcao is funcao:
+        del tarefas_salas[(tipo_sala, codigo)]
 
-def sortear_numeros(codigo, tipo_sala="1"):
-    """Função auxiliar para sortear números"""
-    print(f"Iniciando sorteio de números na sala {codigo}")
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
 
-    if codigo not in partidas_dict:
-        print(f"Partida {codigo} não existe mais")
-        return
+def iniciar_jogo(codigo, tipo_sala="1"):
+    """Função auxiliar para iniciar o jogo
+
+    :return: True se o jogo foi iniciado; False se a sala não existe ou já começou
+    """
+    with estado.transacao(tipo_sala, codigo):
+        partida = estado.obter_sala(tipo_sala, codigo)
+        if partida is None:
+            log.info("Sala não existe mais", sala=codigo, evento="inicio")
+            return False
+
+        # Só um início vale: dois pedidos (ou o pedido e o fim da contagem) disputam a transação
+        if partida["estado"] not in ("aguardando", "contagem"):
+            log.info("Jogo já iniciado", sala=codigo, evento="inicio")
+            return False
+
+        # Muda o estado para em_andamento e limpa os números sorteados
+        antes = resumo_lobby(codigo, tipo_sala, partida)
+        partida["estado"] = "em_andamento"
+        partida["numeros_sorteados"] = []
+        partida["vencedor"] = None
+        # Salas criadas antes das sementes recebem uma agora
+        semente = partida.setdefault("semente", nova_semente())
+        eventos = [
+            registrar_evento_sala(partida, "jogo_iniciado"),
+            registrar_evento_sala(
+                partida,
+                "atualizar_estado",
+                {"estado": "em_andamento", "mensagem": "O jogo começou! Boa sorte!"},
+            ),
+        ]
+        estado.salvar_sala(tipo_sala, codigo, partida)
+
+        # A sala deixa de aparecer no lobby
+        publicar_lobby(codigo, antes, None)
+
+        # Registra todas as cartelas da sala no motor de detecção de vencedores
+        motores.pop((tipo_sala, codigo), None)
+        obter_motor(codigo, tipo_sala, partida)
+
+    # Notifica todos os jogadores que o jogo começou
+    emitir_eventos_sala(codigo, *eventos)
 
-    numeros_disponiveis = list(range(1, 76))
-    random.shuffle(numeros_disponiveis)
+    # Agenda o primeiro sorteio de números, na ordem derivada da semente da sala
+    # (invertida, pois os números saem do fim), no lugar da contagem, se houver
+    numeros_disponiveis = ordem_sorteio(semente)[::-1]
+    log.info("Iniciando sorteio", sala=codigo, evento="inicio", tipo_sala=tipo_sala)
+    agendar_tarefa_sala(codigo, tipo_sala, 0, sortear_numeros, numeros_disponiveis)
+    return True
+
+
+def sortear_numeros(codigo, tipo_sala="1", numeros_disponiveis=None):
+    """Sorteia um número e agenda o próximo sorteio para daqui a 3 segundos"""
+    with estado.transacao(tipo_sala, codigo):
+        partida = estado.obter_sala(tipo_sala, codigo)
 
-    for numero in numeros_disponiveis:
         # Verifica se a partida ainda existe e está em andamento
         if (
-            codigo not in partidas_dict
-            or partidas_dict[codigo]["estado"] != "em_andamento"
+            partida is None
+            or partida["estado"] != "em_andamento"
+            or not numeros_disponiveis
         ):
-            print(f"Partida {codigo} finalizada ou não existe mais")
-            break
+            log.info(
+                "Sala finalizada ou não existe mais", sala=codigo, evento="fim_sorteio"
+            )
+            liberar_tarefa_sala(codigo, tipo_sala, sortear_numeros)
+            return
 
-        print(f"Sorteando número {numero} na sala {codigo}")
-        partidas_dict[codigo]["numeros_sorteados"].append(numero)
-        socketio.emit("numero_sorteado", {"numero": numero}, room=codigo)
+        motor = obter_motor(codigo, tipo_sala, partida)
 
-        eventlet.sleep(3)  # Espera 3 segundos entre os sorteios
+        numero = numeros_disponiveis.pop()
+        partida["numeros_sorteados"].append(numero)
+        log.info(
+            "Número sorteado",
+            sala=codigo,
+            evento="sorteio",
+            numero=numero,
+            sorteados=len(partida["numeros_sorteados"]),
+        )
+        evento = registrar_evento_sala(partida, "numero_sorteado", {"numero": numero})
+        estado.salvar_sala(tipo_sala, codigo, partida)
+        if registro:
+            registro.sorteio(codigo, numero)
+        metricas.sorteios.incrementar()
+
+        # Marca o número em todas as cartelas da sala
+        for vencedor in motor.sortear(numero):
+            log.info(
+                "Cartela completa", sala=codigo, jogador=vencedor, evento="cartela_completa"
+            )
 
+    emitir_eventos_sala(codigo, evento)
 
-def contagem_regressiva(codigo, tipo_sala="1"):
-    """Função auxiliar para contagem regressiva"""
-    print(f"Iniciando contagem regressiva na sala {codigo}")
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
+    # Espera 3 segundos entre os sorteios
+    agendar_tarefa_sala(codigo, tipo_sala, 3, sortear_numeros, numeros_disponiveis)
 
-    for i in range(tempo_da_contagem, -1, -1):
-        if codigo not in partidas_dict:
-            print(f"Partida {codigo} não existe mais")
-            return
-        if partidas_dict[codigo]["estado"] != "contagem":
-            print(f"Partida {codigo} não está mais em contagem")
-            return
 
-        print(f"Contagem {i} segundos na sala {codigo}")
-        socketio.emit("atualizar_contagem", {"segundos": i}, room=codigo)
+def contagem_regressiva(codigo, tipo_sala="1", segundos=None):
+    """Um passo da contagem regressiva; agenda o próximo para daqui a 1 segundo"""
+    if segundos is None:
+        log.info("Iniciando contagem regressiva", sala=codigo, evento="inicio_contagem")
+        segundos = tempo_da_contagem
 
-        if i == 0:
-            print(f"Contagem finalizada, iniciando jogo na sala {codigo}")
-            iniciar_jogo(codigo, tipo_sala)  # Chama a função que inicia o jogo
-            return
+    partida = estado.obter_sala(tipo_sala, codigo)
+    if partida is None:
+        log.info("Sala não existe mais", sala=codigo, evento="contagem_interrompida")
+        liberar_tarefa_sala(codigo, tipo_sala, contagem_regressiva)
+        return
+    if partida["estado"] != "contagem":
+        log.info(
+            "Sala não está mais em contagem",
+            sala=codigo,
+            evento="contagem_interrompida",
+        )
+        # Um início manual já pode ter posto o sorteio no lugar desta tarefa
+        liberar_tarefa_sala(codigo, tipo_sala, contagem_regressiva)
+        return
 
-        eventlet.sleep(1)
+    log.info("Contagem regressiva", sala=codigo, evento="contagem", restantes=segundos)
+    socketio.emit("atualizar_contagem", {"segundos": segundos}, room=codigo)
+
+    if segundos == 0:
+        log.info(
+            "Contagem finalizada, iniciando o jogo", sala=codigo, evento="fim_contagem"
+        )
+        iniciar_jogo(codigo, tipo_sala)  # Chama a função que inicia o jogo
+        return
+
+    agendar_tarefa_sala(codigo, tipo_sala, 1, contagem_regressiva, segundos - 1)
+
+
+def contar_salas_por_estado():
+    """Salas de cada estado, percorrendo o estado a cada leitura das métricas"""
+    estados = {"aguardando": 0, "contagem": 0, "em_andamento": 0, "finalizado": 0}
+    for tipo_sala in TIPOS_SALA:
+        for _, sala in estado.listar_salas(tipo_sala):
+            estados[sala["estado"]] = estados.get(sala["estado"], 0) + 1
+    return estados
+
+
+def sondar_loop():
+    """Tarefa periódica vazia: o agendador mede o atraso dela como o das demais"""
+    agendador.agendar(INTERVALO_SONDA_LOOP, sondar_loop)
+
+
+metricas.medidor("bingo_salas", "Salas por estado", contar_salas_por_estado, rotulo="estado")
+metricas.medidor("bingo_jogadores_conectados", "Clientes Socket.IO conectados a este worker", lambda: conexoes)
+agendador.agendar(INTERVALO_SONDA_LOOP, sondar_loop)
+
+
+def usar_relogio(relogio, thread=True):
+    """
+    Troca o relógio do app (ex.: um RelogioVirtual em testes e simulações)
+
+    O agendador atual é encerrado com os eventos pendentes; use antes de criar
+    salas. Com thread=False, os eventos rodam em agendador.executar_pendentes().
+    """
+    global agendador, ultima_recarga_lobby
+    agendador.encerrar()
+    tarefas_salas.clear()
+    agendador = Agendador(relogio, thread=thread)
+    agendador.atraso = metricas.atraso_agendador
+    ultima_recarga_lobby = None
+
+    # A sonda mede o lag do loop de eventos, que só existe no tempo real
+    if not relogio.virtual:
+        agendador.agendar(INTERVALO_SONDA_LOOP, sondar_loop)
+
+
+@app.route("/metrics")
+def exportar_metricas():
+    """Métricas do worker no formato de texto do Prometheus"""
+    return Response(metricas.texto(), content_type=TIPO_CONTEUDO)
+
+
+@app.route("/admin/perfil", methods=["POST"])
+def perfil_cpu():
+    """Inicia um perfil de CPU por amostragem de uma sala e/ou de funções do app
+
+    Parâmetros: funcoes (ex.: handle_bingo,entrar_partida), sala, segundos e formato
+    (colapsado ou pstats). O cabeçalho X-Token-Admin deve ser o BINGO_TOKEN_ADMIN;
+    sem a variável, a rota responde 404. O arquivo é gravado ao fim do perfil.
+    """
+    if not token_admin_valido(request.headers.get("X-Token-Admin")):
+        abort(404)
+    try:
+        arquivo = iniciar_perfil_de_parametros(request.values, sys.modules[__name__])
+    except PerfilEmAndamento as e:
+        return {"erro": str(e)}, 409
+    except ValueError as e:
+        return {"erro": str(e)}, 400
+    log.info(
+        "Perfil de CPU iniciado",
+        sala=request.values.get("sala"),
+        evento="perfil",
+        arquivo=arquivo,
+        funcoes=request.values.get("funcoes"),
+    )
+    return {"arquivo": arquivo}, 202
 
 
 @app.route("/")
@@ -121,7 +500,8 @@ def jogar():
         tipo_sala = request.form.get(
             "tipo_sala", "1"
         )  # '1' para Sala Particular, '2' para Sala Pública
-        if not nome_jogador:
+        # Nomes longos demais não cabem no registro de eventos das partidas
+        if not nome_jogador or not nome_valido(nome_jogador):
             return redirect(url_for("index"))
 
         session["nome_jogador"] = nome_jogador
@@ -139,45 +519,76 @@ def partida(codigo):
         return redirect(url_for("index"))
 
     tipo_sala = session.get("tipo_sala", "1")
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
+    sala = estado.obter_sala(tipo_sala, codigo)
 
-    if codigo not in partidas_dict:
+    if sala is None:
         return redirect(url_for("jogar"))
 
     return render_template(
-        "partida.html", codigo=codigo, nome_jogador=session["nome_jogador"]
+        "partida.html",
+        codigo=codigo,
+        nome_jogador=session["nome_jogador"],
+        mascaras_padroes=RegistroPadroes(sala["padroes"]).mascaras_ativas,
     )
 
 
 @socketio.on("connect")
 def handle_connect():
-    print(f"Cliente conectado: {request.sid}")
+    global conexoes
+    conexoes += 1
+    log.debug("Cliente conectado", evento="conexao", sid=request.sid)
     # Se o jogador já estava em uma partida, reconecta à sala
     nome_jogador = session.get("nome_jogador")
     tipo_sala = session.get("tipo_sala", "1")
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
 
+    # O que o cliente perdeu é reenviado só a ele, em sincronizar_sala
     if nome_jogador:
-        for codigo, partida in partidas_dict.items():
-            if nome_jogador in partida["jogadores"]:
-                join_room(codigo)
-                print(f"Reconectando {nome_jogador} à sala {codigo}")
-                # Reenvia o estado atual da partida
-                emit("jogador_entrou", {"nome": nome_jogador}, room=codigo)
-                if partida["estado"] == "contagem":
-                    emit("iniciar_contagem", room=codigo)
-                elif partida["estado"] == "em_andamento":
-                    emit("jogo_iniciado", room=codigo)
-                break
+        codigo, _ = sala_do_jogador(nome_jogador, tipo_sala)
+        if codigo is not None:
+            join_room(codigo)
+            log.info(
+                "Jogador reconectado",
+                sala=codigo,
+                jogador=nome_jogador,
+                evento="reconexao",
+            )
+
+
+@socketio.on("sincronizar_sala")
+def sincronizar_sala(data=None):
+    """Reenvia ao cliente os eventos da sala posteriores ao último que ele viu
+
+    Se o último evento visto já saiu do buffer da sala (ou é a primeira conexão da
+    página), o cliente recebe um snapshot da sala no lugar dos eventos.
+    """
+    nome_jogador = session.get("nome_jogador")
+    tipo_sala = session.get("tipo_sala", "1")
+    if not nome_jogador:
+        return
+
+    codigo, sala = sala_do_jogador(nome_jogador, tipo_sala)
+    if codigo is None or (data or {}).get("codigo", codigo) != codigo:
+        return
+
+    # O buffer guarda os eventos de (atual - len(eventos) + 1) até atual
+    visto = (data or {}).get("seq")
+    atual = sala.get("sequencia", 0)
+    eventos = sala.get("eventos", [])
+    if isinstance(visto, int) and atual - len(eventos) <= visto <= atual:
+        emit("eventos_sala", {"eventos": eventos[len(eventos) - (atual - visto):]})
+    else:
+        emit("snapshot_sala", snapshot_sala(sala))
 
 
 @socketio.on("disconnect")
 def handle_disconnect():
-    print(f"Cliente desconectado: {request.sid}")
+    global conexoes
+    conexoes -= 1
+    log.debug("Cliente desconectado", evento="desconexao", sid=request.sid)
 
 
 @socketio.on("criar_partida")
-def criar_partida():
+def criar_partida(data=None):
     nome_jogador = session.get("nome_jogador")
     tipo_sala = session.get("tipo_sala", "1")
 
@@ -185,43 +596,73 @@ def criar_partida():
         emit("erro", {"mensagem": "Nome do jogador não encontrado"})
         return
 
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
+    # Padrões que valem como bingo na partida
+    padroes = (data or {}).get("padroes") or [PADRAO_PADRAO]
+    if isinstance(padroes, str):
+        padroes = [padroes]
+    try:
+        RegistroPadroes(padroes)
+    except ValueError as e:
+        emit("erro", {"mensagem": str(e)})
+        return
 
     # Verifica se o jogador já está em alguma partida
-    for codigo_partida, partida in partidas_dict.items():
-        if nome_jogador in partida["jogadores"]:
-            if partida["estado"] == "aguardando":
-                join_room(codigo_partida)
-                emit("partida_criada", {"codigo": codigo_partida})
-                emit("jogador_entrou", {"nome": nome_jogador}, room=codigo_partida)
-                return
-            else:
-                emit("erro", {"mensagem": "Você já está em uma partida em andamento"})
-                return
+    codigo_partida, partida = sala_do_jogador(nome_jogador, tipo_sala)
+    if codigo_partida is not None:
+        # O jogador já está na sala: nenhum evento novo para os outros jogadores,
+        # só o código para ele voltar a ela
+        if partida["estado"] == "aguardando":
+            join_room(codigo_partida)
+            emit("partida_criada", {"codigo": codigo_partida})
+        else:
+            emit("erro", {"mensagem": "Você já está em uma partida em andamento"})
+        return
 
     # Gera um código único para a partida
     codigo = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    while codigo in partidas_dict:
+    while estado.obter_sala(tipo_sala, codigo) is not None:
         codigo = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
-    print(f"Criando nova partida com código {codigo}")
-
-    # Inicializa a partida
-    partidas_dict[codigo] = {
-        "jogadores": [nome_jogador],
-        "estado": "aguardando",
-        "numeros_sorteados": [],
-        "vencedor": None,
-    }
+    with estado.transacao(tipo_sala, codigo):
+        # Outro worker pode ter criado a mesma sala antes de a trava dela ser tomada
+        if estado.obter_sala(tipo_sala, codigo) is not None:
+            emit(
+                "erro", {"mensagem": "Não foi possível criar a partida, tente novamente"}
+            )
+            return
 
-    # Cria um gerenciador de cartelas para o jogador
-    gerenciadores_cartelas[nome_jogador] = GerenciadorCartelas()
+        log.info("Sala criada", sala=codigo, jogador=nome_jogador, evento="criada")
+
+        # Inicializa a partida
+        partida = {
+            "jogadores": [nome_jogador],
+            "estado": "aguardando",
+            "numeros_sorteados": [],
+            "vencedor": None,
+            "padroes": padroes,
+            "criada_em": agora(),
+            "fim_contagem": None,
+            # Semente da ordem dos sorteios, para reproduzir a partida
+            "semente": nova_semente(),
+        }
+
+        # Cria um gerenciador de cartelas para o jogador
+        gerenciador = emitir_cartelas(codigo, tipo_sala)
+        evento = registrar_evento_sala(partida, "jogador_entrou", {"nome": nome_jogador})
+
+        estado.salvar_sala(tipo_sala, codigo, partida)
+        estado.salvar_sala_jogador(tipo_sala, nome_jogador, codigo)
+        estado.salvar_cartelas(nome_jogador, gerenciador)
+        publicar_lobby(codigo, None, resumo_lobby(codigo, tipo_sala, partida))
+        if registro:
+            registro.partida(codigo, partida["semente"], RegistroPadroes(padroes))
+        registrar_entrada(codigo, nome_jogador, gerenciador)
 
     # Adiciona o jogador à sala
     join_room(codigo)
 
     emit("partida_criada", {"codigo": codigo})
-    emit("jogador_entrou", {"nome": nome_jogador}, room=codigo)
+    emitir_eventos_sala(codigo, evento)
 
 
 @socketio.on("entrar_partida")
@@ -234,41 +675,49 @@ def entrar_partida(data):
         emit("erro", {"mensagem": "Nome do jogador não encontrado"})
         return
 
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
+    with estado.transacao(tipo_sala, codigo):
+        partida = estado.obter_sala(tipo_sala, codigo)
 
-    if codigo not in partidas_dict:
-        emit("erro", {"mensagem": "Partida não encontrada"})
-        return
+        if partida is None:
+            emit("erro", {"mensagem": "Partida não encontrada"})
+            return
 
-    partida = partidas_dict[codigo]
+        # Verifica se o jogador já está na partida
+        if nome_jogador in partida["jogadores"]:
+            join_room(codigo)
+            # Envia lista atualizada de jogadores para todos
+            socketio.emit(
+                "atualizar_jogadores", {"jogadores": partida["jogadores"]}, room=codigo
+            )
+            emit("redirecionar", {"codigo": codigo})
+            return
 
-    # Verifica se o jogador já está na partida
-    if nome_jogador in partida["jogadores"]:
-        join_room(codigo)
-        # Envia lista atualizada de jogadores para todos
-        socketio.emit(
-            "atualizar_jogadores", {"jogadores": partida["jogadores"]}, room=codigo
-        )
-        emit("redirecionar", {"codigo": codigo})
-        return
+        # Verifica se a partida já está em andamento
+        if partida["estado"] == "em_andamento":
+            emit(
+                "erro",
+                {
+                    "mensagem": "Esta partida já está em andamento. Não é possível entrar agora."
+                },
+            )
+            return
 
-    # Verifica se a partida já está em andamento
-    if partida["estado"] == "em_andamento":
-        emit(
-            "erro",
-            {
-                "mensagem": "Esta partida já está em andamento. Não é possível entrar agora."
-            },
+        log.info(
+            "Jogador entrando", sala=codigo, jogador=nome_jogador, evento="entrada"
         )
-        return
 
-    print(f"Jogador {nome_jogador} entrando na partida {codigo}")
+        # Adiciona o jogador à partida
+        antes = resumo_lobby(codigo, tipo_sala, partida)
+        partida["jogadores"].append(nome_jogador)
 
-    # Adiciona o jogador à partida
-    partida["jogadores"].append(nome_jogador)
+        # Cria um gerenciador de cartelas para o jogador
+        gerenciador = emitir_cartelas(codigo, tipo_sala)
 
-    # Cria um gerenciador de cartelas para o jogador
-    gerenciadores_cartelas[nome_jogador] = GerenciadorCartelas()
+        estado.salvar_sala(tipo_sala, codigo, partida)
+        estado.salvar_sala_jogador(tipo_sala, nome_jogador, codigo)
+        estado.salvar_cartelas(nome_jogador, gerenciador)
+        publicar_lobby(codigo, antes, resumo_lobby(codigo, tipo_sala, partida))
+        registrar_entrada(codigo, nome_jogador, gerenciador)
 
     # Adiciona o jogador à sala
     join_room(codigo)
@@ -279,34 +728,109 @@ def entrar_partida(data):
     # Aguarda um pequeno intervalo para garantir que o redirecionamento ocorreu
     eventlet.sleep(0.1)
 
-    # Envia a lista completa de jogadores para todos na sala
-    socketio.emit(
-        "atualizar_jogadores", {"jogadores": partida["jogadores"]}, room=codigo
-    )
+    with estado.transacao(tipo_sala, codigo):
+        partida = estado.obter_sala(tipo_sala, codigo)
+        if partida is None:
+            return
+
+        # Envia a lista completa de jogadores para todos na sala
+        socketio.emit(
+            "atualizar_jogadores", {"jogadores": partida["jogadores"]}, room=codigo
+        )
+
+        # Se temos dois jogadores e a contagem ainda não começou, inicia a contagem regressiva
+        if len(partida["jogadores"]) >= 2 and partida["estado"] == "aguardando":
+            log.info(
+                "Mínimo de jogadores atingido", sala=codigo, evento="minimo_atingido"
+            )
+            antes = resumo_lobby(codigo, tipo_sala, partida)
+            partida["estado"] = "contagem"
+            partida["fim_contagem"] = agora() + tempo_da_contagem
+            estado.salvar_sala(tipo_sala, codigo, partida)
+            publicar_lobby(codigo, antes, resumo_lobby(codigo, tipo_sala, partida))
+            agendar_tarefa_sala(codigo, tipo_sala, 0, contagem_regressiva)
+
 
-    # Se temos dois jogadores e a contagem ainda não começou, inicia a contagem regressiva
-    if len(partida["jogadores"]) >= 2 and partida["estado"] == "aguardando":
-        print(f"Dois ou mais jogadores conectados na sala {codigo}, iniciando contagem")
-        partida["estado"] = "contagem"
-        eventlet.spawn(contagem_regressiva, codigo, tipo_sala)
+def assinatura_cartelas(gerenciador):
+    """Identifica o conjunto de cartelas do jogador (resumo das impressões digitais)"""
+    return hashlib.blake2b(
+        b"".join(cartela.impressao for cartela in gerenciador.cartelas), digest_size=8
+    ).hexdigest()
 
 
 @socketio.on("solicitar_cartelas")
-def enviar_cartelas():
-    nome_jogador = session.get("nome_jogador")
-    if nome_jogador in gerenciadores_cartelas:
-        gerenciador = gerenciadores_cartelas[nome_jogador]
-        cartelas = []
+def enviar_cartelas(data=None):
+    """Envia as cartelas compactas do jogador, ou só as marcações se o cliente já tem os números
 
-        for cartela in gerenciador.cartelas:
-            cartelas.append(
+    Cada cartela vai como CARTELA_COMPACTA (24 bytes de números + máscara de marcação),
+    codificada uma vez e guardada na cartela até a marcação mudar. Na reconexão, o
+    cliente informa a assinatura das cartelas que já tem e recebe só as máscaras.
+    """
+    nome_jogador = session.get("nome_jogador")
+    gerenciador = estado.obter_cartelas(nome_jogador) if nome_jogador else None
+    if gerenciador:
+        assinatura = assinatura_cartelas(gerenciador)
+        if data and data.get("assinatura") == assinatura:
+            emit(
+                "marcacoes",
+                {"marcacoes": [cartela.marcacao_jogador for cartela in gerenciador.cartelas]},
+            )
+        else:
+            emit(
+                "cartelas",
                 {
-                    "numeros": cartela.cartela_numeros.tolist(),
-                    "marcacao": cartela.cartela_marcacao.tolist(),
-                }
+                    "cartelas": [cartela.compactar() for cartela in gerenciador.cartelas],
+                    "assinatura": assinatura,
+                },
             )
 
-        emit("cartelas", {"cartelas": cartelas})
+
+@socketio.on("marcar_cartela")
+def marcar_cartela(data):
+    """Aplica uma marcação do jogador: os bits que mudaram na máscara de uma cartela
+
+    As marcações só servem para a tela e a reconexão (o bingo é verificado pelo
+    MotorSala). Só são aceitas com a sala em andamento, e só marcam números já
+    sorteados; uma marcação recusada devolve ao cliente as marcações guardadas.
+    """
+    nome_jogador = session.get("nome_jogador")
+    tipo_sala = session.get("tipo_sala", "1")
+    indice = data.get("cartela")
+    delta = data.get("delta")
+    if not nome_jogador or not isinstance(indice, int) or not isinstance(delta, int):
+        return
+
+    codigo = estado.obter_sala_jogador(tipo_sala, nome_jogador)
+    if codigo is None:
+        return
+
+    with estado.transacao(tipo_sala, codigo):
+        # Confere de novo com a trava: o jogador pode ter saído da sala
+        codigo_atual, partida = sala_do_jogador(nome_jogador, tipo_sala)
+        if codigo_atual != codigo or partida["estado"] != "em_andamento":
+            return
+        gerenciador = estado.obter_cartelas(nome_jogador)
+        if not gerenciador or not 0 <= indice < len(gerenciador.cartelas):
+            return
+        cartela = gerenciador.cartelas[indice]
+
+        # Posições que podem ser marcadas: as dos números já sorteados (e o centro)
+        sorteados = set(partida["numeros_sorteados"])
+        permitidas = BIT_CENTRO
+        for numero, bit in cartela.posicoes():
+            if numero in sorteados:
+                permitidas |= bit
+
+        # O centro fica sempre marcado
+        nova = (cartela.marcacao_jogador ^ delta) & MASCARA_COMPLETA | BIT_CENTRO
+        if nova & ~cartela.marcacao_jogador & ~permitidas:
+            marcacoes = [outra.marcacao_jogador for outra in gerenciador.cartelas]
+        else:
+            cartela.marcacao_jogador = nova
+            estado.salvar_cartelas(nome_jogador, gerenciador)
+            return
+
+    emit("marcacoes", {"marcacoes": marcacoes})
 
 
 @socketio.on("entrar_sala")
@@ -317,12 +841,11 @@ def entrar_sala(data):
         emit("erro", {"mensagem": "Código e nome são obrigatórios"})
         return
 
-    if codigo not in partidas:
+    sala = estado.obter_sala("1", codigo)
+    if sala is None:
         emit("erro", {"mensagem": "Sala não encontrada"})
         return
 
-    sala = partidas[codigo]
-
     # Verifica se o jogo já começou (estado em_andamento)
     if sala["estado"] == "em_andamento":
         emit("erro", {"mensagem": "O jogo já começou. Não é possível entrar agora."})
@@ -357,6 +880,7 @@ def entrar_sala(data):
         sala["estado"] = "contagem"
         sala["contagem"] = tempo_da_contagem
         emit("atualizar_estado", {"estado": "contagem", "contagem": tempo_da_contagem}, room=codigo)
+    estado.salvar_sala("1", codigo, sala)
 
     # Envia as cartelas para o jogador
     emit("cartelas", {"cartelas": cartelas})
@@ -373,24 +897,19 @@ def entrar_sala(data):
 def handle_iniciar_jogo(data):
     """Handler do evento de iniciar jogo via Socket.IO"""
     codigo = data.get("codigo")
-    if not codigo or codigo not in partidas:
+    sala = estado.obter_sala("1", codigo) if codigo else None
+    if sala is None:
         emit("erro", {"mensagem": "Sala não encontrada"})
         return
 
-    sala = partidas[codigo]
-
-    # Verifica se o jogo já começou
-    if sala["estado"] != "aguardando" and sala["estado"] != "contagem":
-        emit("erro", {"mensagem": "O jogo já começou"})
-        return
-
     # Verifica se há jogadores suficientes
     if len(sala["jogadores"]) < 2:
         emit("erro", {"mensagem": "É necessário pelo menos 2 jogadores"})
         return
 
-    # Inicia o jogo chamando a função auxiliar
-    iniciar_jogo(codigo)
+    # Inicia o jogo chamando a função auxiliar, que confere o estado na transação
+    if not iniciar_jogo(codigo):
+        emit("erro", {"mensagem": "O jogo já começou"})
 
 
 @socketio.on("sair_sala")
@@ -403,85 +922,177 @@ def sair_sala(data):
         emit("erro", {"mensagem": "Nome do jogador não encontrado"})
         return
 
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
-
-    if not codigo or codigo not in partidas_dict:
-        emit("erro", {"mensagem": "Sala não encontrada"})
-        return
+    # Eventos numerados da sala, emitidos depois da transação
+    eventos = []
 
-    sala = partidas_dict[codigo]
+    with estado.transacao(tipo_sala, codigo):
+        sala = estado.obter_sala(tipo_sala, codigo) if codigo else None
 
-    # Verifica se o jogo está em andamento e tem apenas 2 jogadores
-    jogo_em_andamento = sala["estado"] == "em_andamento"
-    tem_dois_jogadores = len(sala["jogadores"]) == 2
-
-    # Remove o jogador da sala
-    if nome_jogador in sala["jogadores"]:
-        sala["jogadores"].remove(nome_jogador)
-        leave_room(codigo)
+        if sala is None:
+            emit("erro", {"mensagem": "Sala não encontrada"})
+            return
 
-        # Se não houver mais jogadores, remove a sala
-        if not sala["jogadores"]:
-            del partidas_dict[codigo]
-        else:
-            # Se o jogo estava em andamento e tinha apenas 2 jogadores,
-            # o jogador restante é o vencedor
-            if jogo_em_andamento and tem_dois_jogadores:
-                jogador_restante = sala["jogadores"][0]
-                print(
-                    f"VITÓRIA POR WO! Jogador {jogador_restante} venceu na sala {codigo} porque o outro jogador saiu."
-                )
-                sala["estado"] = "finalizado"
-                sala["vencedor"] = jogador_restante
-                socketio.emit(
-                    "bingo",
-                    {"vencedor": jogador_restante, "vitoria_por_wo": True},
-                    room=codigo,
-                )
-                socketio.emit(
-                    "mensagem",
-                    {
-                        "texto": f"O jogador {nome_jogador} saiu da partida. {jogador_restante} foi declarado vencedor!",
-                        "vitoria_por_wo": True,
-                    },
-                    room=codigo,
+        # Verifica se o jogo está em andamento e tem apenas 2 jogadores
+        jogo_em_andamento = sala["estado"] == "em_andamento"
+        tem_dois_jogadores = len(sala["jogadores"]) == 2
+
+        # Remove o jogador da sala
+        if nome_jogador in sala["jogadores"]:
+            antes = resumo_lobby(codigo, tipo_sala, sala)
+            sala["jogadores"].remove(nome_jogador)
+            estado.remover_sala_jogador(tipo_sala, nome_jogador, codigo)
+            leave_room(codigo)
+
+            # Libera as impressões das cartelas do jogador na sala
+            gerenciador = estado.obter_cartelas(nome_jogador)
+            if gerenciador:
+                estado.remover_impressoes(
+                    tipo_sala,
+                    codigo,
+                    [cartela.impressao for cartela in gerenciador.cartelas],
                 )
-            # Se o jogo ainda não começou, atualiza o estado
-            elif sala["estado"] == "aguardando" or sala["estado"] == "contagem":
-                if len(sala["jogadores"]) < 2:
-                    sala["estado"] = "aguardando"
-                    sala["contagem"] = None
-                    emit("atualizar_estado", {"estado": "aguardando"}, room=codigo)
+            if registro:
+                registro.saida(codigo, nome_jogador)
+
+            # Desativa as cartelas do jogador no motor da sala
+            motor = motores.get((tipo_sala, codigo))
+            if motor:
+                motor.remover_jogador(nome_jogador)
+
+            # Se não houver mais jogadores, remove a sala
+            if not sala["jogadores"]:
+                remover_sala(codigo, tipo_sala, sala)
+                motores.pop((tipo_sala, codigo), None)
+                cancelar_tarefa_sala(codigo, tipo_sala)
+                publicar_lobby(codigo, antes, None)
+                if registro:
+                    registro.fim(codigo, "TODOS_DESCONECTADOS")
+            else:
+                # Se o jogo estava em andamento e tinha apenas 2 jogadores,
+                # o jogador restante é o vencedor
+                if jogo_em_andamento and tem_dois_jogadores:
+                    jogador_restante = sala["jogadores"][0]
+                    log.info(
+                        "Vitória por WO: o outro jogador saiu",
+                        sala=codigo,
+                        jogador=jogador_restante,
+                        evento="vitoria_wo",
+                    )
+                    sala["estado"] = "finalizado"
+                    sala["vencedor"] = jogador_restante
+                    motores.pop((tipo_sala, codigo), None)
+                    cancelar_tarefa_sala(codigo, tipo_sala)
+                    if registro:
+                        registro.fim(codigo, f"VITORIA_POR_WO:{jogador_restante}")
+                    eventos.append(registrar_evento_sala(
+                        sala, "bingo", {"vencedor": jogador_restante, "vitoria_por_wo": True}
+                    ))
+                    eventos.append(registrar_evento_sala(
+                        sala,
+                        "mensagem",
+                        {
+                            "texto": f"O jogador {nome_jogador} saiu da partida. {jogador_restante} foi declarado vencedor!",
+                            "vitoria_por_wo": True,
+                        },
+                    ))
+                # Se o jogo ainda não começou, atualiza o estado
+                elif sala["estado"] == "aguardando" or sala["estado"] == "contagem":
+                    if len(sala["jogadores"]) < 2:
+                        sala["estado"] = "aguardando"
+                        sala["contagem"] = None
+                        sala["fim_contagem"] = None
+                        cancelar_tarefa_sala(codigo, tipo_sala)
+                        eventos.append(registrar_evento_sala(sala, "atualizar_estado", {"estado": "aguardando"}))
+
+                # Notifica a sala que o jogador saiu
+                eventos.append(registrar_evento_sala(sala, "jogador_saiu", {"nome": nome_jogador}))
+                estado.salvar_sala(tipo_sala, codigo, sala)
+                publicar_lobby(codigo, antes, resumo_lobby(codigo, tipo_sala, sala))
+
+                # Atualiza a lista de jogadores
+                emit("atualizar_jogadores", {"jogadores": sala["jogadores"]}, room=codigo)
+
+    emitir_eventos_sala(codigo, *eventos)
+
+
+@socketio.on("inscrever_lobby")
+def inscrever_lobby(data=None):
+    """Inscreve o cliente no lobby: um snapshot agora e depois só os deltas"""
+    tipo_sala = (data or {}).get("tipo_sala") or session.get("tipo_sala", "1")
+    # Só há lobby para Sala Pública
+    if tipo_sala != "2":
+        return
 
-            # Atualiza a lista de jogadores
-            emit("atualizar_jogadores", {"jogadores": sala["jogadores"]}, room=codigo)
+    # Com a trava global, que publicar_lobby também toma: nenhum delta fica entre o
+    # snapshot e a inscrição
+    with estado.transacao():
+        join_room(SALA_LOBBY)
+        partidas = []
+        for codigo, partida in estado.listar_salas("2"):
+            resumo = resumo_lobby(codigo, "2", partida)
+            if resumo:
+                partidas.append(resumo)
+        emit("lobby_snapshot", {"partidas": partidas})
+
+
+@socketio.on("sair_lobby")
+def sair_lobby(data=None):
+    leave_room(SALA_LOBBY)
+
+
+def recarregar_indice_lobby():
+    """Reconstrói o índice do lobby a partir do estado compartilhado pelos workers"""
+    global ultima_recarga_lobby
+    instante = agora()
+    if (
+        ultima_recarga_lobby is not None
+        and instante - ultima_recarga_lobby < INTERVALO_RECARGA_LOBBY
+    ):
+        return
+    ultima_recarga_lobby = instante
 
-    # Notifica a sala que o jogador saiu
-    emit("jogador_saiu", {"nome": nome_jogador}, room=codigo)
+    salas = []
+    for codigo, partida in estado.listar_salas("2"):
+        resumo = resumo_lobby(codigo, "2", partida)
+        if resumo:
+            salas.append(
+                {
+                    "codigo": codigo,
+                    "jogadores": resumo["jogadores"],
+                    "estado": resumo["estado"],
+                    "fim_contagem": resumo["fim_contagem"],
+                    "criacao": resumo["criada_em"],
+                }
+            )
+    indice_lobby.recarregar(salas)
 
 
 @socketio.on("solicitar_partidas")
 def enviar_partidas(data):
+    """Uma página do lobby: filtros por estado e vagas, ordem e cursor da página anterior"""
+    data = data if isinstance(data, dict) else {}
     tipo_sala = data.get("tipo_sala", "1")
     # Só envia partidas disponíveis para Sala Pública
     if tipo_sala != "2":
         return
 
-    partidas_disponiveis = []
-
-    for codigo, partida in partidas_sala_2.items():
-        # Incluir partidas tanto em aguardando quanto em contagem
-        if partida["estado"] in ["aguardando", "contagem"]:
-            partidas_disponiveis.append(
-                {
-                    "codigo": codigo,
-                    "jogadores": partida["jogadores"],
-                    "estado": partida["estado"],
-                    "contagem": partida.get("contagem", None),
-                }
-            )
+    # Em um só worker o índice é mantido pelas próprias alterações das salas
+    if estado.compartilhado:
+        recarregar_indice_lobby()
+
+    try:
+        pagina = indice_lobby.consultar(
+            estado=data.get("estado") or None,
+            vagas_minimas=data.get("vagas") or 0,
+            ordem=data.get("ordem") or "criacao",
+            cursor=data.get("cursor"),
+            limite=data.get("limite") or LIMITE_PAGINA,
+        )
+    except (TypeError, ValueError) as e:
+        emit("erro", {"mensagem": str(e)})
+        return
 
-    emit("atualizar_partidas", {"partidas": partidas_disponiveis})
+    emit("atualizar_partidas", pagina)
 
 
 @socketio.on("bingo")
@@ -495,34 +1106,42 @@ def handle_bingo(data):
         emit("erro", {"mensagem": "Nome do jogador não encontrado"})
         return
 
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
+    with estado.transacao(tipo_sala, codigo):
+        partida = estado.obter_sala(tipo_sala, codigo)
 
-    if codigo not in partidas_dict:
-        emit("erro", {"mensagem": "Partida não encontrada"})
-        return
-
-    partida = partidas_dict[codigo]
-
-    # Verifica se o jogo está em andamento
-    if partida["estado"] != "em_andamento":
-        emit("erro", {"mensagem": "O jogo não está em andamento"})
-        return
-
-    # Marca todos os números sorteados na cartela do jogador
-    gerenciador = gerenciadores_cartelas[nome_jogador]
-    for numero in partida["numeros_sorteados"]:
-        gerenciador.marcar_numero_em_todas_cartelas(numero)
+        if partida is None:
+            emit("erro", {"mensagem": "Partida não encontrada"})
+            return
 
-    # Verifica se o jogador fez bingo
-    cartela_bingo = gerenciador.verificar_bingo_em_todas_cartelas()
+        # Verifica se o jogo está em andamento
+        if partida["estado"] != "em_andamento":
+            emit("erro", {"mensagem": "O jogo não está em andamento"})
+            return
 
-    if cartela_bingo:
-        print(f"BINGO! Jogador {nome_jogador} venceu na sala {codigo}")
-        partida["estado"] = "finalizado"
-        partida["vencedor"] = nome_jogador
-        socketio.emit("bingo", {"vencedor": nome_jogador}, room=codigo)
-    else:
-        emit("erro", {"mensagem": "Bingo inválido! Verifique sua cartela novamente."})
+        # Verifica no motor da sala se o jogador tem alguma cartela completa
+        motor = obter_motor(codigo, tipo_sala, partida)
+        inicio = time.perf_counter()
+        cartela_bingo = motor.verificar_bingo(nome_jogador)
+        metricas.verificacao_bingo.observar(time.perf_counter() - inicio)
+        if registro:
+            registro.bingo(codigo, nome_jogador, cartela_bingo is not None)
+
+        # verificar_bingo devolve o número da cartela completa (contado a partir de 1
+        # por MotorSala.adicionar_jogador) ou None; só None indica bingo inválido
+        if cartela_bingo is not None:
+            log.info("BINGO!", sala=codigo, jogador=nome_jogador, evento="bingo")
+            partida["estado"] = "finalizado"
+            partida["vencedor"] = nome_jogador
+            padrao = motor.padroes_vencedores.get(nome_jogador)
+            evento = registrar_evento_sala(partida, "bingo", {"vencedor": nome_jogador, "padrao": padrao})
+            estado.salvar_sala(tipo_sala, codigo, partida)
+            motores.pop((tipo_sala, codigo), None)
+            cancelar_tarefa_sala(codigo, tipo_sala)
+            if registro:
+                registro.fim(codigo, f"BINGO_VENCEDOR:{nome_jogador}")
+            emitir_eventos_sala(codigo, evento)
+        else:
+            emit("erro", {"mensagem": "Bingo inválido! Verifique sua cartela novamente."})
 
 
 @socketio.on("atualizar_jogadores")
@@ -533,12 +1152,10 @@ def handle_atualizar_jogadores(data):
     if not codigo:
         return
 
-    partidas_dict = partidas if tipo_sala == "1" else partidas_sala_2
-
-    if codigo not in partidas_dict:
+    partida = estado.obter_sala(tipo_sala, codigo)
+    if partida is None:
         return
 
-    partida = partidas_dict[codigo]
     emit("atualizar_jogadores", {"jogadores": partida["jogadores"]})
 
 
@@ -0,0 +1,412 @@
+"""
+Gerador de carga para o servidor de Bingo
+
+Simula milhares de jogadores sem interface, usando a mesma lógica de cartelas
+do cliente, e mede a capacidade real do servidor.
+
+Uso (a partir da pasta Bingo):
+    python -m bingo_load tcp --bots 5000 --rooms 200
+    python -m bingo_load tcp --bots 200 --rooms 10 --async
+    python -m bingo_load tcp --bots 1000 --rooms 50 --externo --host 10.0.0.5 --porta 12345
+    python -m bingo_load socketio --bots 500 --rooms 50
+    python -m bingo_load virtual --partidas 10000 --jogadores 20
+"""
+import argparse
+import asyncio
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+from cartela import GerenciadorCartelas
+from padroes import RegistroPadroes
+from protocolo import (handshake_cliente_async, ler_cartela, ler_numero, ErroProtocolo,
+                       TIPO_CARTELA, TIPO_NUMERO, TIPO_TEXTO)
+
+# Mensagens que encerram a partida para o cliente
+MENSAGENS_FINAIS = ('BINGO_VENCEDOR', 'JOGO_CANCELADO', 'FIM_JOGO', 'SERVIDOR_ENCERRADO', 'TODOS_DESCONECTADOS')
+
+def rss_processo(pid):
+    """
+    Memória residente de um processo, lida de /proc (Linux)
+
+    :return: RSS em bytes, ou None se não for possível ler
+    """
+    try:
+        with open(f'/proc/{pid}/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def aumentar_limite_arquivos():
+    """
+    Eleva o limite de descritores abertos ao máximo permitido (herdado pelo servidor local)
+    """
+    try:
+        import resource
+        _, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (maximo, maximo))
+        return maximo
+    except (ImportError, ValueError, OSError):
+        return None
+
+def formatar_percentis(valores, unidade=1000, sufixo='ms'):
+    """
+    Resume uma lista de durações (em segundos) em p50/p90/p99/máximo
+    """
+    if not valores:
+        return "sem amostras"
+    p50, p90, p99 = np.percentile(valores, [50, 90, 99]) * unidade
+    return f"p50={p50:.2f}{sufixo} p90={p90:.2f}{sufixo} p99={p99:.2f}{sufixo} max={max(valores) * unidade:.2f}{sufixo} (n={len(valores)})"
+
+def formatar_bytes(valor):
+    if valor is None:
+        return "indisponível"
+    return f"{valor / (1024 * 1024):.1f} MiB"
+
+class MetricasCarga:
+    def __init__(self):
+        # Tempo de conexão TCP + handshake de cada robô
+        self.latencias_conexao = []
+
+        # Primeira entrega de cada sorteio em cada sala ((sala, n) -> instante)
+        self.primeiras_entregas = {}
+
+        # Entregas de sorteios: (sala, n, instante)
+        self.entregas = []
+
+        # Quadros recebidos por todos os robôs
+        self.mensagens = 0
+
+        # Contadores de resultado
+        self.entraram = 0
+        self.recusados = 0
+        self.erros = 0
+        self.bingos_enviados = 0
+        self.vitorias = 0
+        self.bingos_invalidos = 0
+
+        # Amostras de RSS do servidor
+        self.rss_servidor = []
+
+    def registrar_entrega(self, sala, sorteio, instante):
+        """
+        Registra a chegada do n-ésimo sorteio a um robô da sala
+        """
+        chave = (sala, sorteio)
+        primeira = self.primeiras_entregas.get(chave)
+        if primeira is None or instante < primeira:
+            self.primeiras_entregas[chave] = instante
+        self.entregas.append((sala, sorteio, instante))
+
+    def latencias_entrega(self):
+        """
+        Atraso de cada entrega em relação ao primeiro robô da mesma sala a receber o sorteio
+
+        Robôs e servidor não compartilham um relógio do sorteio, então o atraso é
+        medido como o espalhamento do envio para todos os jogadores da sala.
+        """
+        return [instante - self.primeiras_entregas[(sala, sorteio)] for sala, sorteio, instante in self.entregas]
+
+class RoboBingo:
+    def __init__(self, indice, sala, lider, gerador):
+        self.nome = f"robo_{indice}"
+        self.indice = indice
+        self.sala = sala
+        self.lider = lider
+        self.gerador = gerador
+
+        # Mesma lógica de cartelas do cliente interativo
+        self.gerenciador_cartelas = GerenciadorCartelas(cartelas=[])
+        self.padroes = RegistroPadroes()
+        self.bingo_enviado = False
+
+    async def conectar(self):
+        """
+        Conexão TCP + handshake, medindo a latência
+        """
+        inicio = time.perf_counter()
+        async with self.gerador.limite_conexoes:
+            leitor, escritor = await asyncio.open_connection(self.gerador.host, self.gerador.porta)
+            conexao = await handshake_cliente_async(leitor, escritor)
+        self.gerador.metricas.latencias_conexao.append(time.perf_counter() - inicio)
+        return conexao, escritor
+
+    async def entrar(self, conexao):
+        """
+        LISTAR_PARTIDAS, nome, NOVOPARTIDA:0 (líder) ou o código da sala, cartelas e PRONTO
+
+        :return: True se o robô entrou na partida
+        """
+        conexao.enviar_texto("LISTAR_PARTIDAS")
+        await conexao.receber_texto()
+        conexao.enviar_texto(self.nome)
+
+        codigos = self.gerador.codigos_salas
+        if self.lider:
+            conexao.enviar_texto("NOVOPARTIDA:0")
+        else:
+            codigo = await codigos[self.sala]
+            if codigo is None:
+                return False
+            conexao.enviar_texto(f"{codigo}:0")
+
+        codigo = await conexao.receber_texto()
+        resposta = await conexao.receber_texto()
+        if self.lider:
+            codigos[self.sala].set_result(codigo if resposta == "pode_entrar" else None)
+        if resposta != "pode_entrar":
+            self.gerador.metricas.recusados += 1
+            return False
+
+        # Cartelas emitidas pelo servidor, seguidas dos padrões da partida
+        while True:
+            quadro = await conexao.receber()
+            if quadro is None:
+                return False
+            tipo, conteudo = quadro
+            if tipo == TIPO_CARTELA:
+                self.gerenciador_cartelas.cartelas.append(ler_cartela(conteudo))
+                continue
+            texto = conteudo.decode('utf-8')
+            if texto.startswith('PADROES:'):
+                self.padroes = RegistroPadroes.de_texto(texto.split(':', 1)[1])
+            break
+
+        for _ in range(self.gerador.cartelas_extras):
+            conexao.enviar_texto('COMPRAR_CARTELA')
+            tipo, conteudo = await conexao.receber()
+            if tipo != TIPO_CARTELA:
+                break
+            self.gerenciador_cartelas.cartelas.append(ler_cartela(conteudo))
+
+        conexao.enviar_texto('PRONTO')
+        self.gerador.metricas.entraram += 1
+        return True
+
+    async def jogar(self, conexao):
+        """
+        Marca os números sorteados e pede BINGO assim que alguma cartela completa um padrão
+        """
+        metricas = self.gerador.metricas
+        while True:
+            quadro = await conexao.receber()
+            if quadro is None:
+                return
+            metricas.mensagens += 1
+            tipo, conteudo = quadro
+
+            if tipo == TIPO_NUMERO:
+                numero = ler_numero(conteudo)
+                self.gerenciador_cartelas.adicionar_numero_sorteado(numero)
+                metricas.registrar_entrega(self.sala, len(self.gerenciador_cartelas.numeros_sorteados), time.perf_counter())
+                self.gerenciador_cartelas.marcar_numero_em_todas_cartelas(numero)
+                if not self.bingo_enviado and self.gerenciador_cartelas.verificar_bingo_em_todas_cartelas(self.padroes):
+                    self.bingo_enviado = True
+                    metricas.bingos_enviados += 1
+                    conexao.enviar_texto('BINGO')
+            elif tipo == TIPO_TEXTO:
+                texto = conteudo.decode('utf-8')
+                if texto == 'BINGO_INVALIDO':
+                    metricas.bingos_invalidos += 1
+                elif texto.startswith(MENSAGENS_FINAIS):
+                    if texto == f'BINGO_VENCEDOR:{self.nome}':
+                        metricas.vitorias += 1
+                    return
+
+    async def executar(self):
+        escritor = None
+        try:
+            conexao, escritor = await self.conectar()
+            if await self.entrar(conexao):
+                await self.jogar(conexao)
+        except (OSError, ErroProtocolo, asyncio.IncompleteReadError) as e:
+            self.gerador.metricas.erros += 1
+            if self.gerador.verboso:
+                print(f"{self.nome}: {e}")
+        finally:
+            # Libera os robôs da sala se o líder falhou antes de criar a partida
+            futuro = self.gerador.codigos_salas[self.sala]
+            if self.lider and not futuro.done():
+                futuro.set_result(None)
+            if escritor is not None:
+                escritor.close()
+
+class GeradorCargaTCP:
+    def __init__(self, bots, salas, host='127.0.0.1', porta=12345, cartelas_extras=0,
+                 conexoes_simultaneas=256, pid_servidor=None, verboso=False):
+        self.bots = bots
+        self.salas = salas
+        self.host = host
+        self.porta = porta
+        self.cartelas_extras = cartelas_extras
+        self.conexoes_simultaneas = conexoes_simultaneas
+        self.pid_servidor = pid_servidor
+        self.verboso = verboso
+        self.metricas = MetricasCarga()
+
+        # Criados dentro do loop de eventos
+        self.limite_conexoes = None
+        self.codigos_salas = []
+
+    async def amostrar_rss(self):
+        """
+        Amostra a memória do servidor a cada segundo
+        """
+        while True:
+            rss = rss_processo(self.pid_servidor)
+            if rss is not None:
+                self.metricas.rss_servidor.append(rss)
+            await asyncio.sleep(1)
+
+    async def executar(self):
+        loop = asyncio.get_running_loop()
+        self.limite_conexoes = asyncio.Semaphore(self.conexoes_simultaneas)
+        self.codigos_salas = [loop.create_future() for _ in range(self.salas)]
+
+        amostragem = loop.create_task(self.amostrar_rss()) if self.pid_servidor else None
+        inicio = time.perf_counter()
+
+        # O primeiro robô de cada sala cria a partida; os demais entram com o código dela
+        robos = [RoboBingo(indice, indice % self.salas, indice < self.salas, self) for indice in range(self.bots)]
+        await asyncio.gather(*(robo.executar() for robo in robos))
+
+        duracao = time.perf_counter() - inicio
+        if amostragem:
+            amostragem.cancel()
+        return duracao
+
+    def relatorio(self, duracao):
+        m = self.metricas
+        print("\n=== Resultado da carga TCP ===")
+        print(f"Robôs: {self.bots} em {self.salas} salas | duração: {duracao:.1f}s")
+        print(f"Entraram: {m.entraram} | recusados: {m.recusados} | erros: {m.erros}")
+        print(f"BINGO enviados: {m.bingos_enviados} | vitórias: {m.vitorias} | inválidos: {m.bingos_invalidos}")
+        print(f"Conexão + handshake: {formatar_percentis(m.latencias_conexao)}")
+        print(f"Entrega dos sorteios (atraso no espalhamento da sala): {formatar_percentis(m.latencias_entrega())}")
+        print(f"Mensagens recebidas: {m.mensagens} ({m.mensagens / duracao:.0f} msg/s)")
+        if m.rss_servidor:
+            print(f"RSS do servidor: inicial={formatar_bytes(m.rss_servidor[0])} pico={formatar_bytes(max(m.rss_servidor))} "
+                  f"final={formatar_bytes(m.rss_servidor[-1])}")
+        else:
+            print("RSS do servidor: indisponível")
+
+def iniciar_servidor_local(argumentos):
+    """
+    Inicia um ServidorBingo local em outro processo, com salas do tamanho da carga
+
+    :return: subprocess.Popen do servidor
+    """
+    jogadores_por_sala = math.ceil(argumentos.bots / argumentos.rooms)
+    comando = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'servidor.py'),
+               argumentos.host, str(argumentos.porta), str(min(2, jogadores_por_sala)),
+               str(jogadores_por_sala), str(argumentos.tempo_espera), argumentos.padroes]
+    if argumentos.async_:
+        comando.append('--async')
+
+    saida = None if argumentos.log_servidor else subprocess.DEVNULL
+    processo = subprocess.Popen(comando, stdout=saida, stderr=saida)
+
+    # Espera o servidor aceitar conexões
+    limite = time.monotonic() + 10
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("O servidor local terminou durante a inicialização")
+        try:
+            socket.create_connection((argumentos.host, argumentos.porta), timeout=0.5).close()
+            return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.terminate()
+    raise RuntimeError("O servidor local não começou a aceitar conexões")
+
+def executar_tcp(argumentos):
+    limite = aumentar_limite_arquivos()
+    if limite is not None and limite < argumentos.bots * 2 + 64:
+        print(f"Aviso: limite de arquivos abertos ({limite}) pode ser insuficiente para {argumentos.bots} robôs")
+
+    processo = None
+    if not argumentos.externo:
+        processo = iniciar_servidor_local(argumentos)
+        print(f"Servidor local iniciado (pid {processo.pid}{', modo asyncio' if argumentos.async_ else ''})")
+
+    gerador = GeradorCargaTCP(argumentos.bots, argumentos.rooms, argumentos.host, argumentos.porta,
+                              argumentos.cartelas_extras, argumentos.conexoes_simultaneas,
+                              processo.pid if processo else None, argumentos.verboso)
+    try:
+        duracao = asyncio.run(gerador.executar())
+        gerador.relatorio(duracao)
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait()
+
+def executar_socketio(argumentos):
+    # Importado só aqui: o módulo aplica o monkey_patch do eventlet
+    import carga_socketio
+    carga_socketio.executar(argumentos)
+
+def executar_virtual(argumentos):
+    import simulacao
+    simulacao.executar(argumentos)
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog='bingo_load', description='Gerador de carga para o servidor de Bingo')
+    subparsers = parser.add_subparsers(dest='alvo', required=True)
+
+    tcp = subparsers.add_parser('tcp', help='Robôs no protocolo TCP contra um ServidorBingo')
+    tcp.add_argument('--bots', type=int, default=100, help='Quantidade de jogadores simulados')
+    tcp.add_argument('--rooms', type=int, default=10, help='Quantidade de salas')
+    tcp.add_argument('--host', default='127.0.0.1')
+    tcp.add_argument('--porta', type=int, default=12345)
+    tcp.add_argument('--externo', action='store_true', help='Usa um servidor já em execução em vez de iniciar um local')
+    tcp.add_argument('--async', dest='async_', action='store_true', help='Inicia o servidor local em modo asyncio')
+    tcp.add_argument('--padroes', default='linha', help='Padrões de bingo do servidor local (separados por vírgula)')
+    tcp.add_argument('--tempo-espera', type=int, default=60, help='Espera do servidor local antes de iniciar uma sala incompleta')
+    tcp.add_argument('--cartelas-extras', type=int, default=0, help='Cartelas compradas por robô além da inicial')
+    tcp.add_argument('--conexoes-simultaneas', type=int, default=256, help='Conexões em andamento ao mesmo tempo')
+    tcp.add_argument('--log-servidor', action='store_true', help='Mostra a saída do servidor local')
+    tcp.add_argument('--verboso', action='store_true', help='Mostra os erros de cada robô')
+    tcp.set_defaults(executar=executar_tcp)
+
+    sio = subparsers.add_parser('socketio', help='Navegadores simulados (Socket.IO) contra o app.py')
+    sio.add_argument('--bots', type=int, default=100, help='Quantidade de navegadores simulados')
+    sio.add_argument('--rooms', type=int, default=10, help='Quantidade de salas')
+    sio.add_argument('--host', default='127.0.0.1')
+    sio.add_argument('--porta', type=int, default=5000)
+    sio.add_argument('--externo', action='store_true', help='Usa um app já em execução em vez de iniciar um local')
+    sio.add_argument('--padroes', default='linha', help='Padrões de bingo das salas criadas (separados por vírgula)')
+    sio.add_argument('--tipo-sala', default='2', choices=['1', '2'], help='1 = Sala Particular, 2 = Sala Pública')
+    sio.add_argument('--contagem', type=int, default=5, help='Contagem regressiva do app local, em segundos')
+    sio.add_argument('--tempo-limite', type=float, default=600, help='Espera máxima por cada etapa, em segundos')
+    sio.add_argument('--log-servidor', action='store_true', help='Mostra a saída do app local')
+    sio.add_argument('--verboso', action='store_true', help='Mostra os erros de cada navegador')
+    sio.set_defaults(executar=executar_socketio)
+
+    virtual = subparsers.add_parser('virtual', help='Partidas completas em processo, com relógio virtual')
+    virtual.add_argument('--partidas', type=int, default=1000, help='Quantidade de partidas simuladas')
+    virtual.add_argument('--jogadores', type=int, default=10, help='Jogadores por partida')
+    virtual.add_argument('--max-jogadores', type=int, default=None, help='Máximo de jogadores por sala (padrão: sem início antecipado)')
+    virtual.add_argument('--padroes', default='linha', help='Padrões de bingo (separados por vírgula)')
+    virtual.add_argument('--tempo-espera', type=int, default=10, help='Contagem de espera antes do jogo, em segundos virtuais')
+    virtual.add_argument('--tempo-sorteio', type=float, default=3, help='Intervalo entre sorteios, em segundos virtuais')
+    virtual.add_argument('--tempo-reacao', type=float, default=0.5, help='Atraso do jogador até pedir BINGO, em segundos virtuais')
+    virtual.add_argument('--lote', type=int, default=1000, help='Partidas em andamento ao mesmo tempo (em cada processo)')
+    virtual.add_argument('--processos', type=int, default=None, help='Processos que dividem as partidas (padrão: um por núcleo)')
+    virtual.add_argument('--log-servidor', action='store_true', help='Mostra a saída das partidas')
+    virtual.add_argument('--registro', default=None, help='Grava os eventos das partidas neste arquivo (ver reproducao.py)')
+    virtual.set_defaults(executar=executar_virtual)
+
+    return parser
+
+def main(argv=None):
+    argumentos = criar_parser().parse_args(argv)
+    argumentos.executar(argumentos)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Carga de navegadores simulados contra o app.py (Socket.IO)
+
+Usado por `python -m bingo_load socketio`. Cada navegador obtém o cookie de
+sessão pelo POST em /jogar e segue a mesma sequência de eventos da página:
+criar_partida ou entrar_partida, solicitar_cartelas, numero_sorteado e bingo.
+"""
+import eventlet
+
+eventlet.monkey_patch()
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+import requests
+import socketio
+from protocolo import ler_cartela_compacta
+from padroes import RegistroPadroes
+from bingo_load import rss_processo, formatar_percentis, formatar_bytes
+
+class MetricasSocketIO:
+    def __init__(self):
+        # Chegada de cada sorteio em cada sala ((sala, n) -> lista de instantes)
+        self.entregas = defaultdict(list)
+
+        # Ida e volta de um evento sem trabalho no servidor, medida pela sonda
+        self.idas_e_voltas = []
+
+        # Eventos recebidos por todos os navegadores
+        self.eventos = 0
+
+        # Contadores de resultado
+        self.entraram = 0
+        self.erros = 0
+        self.bingos_enviados = 0
+        self.vitorias = 0
+
+        # RSS do servidor: antes das salas, com todas as salas cheias e pico
+        self.rss_inicial = None
+        self.rss_salas_cheias = None
+        self.rss_servidor = []
+
+    def espalhamentos_por_sala(self):
+        """
+        Tempo entre o primeiro e o último navegador da sala a receber cada sorteio
+
+        :return: Dicionário sala -> lista de espalhamentos (segundos)
+        """
+        por_sala = defaultdict(list)
+        for (sala, _), instantes in self.entregas.items():
+            if len(instantes) > 1:
+                por_sala[sala].append(max(instantes) - min(instantes))
+        return por_sala
+
+    def atrasos_loop(self):
+        """
+        Atraso do loop de eventos estimado como a ida e volta da sonda menos a menor ida e volta
+        """
+        if not self.idas_e_voltas:
+            return []
+        minimo = min(self.idas_e_voltas)
+        return [valor - minimo for valor in self.idas_e_voltas]
+
+class NavegadorSimulado:
+    def __init__(self, indice, sala, anfitriao, carga):
+        self.nome = f"navegador_{indice}"
+        self.sala = sala
+        self.anfitriao = anfitriao
+        self.carga = carga
+
+        self.codigo = None
+        self.cartelas = []
+        self.sorteados = 0
+        self.bingo_enviado = False
+
+        # Eventos esperados do servidor
+        self.entrou = threading.Event()
+        self.cartelas_recebidas = threading.Event()
+        self.fim = threading.Event()
+
+    def registrar_eventos(self, cliente):
+        metricas = self.carga.metricas
+
+        @cliente.on("partida_criada")
+        def partida_criada(dados):
+            self.codigo = dados["codigo"]
+            self.entrou.set()
+
+        @cliente.on("redirecionar")
+        def redirecionar(dados):
+            self.codigo = dados["codigo"]
+            self.entrou.set()
+
+        @cliente.on("cartelas")
+        def cartelas(dados):
+            self.cartelas = [ler_cartela_compacta(cartela) for cartela in dados["cartelas"]]
+            self.cartelas_recebidas.set()
+
+        @cliente.on("numero_sorteado")
+        def numero_sorteado(dados):
+            self.sorteados += 1
+            metricas.entregas[(self.sala, self.sorteados)].append(time.perf_counter())
+            metricas.eventos += 1
+
+            numero = dados["numero"]
+            for cartela in self.cartelas:
+                cartela.marcar_numero(numero)
+            if not self.bingo_enviado and any(cartela.verificar_bingo(self.carga.padroes) for cartela in self.cartelas):
+                self.bingo_enviado = True
+                metricas.bingos_enviados += 1
+                cliente.emit("bingo", {"codigo": self.codigo})
+
+        @cliente.on("bingo")
+        def bingo(dados):
+            metricas.eventos += 1
+            if dados.get("vencedor") == self.nome:
+                metricas.vitorias += 1
+            self.fim.set()
+
+        @cliente.on("*")
+        def outros(evento, *dados):
+            metricas.eventos += 1
+
+    def executar(self):
+        carga = self.carga
+        cliente = None
+        try:
+            # O cookie de sessão com nome_jogador e tipo_sala vem do POST em /jogar
+            sessao = requests.Session()
+            sessao.post(f"{carga.url}/jogar", data={"nome_jogador": self.nome, "tipo_sala": carga.tipo_sala})
+
+            cliente = socketio.Client(http_session=sessao, reconnection=False)
+            self.registrar_eventos(cliente)
+            cliente.connect(carga.url, transports=["websocket"])
+
+            if self.anfitriao:
+                cliente.emit("criar_partida", {"padroes": carga.padroes.nomes_ativos})
+                if not self.entrou.wait(carga.tempo_limite):
+                    raise TimeoutError("partida_criada não recebido")
+                carga.codigos_salas[self.sala] = self.codigo
+                carga.salas_criadas[self.sala].set()
+            else:
+                if not carga.salas_criadas[self.sala].wait(carga.tempo_limite) or not carga.codigos_salas[self.sala]:
+                    raise TimeoutError("a sala não foi criada")
+                cliente.emit("entrar_partida", {"codigo": carga.codigos_salas[self.sala]})
+                if not self.entrou.wait(carga.tempo_limite):
+                    raise TimeoutError("redirecionar não recebido")
+
+            cliente.emit("solicitar_cartelas")
+            if not self.cartelas_recebidas.wait(carga.tempo_limite):
+                raise TimeoutError("cartelas não recebidas")
+            carga.registrar_entrada()
+
+            self.fim.wait(carga.tempo_limite)
+        except Exception as e:
+            carga.metricas.erros += 1
+            if carga.verboso:
+                print(f"{self.nome}: {e}")
+        finally:
+            # Libera os navegadores da sala se o anfitrião falhou
+            if self.anfitriao:
+                carga.salas_criadas[self.sala].set()
+            if cliente is not None:
+                cliente.disconnect()
+
+class CargaSocketIO:
+    def __init__(self, navegadores, salas, url, padroes, tipo_sala="2", tempo_limite=600,
+                 pid_servidor=None, verboso=False):
+        self.navegadores = navegadores
+        self.salas = salas
+        self.url = url
+        self.padroes = RegistroPadroes(padroes)
+        self.tipo_sala = tipo_sala
+        self.tempo_limite = tempo_limite
+        self.pid_servidor = pid_servidor
+        self.verboso = verboso
+        self.metricas = MetricasSocketIO()
+
+        # Código de cada sala, publicado pelo anfitrião
+        self.codigos_salas = [None] * salas
+        self.salas_criadas = [threading.Event() for _ in range(salas)]
+
+        self.lock = threading.Lock()
+        self.ativa = True
+
+    def registrar_entrada(self):
+        """
+        Conta um navegador com cartelas; com todos dentro, mede a memória das salas cheias
+        """
+        with self.lock:
+            self.metricas.entraram += 1
+            if self.metricas.entraram == self.navegadores and self.pid_servidor:
+                self.metricas.rss_salas_cheias = rss_processo(self.pid_servidor)
+
+    def sondar_loop(self, intervalo=0.5):
+        """
+        Mede continuamente a ida e volta de solicitar_cartelas, que não faz trabalho para a sonda
+        """
+        sessao = requests.Session()
+        sessao.post(f"{self.url}/jogar", data={"nome_jogador": "sonda_carga", "tipo_sala": "1"})
+        sonda = socketio.Client(http_session=sessao, reconnection=False)
+        sonda.connect(self.url, transports=["websocket"])
+        try:
+            while self.ativa:
+                inicio = time.perf_counter()
+                sonda.call("solicitar_cartelas", timeout=10)
+                self.metricas.idas_e_voltas.append(time.perf_counter() - inicio)
+                time.sleep(intervalo)
+        finally:
+            sonda.disconnect()
+
+    def amostrar_rss(self):
+        while self.ativa:
+            rss = rss_processo(self.pid_servidor)
+            if rss is not None:
+                self.metricas.rss_servidor.append(rss)
+            time.sleep(1)
+
+    def executar(self):
+        if self.pid_servidor:
+            self.metricas.rss_inicial = rss_processo(self.pid_servidor)
+            eventlet.spawn(self.amostrar_rss)
+        sonda = eventlet.spawn(self.sondar_loop)
+
+        inicio = time.perf_counter()
+        pool = eventlet.GreenPool(self.navegadores)
+        for indice in range(self.navegadores):
+            sala = indice % self.salas
+            pool.spawn_n(NavegadorSimulado(indice, sala, indice < self.salas, self).executar)
+        pool.waitall()
+        duracao = time.perf_counter() - inicio
+
+        self.ativa = False
+        sonda.wait()
+        return duracao
+
+    def relatorio(self, duracao):
+        m = self.metricas
+        print("\n=== Resultado da carga Socket.IO ===")
+        print(f"Navegadores: {self.navegadores} em {self.salas} salas | duração: {duracao:.1f}s")
+        print(f"Entraram: {m.entraram} | erros: {m.erros} | bingo enviados: {m.bingos_enviados} | vitórias: {m.vitorias}")
+
+        por_sala = m.espalhamentos_por_sala()
+        todos = [valor for valores in por_sala.values() for valor in valores]
+        print(f"Fan-out de numero_sorteado (primeiro ao último da sala): {formatar_percentis(todos)}")
+        piores = sorted(por_sala.items(), key=lambda item: -max(item[1]))[:5]
+        for sala, valores in piores:
+            print(f"  sala {self.codigos_salas[sala]}: médio={np.mean(valores) * 1000:.2f}ms max={max(valores) * 1000:.2f}ms")
+
+        print(f"Atraso do loop de eventos (sonda): {formatar_percentis(m.atrasos_loop())}")
+        print(f"Eventos recebidos: {m.eventos} ({m.eventos / duracao:.0f}/s)")
+
+        if m.rss_inicial is not None:
+            print(f"RSS do servidor: inicial={formatar_bytes(m.rss_inicial)} salas cheias={formatar_bytes(m.rss_salas_cheias)} "
+                  f"pico={formatar_bytes(max(m.rss_servidor, default=None))}")
+            if m.rss_salas_cheias is not None:
+                print(f"Memória por sala: {formatar_bytes((m.rss_salas_cheias - m.rss_inicial) / self.salas)}")
+        else:
+            print("RSS do servidor: indisponível")
+
+def iniciar_app_local(host, porta, contagem, log_servidor=False):
+    """
+    Inicia o app.py em outro processo, sem o reloader do modo debug
+
+    :return: subprocess.Popen do servidor
+    """
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    codigo = (f"import app; app.tempo_da_contagem = {contagem}; "
+              f"app.socketio.run(app.app, host={host!r}, port={porta}, log_output={log_servidor})")
+    saida = None if log_servidor else subprocess.DEVNULL
+    processo = subprocess.Popen([sys.executable, "-c", codigo], cwd=pasta, stdout=saida, stderr=saida)
+
+    # Espera o servidor responder
+    limite = time.monotonic() + 20
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("O app terminou durante a inicialização")
+        try:
+            requests.get(f"http://{host}:{porta}/", timeout=0.5)
+            return processo
+        except requests.RequestException:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("O app não começou a responder")
+
+def executar(argumentos):
+    processo = None
+    if not argumentos.externo:
+        processo = iniciar_app_local(argumentos.host, argumentos.porta, argumentos.contagem, argumentos.log_servidor)
+        print(f"app.py local iniciado (pid {processo.pid})")
+
+    carga = CargaSocketIO(argumentos.bots, argumentos.rooms, f"http://{argumentos.host}:{argumentos.porta}",
+                          argumentos.padroes.split(","), argumentos.tipo_sala, argumentos.tempo_limite,
+                          processo.pid if processo else None, argumentos.verboso)
+    try:
+        duracao = carga.executar()
+        carga.relatorio(duracao)
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait()
@@ -1,40 +1,224 @@
-import random
+import struct
+import threading
+import time
+from collections import deque
 import numpy as np
 
+# Intervalos de números de cada coluna
+INTERVALOS = {
+    'B': (1, 15),
+    'I': (16, 30),
+    'N': (31, 45),
+    'G': (46, 60),
+    'O': (61, 75)
+}
+INICIOS_COLUNAS = np.array([inicio for inicio, _ in INTERVALOS.values()])
+
+# Cada posição da cartela ocupa um bit: bit = linha * 5 + coluna
+POSICOES_CARTELA = 25
+BIT_CENTRO = 1 << 12
+MASCARA_COMPLETA = (1 << POSICOES_CARTELA) - 1
+BITS_POSICOES = [1 << i for i in range(POSICOES_CARTELA)]
+
+# Cartela compacta: os 24 números (1 byte cada, linha a linha, sem o centro) + máscara de marcação
+CARTELA_COMPACTA = struct.Struct('!24sI')
+
+# Número máximo de cartelas por jogador (cada cartela no servidor guarda só a semente e a marcação)
+MAX_CARTELAS = 200
+
+# Constantes do SplitMix64, que deriva os números de uma cartela a partir da sua semente
+MISTURA_INCREMENTO = np.uint64(0x9E3779B97F4A7C15)
+MISTURA_MULTIPLICADOR_1 = np.uint64(0xBF58476D1CE4E5B9)
+MISTURA_MULTIPLICADOR_2 = np.uint64(0x94D049BB133111EB)
+
+# Contador de cada candidato (coluna, número do intervalo) somado à semente
+CONTADORES_CANDIDATOS = (np.arange(1, 76, dtype=np.uint64) * MISTURA_INCREMENTO).reshape(5, 15)
+
+def gerar_sementes(quantidade, gerador=None):
+    """
+    Sorteia sementes de 64 bits para novas cartelas
+    
+    :param gerador: np.random.Generator opcional (padrão: um novo gerador)
+    :return: Array uint64 com `quantidade` sementes
+    """
+    if gerador is None:
+        gerador = np.random.default_rng()
+    return gerador.integers(0, 1 << 64, size=quantidade, dtype=np.uint64)
+
+def cartelas_das_sementes(sementes):
+    """
+    Deriva os números de cartelas a partir das sementes, de forma determinística
+    
+    Cada coluna recebe os 5 primeiros valores de uma permutação do seu
+    intervalo de 15 números: cada candidato recebe uma chave SplitMix64 de
+    (semente, candidato) e a permutação é a ordem das chaves. A cartela inteira
+    é reproduzível a partir de 8 bytes.
+    
+    :param sementes: Sequência de sementes (inteiros de 64 bits)
+    :return: Array (quantidade, 5, 5) de números, com o centro = -1
+    """
+    chaves = np.asarray(sementes, dtype=np.uint64).reshape(-1, 1, 1) + CONTADORES_CANDIDATOS
+    chaves = (chaves ^ (chaves >> np.uint64(30))) * MISTURA_MULTIPLICADOR_1
+    chaves = (chaves ^ (chaves >> np.uint64(27))) * MISTURA_MULTIPLICADOR_2
+    chaves ^= chaves >> np.uint64(31)
+    
+    # (cartela, coluna, linha) -> (cartela, linha, coluna)
+    escolhidos = np.argsort(chaves, axis=2)[:, :, :5]
+    numeros = (escolhidos + INICIOS_COLUNAS[None, :, None]).transpose(0, 2, 1).copy()
+    numeros[:, 2, 2] = -1
+    return numeros
+
+def impressoes_cartelas(numeros):
+    """
+    Impressões digitais compactas de várias cartelas
+    
+    Cada posição guarda o deslocamento do número dentro do intervalo da sua
+    coluna (0 a 14, 4 bits); as 24 posições sem o centro cabem em 12 bytes.
+    Duas cartelas são iguais se e somente se têm a mesma impressão.
+    
+    :param numeros: Array (quantidade, 5, 5) de números (centro = -1)
+    :return: Lista de bytes, uma impressão por cartela
+    """
+    numeros = np.asarray(numeros).reshape(-1, POSICOES_CARTELA)
+    deslocamentos = (np.delete(numeros, POSICOES_CARTELA // 2, axis=1) - 1) % 15
+    pares = (deslocamentos[:, 0::2] << 4 | deslocamentos[:, 1::2]).astype(np.uint8)
+    return [linha.tobytes() for linha in pares]
+
 class CartelaBingo:
-    def __init__(self):
-        # Definindo os intervalos para cada coluna
-        self.intervalos = {
-            'B': (1, 15),
-            'I': (16, 30),
-            'N': (31, 45),
-            'G': (46, 60),
-            'O': (61, 75)
-        }
+    """
+    Cartela de bingo: uma semente de 64 bits (os números são derivados dela sob
+    demanda, por cartelas_das_sementes), a máscara de marcação dos números sorteados
+    e a das marcações do jogador
+    
+    Cartelas recebidas prontas (ex.: do servidor, no cliente) guardam a matriz de números.
+    """
+    __slots__ = ('semente', 'mascara_marcacao', 'marcacao_jogador', '_numeros', '_indice_numeros', '_impressao',
+                 '_numeros_compactos', '_compacta')
+    
+    def __init__(self, numeros=None, semente=None):
+        # Semente da cartela (None para cartelas carregadas a partir dos números)
+        self.semente = None
+        
+        # Máscara de 25 bits com as posições marcadas (centro sempre marcado)
+        self.mascara_marcacao = BIT_CENTRO
+        
+        # Marcações feitas pelo jogador na tela (app.py); só servem para a reconexão e a
+        # codificação compacta, nunca para verificar um bingo
+        self.marcacao_jogador = BIT_CENTRO
+        
+        # Matriz de números das cartelas sem semente, e índice e impressão digital, derivados sob demanda
+        self._numeros = None
+        self._indice_numeros = None
+        self._impressao = None
+        
+        # Codificações compactas, mantidas até os números (ou, a completa, a marcação) mudarem
+        self._numeros_compactos = None
+        self._compacta = None
         
-        # Inicializando a cartela de números
-        self.cartela_numeros = np.zeros((5, 5), dtype=int)
+        # Usa os números já gerados ou deriva a cartela da semente (nova, se não for dada)
+        if numeros is not None:
+            self.carregar_numeros(numeros)
+        else:
+            self.gerar_cartela(semente)
+    
+    @property
+    def cartela_numeros(self):
+        """
+        Matriz 5x5 com os números da cartela (centro = -1), derivada da semente a cada acesso
+        """
+        if self._numeros is not None:
+            return self._numeros
+        return cartelas_das_sementes([self.semente])[0]
+    
+    @property
+    def indice_numeros(self):
+        """
+        Índice número -> bit da posição na cartela, montado no primeiro acesso e mantido
         
-        # Inicializando a matriz binária de marcação
-        self.cartela_marcacao = np.zeros((5, 5), dtype=bool)
+        Para só percorrer as posições sem manter o índice (ex.: no servidor), use posicoes().
+        """
+        if self._indice_numeros is None:
+            self._indice_numeros = dict(self.posicoes())
+        return self._indice_numeros
+    
+    def posicoes(self):
+        """
+        :return: Lista de (número, bit da posição) das 24 posições com número
+        """
+        if self._indice_numeros is not None:
+            return list(self._indice_numeros.items())
+        return [(numero, bit) for numero, bit in zip(self.cartela_numeros.ravel().tolist(), BITS_POSICOES) if numero != -1]
+    
+    @property
+    def impressao(self):
+        """
+        Impressão digital compacta da cartela (ver impressoes_cartelas)
+        """
+        if self._impressao is None:
+            self._impressao = impressoes_cartelas(self.cartela_numeros)[0]
+        return self._impressao
+    
+    @property
+    def numeros_compactos(self):
+        """
+        Os 24 números da cartela em bytes, linha a linha, sem o centro (como em um quadro TIPO_CARTELA)
+        """
+        if self._numeros_compactos is None:
+            numeros = self.cartela_numeros.ravel().tolist()
+            del numeros[POSICOES_CARTELA // 2]
+            self._numeros_compactos = bytes(numeros)
+        return self._numeros_compactos
+    
+    def compactar(self):
+        """
+        Codifica a cartela em CARTELA_COMPACTA (28 bytes)
+        
+        A codificação fica guardada e só é refeita quando as marcações do jogador mudam.
         
-        # Gerar a cartela
-        self.gerar_cartela()
+        :return: Bytes com os números e a máscara das marcações do jogador
+        """
+        if self._compacta is None or self._compacta[0] != self.marcacao_jogador:
+            self._compacta = (self.marcacao_jogador, CARTELA_COMPACTA.pack(self.numeros_compactos, self.marcacao_jogador))
+        return self._compacta[1]
+    
+    @property
+    def cartela_marcacao(self):
+        """
+        Matriz 5x5 booleana de marcação, derivada da máscara de bits
+        """
+        bits = (self.mascara_marcacao >> np.arange(POSICOES_CARTELA)) & 1
+        return bits.astype(bool).reshape(5, 5)
     
-    def gerar_cartela(self):
+    def gerar_cartela(self, semente=None):
+        """
+        Gera a cartela de bingo seguindo as regras especificadas, a partir de uma semente
+        
+        :param semente: Semente de 64 bits (padrão: uma nova)
         """
-        Gera a cartela de bingo seguindo as regras especificadas
+        self.semente = int(semente) if semente is not None else int(gerar_sementes(1)[0])
+        self._numeros = None
+        self.reiniciar()
+    
+    def carregar_numeros(self, numeros):
         """
-        for coluna, (inicio, fim) in enumerate(self.intervalos.values()):
-            # Gerar números únicos para cada coluna
-            numeros_coluna = random.sample(range(inicio, fim + 1), 5)
-            
-            # Preencher a coluna na matriz
-            self.cartela_numeros[:, coluna] = numeros_coluna
+        Carrega uma matriz 5x5 de números na cartela e reinicia a marcação
         
-        # Marca o centro como -1 (será tratado como espaço vazio na interface)
-        self.cartela_numeros[2, 2] = -1
-        self.cartela_marcacao[2, 2] = True  # Centro sempre marcado
+        :param numeros: Matriz 5x5 de números (centro = -1)
+        """
+        self.semente = None
+        self._numeros = np.array(numeros, dtype=int).reshape(5, 5)
+        self.reiniciar()
+    
+    def reiniciar(self):
+        """
+        Descarta os dados derivados e volta à marcação inicial (centro sempre marcado)
+        """
+        self.mascara_marcacao = BIT_CENTRO
+        self.marcacao_jogador = BIT_CENTRO
+        self._indice_numeros = None
+        self._impressao = None
+        self._numeros_compactos = None
+        self._compacta = None
     
     def marcar_numero(self, numero):
         """
@@ -43,36 +227,45 @@ class CartelaBingo:
         :param numero: Número a ser marcado
         :return: True se o número foi marcado, False caso contrário
         """
-        for linha in range(5):
-            for coluna in range(5):
-                if self.cartela_numeros[linha, coluna] == numero:
-                    self.cartela_marcacao[linha, coluna] = True
-                    return True
-        return False
+        bit = self.indice_numeros.get(numero)
+        if bit is None:
+            return False
+        self.marcar_posicao(bit)
+        return True
+    
+    def marcar_posicao(self, bit):
+        """
+        Marca diretamente uma posição da cartela
+        
+        :param bit: Bit da posição (1 << (linha * 5 + coluna))
+        """
+        self.mascara_marcacao |= bit
     
-    def verificar_bingo(self):
+    def verificar_bingo(self, padroes=None):
         """
         Verifica se a cartela tem bingo
         
+        :param padroes: RegistroPadroes com os padrões ativos (padrão: cartela cheia)
         :return: True se há bingo, False caso contrário
         """
-        # Cria uma cópia para não modificar a original
-        verificacao = self.cartela_marcacao.copy()
-        
-        # Ignora o centro (já que ele começa marcado)
-        verificacao[2, 2] = True
+        if padroes is not None:
+            return padroes.verificar(self.mascara_marcacao) is not None
         
-        # Retorna True apenas se TODAS as posições forem True
-        return np.all(verificacao)
+        # Bingo apenas se TODAS as posições estiverem marcadas
+        return self.mascara_marcacao == MASCARA_COMPLETA
     
     def imprimir_cartela(self):
         """
         Imprime a cartela de números e a matriz de marcação
         """
+        # As matrizes são derivadas a cada acesso: obtidas uma vez só
+        numeros = self.cartela_numeros
+        marcacao = self.cartela_marcacao
+        
         print("\nCartela de Números:")
         for linha in range(5):
             for coluna in range(5):
-                numero = self.cartela_numeros[linha, coluna]
+                numero = numeros[linha, coluna]
                 if linha == 2 and coluna == 2:  # Centro da cartela
                     print("   ", end=" ")  # Espaço vazio no centro
                 else:
@@ -85,13 +278,81 @@ class CartelaBingo:
                 if linha == 2 and coluna == 2:  # Centro da cartela
                     print("   ", end=" ")  # Espaço vazio no centro
                 else:
-                    print("X" if self.cartela_marcacao[linha, coluna] else "-", end=" ")
+                    print("X" if marcacao[linha, coluna] else "-", end=" ")
             print()
 
+class PoolCartelas:
+    def __init__(self, tamanho=1024, lote=128):
+        # Quantidade de cartelas mantidas prontas e tamanho de cada lote gerado
+        self.tamanho = tamanho
+        self.lote = lote
+        
+        # Cartelas prontas: (semente, impressão digital), calculadas em lote
+        self.cartelas = deque()
+        
+        # Sinaliza para a thread de reabastecimento que o pool esvaziou
+        self.reabastecer = threading.Event()
+        self.reabastecer.set()
+        
+        # Thread (ou greenlet, com eventlet) que mantém o pool cheio
+        self.thread_reabastecimento = threading.Thread(target=self.manter_pool)
+        self.thread_reabastecimento.daemon = True
+        self.thread_reabastecimento.start()
+    
+    def manter_pool(self):
+        """
+        Gera cartelas em lote sempre que o pool fica abaixo do tamanho desejado
+        """
+        while True:
+            self.reabastecer.wait()
+            self.reabastecer.clear()
+            while len(self.cartelas) < self.tamanho:
+                sementes = gerar_sementes(self.lote)
+                self.cartelas.extend(zip(sementes.tolist(), impressoes_cartelas(cartelas_das_sementes(sementes))))
+                # Cede a vez entre os lotes para não travar o loop de eventos
+                time.sleep(0)
+    
+    def obter_cartela(self, emitidas=None):
+        """
+        Retira uma cartela pronta do pool
+        
+        :param emitidas: Conjunto de impressões das cartelas já emitidas na sala (opcional);
+                         cartelas repetidas são descartadas e a impressão da nova é adicionada
+        :return: Nova CartelaBingo
+        """
+        while True:
+            try:
+                semente, impressao = self.cartelas.popleft()
+            except IndexError:
+                # Pool vazio: gera diretamente para não bloquear o pedido
+                semente = int(gerar_sementes(1)[0])
+                impressao = impressoes_cartelas(cartelas_das_sementes([semente]))[0]
+            if emitidas is None or impressao not in emitidas:
+                break
+        
+        if emitidas is not None:
+            emitidas.add(impressao)
+        if len(self.cartelas) < self.tamanho // 2:
+            self.reabastecer.set()
+        cartela = CartelaBingo(semente=semente)
+        cartela._impressao = impressao
+        return cartela
+
 class GerenciadorCartelas:
-    def __init__(self):
-        # Lista de cartelas do jogador (inicialmente uma)
-        self.cartelas = [CartelaBingo()]
+    def __init__(self, pool=None, cartelas=None, emitidas=None):
+        # Pool de cartelas pré-geradas (opcional)
+        self.pool = pool
+        
+        # Impressões das cartelas já emitidas na sala, compartilhadas pelos jogadores (opcional):
+        # novas cartelas nunca repetem uma delas
+        self.emitidas = emitidas
+        
+        # Lista de cartelas do jogador (inicialmente uma, ou as fornecidas,
+        # ex.: cartelas emitidas pelo servidor)
+        if cartelas is not None:
+            self.cartelas = list(cartelas)
+        else:
+            self.cartelas = [self.nova_cartela()]
         
         # Flag para controle de bingo
         self.bingo_feito = False
@@ -99,19 +360,32 @@ class GerenciadorCartelas:
         # Lista de números sorteados
         self.numeros_sorteados = []
     
+    def nova_cartela(self):
+        """
+        Obtém uma nova cartela do pool, se houver, ou gera uma diretamente
+        """
+        if self.pool is not None:
+            return self.pool.obter_cartela(self.emitidas)
+        while True:
+            cartela = CartelaBingo()
+            if self.emitidas is None or cartela.impressao not in self.emitidas:
+                break
+        if self.emitidas is not None:
+            self.emitidas.add(cartela.impressao)
+        return cartela
+    
     def adicionar_cartela(self):
         """
-        Adiciona uma nova cartela ao jogador, se ele ainda não tiver 3
+        Adiciona uma nova cartela ao jogador, se ele ainda não tiver MAX_CARTELAS
+        
+        As mensagens ao jogador ficam com o cliente interativo (cliente.comprar_cartela).
+        
+        :return: True se a cartela foi adicionada
         """
-        if len(self.cartelas) < 3:
-            nova_cartela = CartelaBingo()
-            self.cartelas.append(nova_cartela)
-            print("\n--- Nova cartela adicionada! ---")
-            nova_cartela.imprimir_cartela()
+        if len(self.cartelas) < MAX_CARTELAS:
+            self.cartelas.append(self.nova_cartela())
             return True
-        else:
-            print("\n--- Você já tem o número máximo de cartelas (3)! ---")
-            return False
+        return False
     
     def marcar_numero_em_todas_cartelas(self, numero):
         """
@@ -126,14 +400,15 @@ class GerenciadorCartelas:
                 marcado = True
         return marcado
     
-    def verificar_bingo_em_todas_cartelas(self):
+    def verificar_bingo_em_todas_cartelas(self, padroes=None):
         """
         Verifica se há bingo em alguma das cartelas do jogador
         
+        :param padroes: RegistroPadroes com os padrões ativos (padrão: cartela cheia)
         :return: True se há bingo em pelo menos uma cartela, False caso contrário
         """
         for i, cartela in enumerate(self.cartelas, 1):
-            if cartela.verificar_bingo():
+            if cartela.verificar_bingo(padroes):
                 return i
         return None
     
@@ -2,7 +2,11 @@ import socket
 import threading
 import time
 import sys
-from cartela import GerenciadorCartelas
+import json
+from cartela import GerenciadorCartelas, MAX_CARTELAS
+from padroes import RegistroPadroes
+from protocolo import (handshake_cliente, ler_cartela, ler_numero, ErroProtocolo, nome_valido,
+                       TIPO_CARTELA, TIPO_NUMERO, TIPO_TEXTO, TAMANHO_MAXIMO_NOME)
 
 class ClienteBingo:
     def __init__(self, host='localhost', porta=12345, max_tentativas=3):
@@ -14,14 +18,20 @@ class ClienteBingo:
         # Criar socket do cliente
         self.cliente = None
         
+        # Conexão com quadros do protocolo binário (após o handshake)
+        self.conexao = None
+        
         # Flag para controle de thread
         self.rodando = False
         
         # Código da partida
         self.codigo_partida = None
         
-        # Gerenciador de cartelas
-        self.gerenciador_cartelas = GerenciadorCartelas()
+        # Gerenciador de cartelas (as cartelas são emitidas pelo servidor)
+        self.gerenciador_cartelas = GerenciadorCartelas(cartelas=[])
+        
+        # Padrões que valem como bingo na partida (enviados pelo servidor)
+        self.padroes = RegistroPadroes()
     
     def menu_interativo(self):
         """
@@ -29,14 +39,14 @@ class ClienteBingo:
         """
         while True:
             print("\n--- MENU ---")
-            print("1. Comprar nova cartela (Max:3)")
+            print(f"1. Comprar nova cartela (Max:{MAX_CARTELAS})")
             print("2. Continuar jogando")
             print("3. Sair")
             
             opcao = input("Escolha uma opção: ")
             
             if opcao == '1':
-                self.gerenciador_cartelas.adicionar_cartela()
+                self.comprar_cartela()
             elif opcao == '2':
                 break
             elif opcao == '3':
@@ -45,38 +55,92 @@ class ClienteBingo:
             else:
                 print("Opção inválida!")
 
-    def listar_partidas_publicas(self):
+    def receber_cartela(self, quadro=None):
         """
-        Solicita e exibe a lista de partidas públicas disponíveis
+        Recebe uma cartela emitida pelo servidor e a adiciona ao gerenciador
+        
+        :return: A nova CartelaBingo, ou None se o servidor não emitiu cartela
+        """
+        if quadro is None:
+            quadro = self.conexao.receber()
+        if quadro is None or quadro[0] != TIPO_CARTELA:
+            return None
+        cartela = ler_cartela(quadro[1])
+        self.gerenciador_cartelas.cartelas.append(cartela)
+        return cartela
+    
+    def comprar_cartela(self):
+        """
+        Solicita ao servidor uma nova cartela
+        """
+        self.conexao.enviar_texto('COMPRAR_CARTELA')
+        quadro = self.conexao.receber()
+        cartela = self.receber_cartela(quadro)
+        if cartela:
+            print("\n--- Nova cartela adicionada! ---")
+            cartela.imprimir_cartela()
+        elif quadro and quadro[0] == TIPO_TEXTO and quadro[1] == b'LIMITE_CARTELAS':
+            print(f"\n--- Você já tem o número máximo de cartelas ({MAX_CARTELAS})! ---")
+        else:
+            print(f"Resposta inesperada do servidor: {quadro}")
+    
+    def listar_partidas_publicas(self, filtros="ordem=ocupacao&vagas=1"):
+        """
+        Solicita a lista de partidas públicas disponíveis, uma página por vez
+        
+        :param filtros: Query string de filtros e ordem (estado, vagas, ordem)
+        :return: Lista de dicionários com codigo, jogadores, capacidade, vagas, estado e contagem
         """
         try:
             socket_temp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             socket_temp.connect((self.host, self.porta))
             
-            # Recebe a mensagem de conexão bem-sucedida
-            resposta = socket_temp.recv(1024).decode('utf-8')
-            if resposta != 'CONECTADO':
-                print("Erro ao conectar ao servidor para listar partidas")
+            # Handshake de versão do protocolo
+            try:
+                conexao = handshake_cliente(socket_temp)
+            except ErroProtocolo as e:
+                print(f"Erro ao conectar ao servidor para listar partidas: {e}")
                 socket_temp.close()
                 return []
             
-            # Envia comando especial para listar partidas
-            socket_temp.send('LISTAR_PARTIDAS'.encode('utf-8'))
+            # Pede as páginas na mesma conexão até o servidor não devolver cursor
+            partidas = []
+            cursor = None
+            while True:
+                comando = f'LISTAR_PARTIDAS:{filtros}'
+                if cursor:
+                    comando += f'&cursor={cursor}'
+                conexao.enviar_texto(comando)
+                
+                resposta = conexao.receber_texto() or ''
+                if not resposta.startswith('PAGINA_PARTIDAS:'):
+                    print(f"Resposta inesperada ao listar partidas: {resposta}")
+                    break
+                pagina = json.loads(resposta.split(':', 1)[1])
+                partidas.extend(pagina['partidas'])
+                cursor = pagina['proximo_cursor']
+                if not cursor:
+                    break
             
-            # Recebe a lista de partidas
-            resposta = socket_temp.recv(1024).decode('utf-8')
-            socket_temp.send('SAIR'.encode('utf-8'))
+            conexao.enviar_texto('SAIR')
             socket_temp.close()
-            
-            if resposta.startswith('PARTIDAS_PUBLICAS:'):
-                partidas = resposta.split(':', 1)[1].split(',')
-                return [p for p in partidas if p]  # Filtra strings vazias
-            
-            return []
+            return partidas
         except Exception as e:
             print(f"Erro ao listar partidas públicas: {e}")
             return []
     
+    def exibir_partidas(self, partidas):
+        """
+        Mostra as partidas públicas numeradas
+        """
+        print("\nPartidas públicas disponíveis:")
+        for i, partida in enumerate(partidas, 1):
+            if partida['estado'] == 'contagem':
+                status = f"começa em {partida['contagem']}s"
+            else:
+                status = "aguardando jogadores"
+            print(f"{i}. {partida['codigo']} ({partida['jogadores']}/{partida['capacidade']} jogadores, {status})")
+    
     def verificar_partida_existe(self, codigo_partida):
         """
         Verifica se uma partida específica existe no servidor
@@ -85,19 +149,19 @@ class ClienteBingo:
             socket_temp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             socket_temp.connect((self.host, self.porta))
             
-            # Recebe a mensagem de conexão bem-sucedida
-            resposta = socket_temp.recv(1024).decode('utf-8')
-            if resposta != 'CONECTADO':
-                print("Erro ao conectar ao servidor para verificar partida")
+            # Handshake de versão do protocolo
+            try:
+                conexao = handshake_cliente(socket_temp)
+            except ErroProtocolo as e:
+                print(f"Erro ao conectar ao servidor para verificar partida: {e}")
                 socket_temp.close()
                 return False
             
             # Envia comando especial para verificar partida
-            socket_temp.send(f'VERIFICAR_PARTIDA:{codigo_partida}'.encode('utf-8'))
+            conexao.enviar_texto(f'VERIFICAR_PARTIDA:{codigo_partida}')
             
             # Recebe a resposta
-            resposta = socket_temp.recv(1024).decode('utf-8')
-            socket_temp.send('SAIR'.encode('utf-8'))
+            resposta = conexao.receber_texto()
             socket_temp.close()
             
             return resposta == 'PARTIDA_EXISTE'
@@ -124,12 +188,22 @@ class ClienteBingo:
                 self.cliente = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.cliente.connect((self.host, self.porta))
                 
-                resposta = self.cliente.recv(1024).decode('utf-8')
-                if resposta == 'CONECTADO':
+                # Handshake de versão do protocolo; versões incompatíveis não são repetidas
+                try:
+                    self.conexao = handshake_cliente(self.cliente)
+                except ErroProtocolo as e:
+                    print(f"Resposta inesperada do servidor: {e}")
+                    self.fechar_conexao()
+                    return False
+                
+                if self.conexao is not None:
                     print("Conectado ao servidor!")
                     
                     self.nome_jogador = input("Digite seu nome: ")
-                    self.cliente.send(self.nome_jogador.encode('utf-8'))
+                    while not nome_valido(self.nome_jogador):
+                        print(f"Nome grande demais (até {TAMANHO_MAXIMO_NOME} bytes).")
+                        self.nome_jogador = input("Digite seu nome: ")
+                    self.conexao.enviar_texto(self.nome_jogador)
                     
                     # Loop para garantir uma escolha válida
                     while codigo_partida is None:
@@ -147,9 +221,7 @@ class ClienteBingo:
                                 print("Você pode apenas criar uma nova partida ou tentar novamente.")
                                 continue  # Volta ao menu principal
                             
-                            print("\nPartidas públicas disponíveis:")
-                            for i, partida in enumerate(partidas, 1):
-                                print(f"{i}. {partida}")
+                            self.exibir_partidas(partidas)
                             print("0. Voltar ao menu principal")
                             
                             codigo_digitado = input("Digite o código exato da partida: ")
@@ -167,14 +239,12 @@ class ClienteBingo:
                         elif opcao == '4':
                             partidas = self.listar_partidas_publicas()
                             if partidas:
-                                print("\nPartidas públicas disponíveis:")
-                                for i, partida in enumerate(partidas, 1):
-                                    print(f"{i}. {partida}")
+                                self.exibir_partidas(partidas)
                                 
                                 try:
                                     indice = int(input("\nDigite o número da partida para entrar (0 para voltar): "))
                                     if 1 <= indice <= len(partidas):
-                                        codigo_partida = partidas[indice-1]
+                                        codigo_partida = partidas[indice-1]['codigo']
                                     elif indice == 0:
                                         continue  # Volta ao menu principal
                                     else:
@@ -198,14 +268,20 @@ class ClienteBingo:
                             print("Opção inválida. Tente novamente.")
                             continue
                     
-                    self.cliente.send(codigo_partida.encode('utf-8'))
+                    self.conexao.enviar_texto(codigo_partida)
                     
                     # Recebe o código real da partida do servidor
-                    self.codigo_partida = self.cliente.recv(1024).decode('utf-8')
-                    print(f"Você está na partida com código: {self.codigo_partida}")
+                    self.codigo_partida = self.conexao.receber_texto()
                     
                     # Recebe a resposta do servidor sobre a entrada na partida
-                    resposta_partida = self.cliente.recv(1024).decode('utf-8')
+                    resposta_partida = self.conexao.receber_texto()
+                    if resposta_partida == "nome_invalido":
+                        print(f"\nNome ou código da partida grande demais (até {TAMANHO_MAXIMO_NOME} bytes).")
+                        self.fechar_conexao()
+                        codigo_partida = None  # Reseta para tentar novamente
+                        continue
+                    print(f"Você está na partida com código: {self.codigo_partida}")
+                    
                     if resposta_partida == "jogo_em_andamento":
                         print("\n--- ATENÇÃO ---")
                         print("Esta partida já está em andamento e não é possível entrar agora.")
@@ -214,16 +290,29 @@ class ClienteBingo:
                         codigo_partida = None  # Reseta para tentar novamente
                         continue
                     
+                    # Recebe as cartelas emitidas pelo servidor, seguidas dos
+                    # padrões que valem como bingo na partida
+                    self.gerenciador_cartelas.cartelas = []
+                    quadro = self.conexao.receber()
+                    while quadro is not None and quadro[0] == TIPO_CARTELA:
+                        self.receber_cartela(quadro)
+                        quadro = self.conexao.receber()
+                    if not self.gerenciador_cartelas.cartelas or quadro is None:
+                        raise ConnectionError("Servidor não enviou a cartela")
+                    
+                    resposta_padroes = quadro[1].decode('utf-8')
+                    if resposta_padroes.startswith('PADROES:'):
+                        self.padroes = RegistroPadroes.de_texto(resposta_padroes.split(':', 1)[1])
+                        print(f"Padrões válidos nesta partida: {', '.join(self.padroes.nomes_ativos)}")
+                    
                     self.gerenciador_cartelas.imprimir_todas_cartelas()
                     self.menu_interativo()
                     
-                    self.cliente.send('PRONTO'.encode('utf-8'))
+                    self.conexao.enviar_texto('PRONTO')
                     
                     self.rodando = True
                     threading.Thread(target=self.receber_numeros).start()
                     return True
-                else:
-                    print(f"Resposta inesperada do servidor: {resposta}")
             except Exception as e:
                 print(f"Tentativa {tentativas + 1} falhou: {e}")
                 
@@ -246,17 +335,24 @@ class ClienteBingo:
                 if not self.cliente:
                     break
                     
-                dados = self.cliente.recv(1024).decode('utf-8')
-                if not dados:
+                quadro = self.conexao.receber()
+                if quadro is None:
                     print("Conexão perdida com o servidor")
                     break
                 
+                tipo, conteudo = quadro
+                if tipo == TIPO_NUMERO:
+                    self.processar_numero(ler_numero(conteudo))
+                    continue
+                
+                dados = conteudo.decode('utf-8')
+                
                 if dados.startswith('BINGO_VENCEDOR:'):
                     vencedor = dados.split(':')[1]
                     print("\n--- RESULTADO FINAL ---")
                     print("Números sorteados:", self.gerenciador_cartelas.get_numeros_sorteados())
                     if vencedor == self.nome_jogador:
-                        print(f"\n--- BINGO! Você venceu com a cartela {self.gerenciador_cartelas.verificar_bingo_em_todas_cartelas()}! ---")
+                        print(f"\n--- BINGO! Você venceu com a cartela {self.gerenciador_cartelas.verificar_bingo_em_todas_cartelas(self.padroes)}! ---")
                         print("Parabéns! Você foi o primeiro a completar sua cartela!")
                     else:
                         print(f"\n--- BINGO! O jogador {vencedor} venceu a partida! ---")
@@ -264,6 +360,11 @@ class ClienteBingo:
                     self.rodando = False
                     break
                 
+                if dados == 'BINGO_INVALIDO':
+                    print("\n--- O servidor não confirmou o seu BINGO! ---")
+                    self.gerenciador_cartelas.bingo_feito = False
+                    continue
+                
                 if dados.startswith('JOGO_CANCELADO:'):
                     motivo = dados.split(':', 1)[1]
                     print("\n--- JOGO CANCELADO ---")
@@ -278,34 +379,7 @@ class ClienteBingo:
                     self.rodando = False
                     break
                 
-                try:
-                    # Tenta interpretar como um número
-                    numero = int(dados)
-                    self.gerenciador_cartelas.adicionar_numero_sorteado(numero)
-                    
-                    print(f"\n--- Número sorteado: {numero} ---")
-                    print(f"Números já sorteados: {self.gerenciador_cartelas.get_numeros_sorteados()}")
-                    
-                    # Marca nas cartelas
-                    if self.gerenciador_cartelas.marcar_numero_em_todas_cartelas(numero):
-                        print("Número marcado em pelo menos uma cartela!")
-                        
-                        # Imprime cartelas atualizadas
-                        self.gerenciador_cartelas.imprimir_todas_cartelas()
-                        
-                        # Verifica bingo
-                        cartela_vencedora = self.gerenciador_cartelas.verificar_bingo_em_todas_cartelas()
-                        if cartela_vencedora is not None and not self.gerenciador_cartelas.bingo_feito:
-                            print(f"\n--- BINGO! Você venceu com a cartela {cartela_vencedora}! ---")
-                            self.gerenciador_cartelas.bingo_feito = True
-                            # Envia notificação ao servidor
-                            try:
-                                self.cliente.send('BINGO'.encode('utf-8'))
-                            except:
-                                print("Erro ao enviar notificação de bingo")
-
-                except ValueError:
-                    print(f"Mensagem não reconhecida: {dados}")
+                print(f"Mensagem não reconhecida: {dados}")
                     
             except Exception as e:
                 print(f"Erro ao receber dados: {e}")
@@ -315,6 +389,33 @@ class ClienteBingo:
         print("\nDesconectado do servidor.")
         self.fechar_conexao()
     
+    def processar_numero(self, numero):
+        """
+        Registra um número sorteado, marca nas cartelas e avisa o servidor em caso de bingo
+        """
+        self.gerenciador_cartelas.adicionar_numero_sorteado(numero)
+        
+        print(f"\n--- Número sorteado: {numero} ---")
+        print(f"Números já sorteados: {self.gerenciador_cartelas.get_numeros_sorteados()}")
+        
+        # Marca nas cartelas
+        if self.gerenciador_cartelas.marcar_numero_em_todas_cartelas(numero):
+            print("Número marcado em pelo menos uma cartela!")
+            
+            # Imprime cartelas atualizadas
+            self.gerenciador_cartelas.imprimir_todas_cartelas()
+            
+            # Verifica bingo
+            cartela_vencedora = self.gerenciador_cartelas.verificar_bingo_em_todas_cartelas(self.padroes)
+            if cartela_vencedora is not None and not self.gerenciador_cartelas.bingo_feito:
+                print(f"\n--- BINGO! Você venceu com a cartela {cartela_vencedora}! ---")
+                self.gerenciador_cartelas.bingo_feito = True
+                # Envia notificação ao servidor
+                try:
+                    self.conexao.enviar_texto('BINGO')
+                except:
+                    print("Erro ao enviar notificação de bingo")
+    
     def fechar_conexao(self):
         """
         Fecha a conexão com o servidor
@@ -327,6 +428,7 @@ class ClienteBingo:
             except:
                 pass
             self.cliente = None
+            self.conexao = None
 
 def main():
     # Verifica se o IP e porta foram fornecidos como argumentos
@@ -0,0 +1,351 @@
+import selectors
+import socket
+import threading
+from collections import deque
+from logs import obter_logger
+
+log = obter_logger(__name__)
+
+# Quantidade máxima de quadros aguardando envio para um cliente
+CAPACIDADE_FILA = 256
+
+# Bytes pendentes no buffer de um transporte asyncio antes de considerar o cliente lento
+LIMITE_BUFFER_ASYNC = 64 * 1024
+
+# Envio sem bloquear, sem tirar do modo bloqueante o socket em que a thread do
+# cliente faz recv; sem MSG_DONTWAIT (Windows), cada envio a um socket pronto para
+# escrita é limitado a um pedaço pequeno, que cabe no buffer dele
+FLAGS_ENVIO = getattr(socket, 'MSG_DONTWAIT', 0)
+TAMANHO_ENVIO = 64 * 1024 if FLAGS_ENVIO else 4096
+
+class EscritorSaida:
+    """
+    Thread única que esvazia as filas de saída de todos os clientes do processo
+
+    Um canal com quadros novos é entregue à thread por agendar; ela envia sem
+    bloquear o que o socket aceitar e, se o buffer do socket enche, deixa o canal
+    no seletor até ele voltar a aceitar escrita. Um cliente lento nunca atrasa os
+    outros, e o número de threads não cresce com o de clientes.
+    """
+    def __init__(self):
+        self.seletor = selectors.DefaultSelector()
+
+        # Canais entregues por agendar, ainda não atendidos
+        self.prontos = deque()
+        self.lock = threading.Lock()
+
+        # Par de sockets que acorda o select quando um canal é agendado
+        self.despertador, self.sinal = socket.socketpair()
+        self.despertador.setblocking(False)
+        self.sinal.setblocking(False)
+        self.seletor.register(self.despertador, selectors.EVENT_READ)
+
+        self.thread = threading.Thread(target=self.executar)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def agendar(self, canal):
+        """
+        Entrega um canal à thread escritora (de qualquer thread)
+        """
+        with self.lock:
+            acordar = not self.prontos
+            self.prontos.append(canal)
+        # Só a primeira entrega de um lote precisa acordar o select
+        if acordar:
+            try:
+                self.sinal.send(b'\0')
+            except OSError:
+                # Buffer do sinal cheio: a thread já tem o que acordá-la
+                pass
+
+    def executar(self):
+        while True:
+            for chave, _ in self.seletor.select():
+                if chave.fileobj is self.despertador:
+                    try:
+                        while self.despertador.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self.atender(chave.data)
+
+            with self.lock:
+                prontos, self.prontos = self.prontos, deque()
+            for canal in prontos:
+                self.atender(canal)
+
+    def atender(self, canal):
+        """
+        Envia o que o canal tiver; se o socket encheu, espera no seletor por ele
+        """
+        try:
+            pendente = canal.escrever()
+        except Exception:
+            # Um canal com problema não pode parar a thread que atende todos os outros
+            log.exception("Erro ao enviar para um cliente", evento="erro_envio")
+            canal.despejar()
+            return
+        if pendente:
+            if not canal.registrado:
+                self.registrar(canal)
+        elif canal.registrado:
+            self.desregistrar(canal)
+
+    def registrar(self, canal):
+        try:
+            self.seletor.register(canal.socket, selectors.EVENT_WRITE, canal)
+        except KeyError:
+            # O descritor foi reaproveitado: o socket registrado com ele foi fechado
+            # pela thread do cliente antes de o seu canal sair do seletor
+            antigo = self.seletor.get_key(canal.socket).data
+            self.desregistrar(antigo)
+            self.seletor.register(canal.socket, selectors.EVENT_WRITE, canal)
+        except ValueError:
+            # Socket já fechado
+            canal.despejar()
+            return
+        canal.registrado = True
+
+    def desregistrar(self, canal):
+        try:
+            self.seletor.unregister(canal.socket)
+        except (KeyError, ValueError):
+            pass
+        canal.registrado = False
+
+# Escritor compartilhado pelos difusores do processo, criado no primeiro uso
+_escritor = None
+_lock_escritor = threading.Lock()
+
+def escritor_saida():
+    """
+    Retorna o EscritorSaida do processo, iniciando a thread dele na primeira chamada
+    """
+    global _escritor
+    with _lock_escritor:
+        if _escritor is None:
+            _escritor = EscritorSaida()
+        return _escritor
+
+class CanalSaida:
+    """
+    Fila de saída limitada de um cliente, esvaziada pelo EscritorSaida do processo
+
+    Quem envia apenas enfileira o quadro; se a fila encher (cliente lento) ou o
+    envio falhar (cliente morto), o socket é desligado com shutdown. Isso
+    desbloqueia o recv da thread do cliente, que o remove da partida pelo
+    caminho normal de desconexão, fora do lock da partida.
+    """
+    def __init__(self, cliente_socket, escritor, capacidade=CAPACIDADE_FILA):
+        self.socket = cliente_socket
+        self.escritor = escritor
+        self.capacidade = capacidade
+        self.fila = deque()
+        self.ativo = True
+
+        # Fechar depois de esvaziar a fila (fechar) ou já (despejar)
+        self.fechando = False
+        self.despejado = False
+
+        # Entregue ao escritor e ainda não esvaziado: quadros novos não precisam reagendar
+        self.agendado = False
+
+        # Estado da thread escritora: parte do quadro atual ainda não aceita pelo
+        # socket, e se o canal está no seletor
+        self.resto = b''
+        self.registrado = False
+
+    def enviar(self, quadro):
+        """
+        Enfileira um quadro sem esperar pela rede
+
+        :return: True se o quadro foi enfileirado, False se o cliente foi despejado
+        """
+        if not self.ativo:
+            return False
+        if len(self.fila) >= self.capacidade:
+            self.despejar()
+            return False
+        self.fila.append(quadro)
+        if not self.agendado:
+            self.agendado = True
+            self.escritor.agendar(self)
+        return True
+
+    def escrever(self):
+        """
+        Envia sem bloquear o que o socket aceitar (só na thread escritora)
+
+        :return: True se o socket encheu antes de a fila esvaziar
+        """
+        while True:
+            if self.despejado:
+                self.desligar_socket()
+                return False
+            if not self.resto:
+                if not self.fila:
+                    if self.fechando:
+                        # Fechamento ordenado: a fila foi esvaziada antes de fechar o socket
+                        self.desligar_socket()
+                        return False
+                    # Confere de novo depois de liberar: um quadro pode ter chegado
+                    # entre a fila vazia e a liberação
+                    self.agendado = False
+                    if not self.fila and not self.fechando and not self.despejado:
+                        return False
+                    self.agendado = True
+                    continue
+                self.resto = memoryview(self.fila.popleft())
+            try:
+                enviados = self.socket.send(self.resto[:TAMANHO_ENVIO], FLAGS_ENVIO)
+            except BlockingIOError:
+                return True
+            except OSError:
+                self.ativo = False
+                self.despejado = True
+                continue
+            self.resto = self.resto[enviados:]
+
+    def despejar(self):
+        """
+        Descarta um cliente lento ou morto
+        """
+        self.ativo = False
+        self.despejado = True
+        self.fila.clear()
+        # O shutdown já desbloqueia o recv; o fechamento fica com a thread escritora,
+        # que tira o socket do seletor antes
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.escritor.agendar(self)
+
+    def fechar(self):
+        """
+        Fecha o canal depois de enviar os quadros já enfileirados
+        """
+        if not self.ativo:
+            return
+        self.ativo = False
+        self.fechando = True
+        self.escritor.agendar(self)
+
+    def desligar_socket(self):
+        if self.registrado:
+            self.escritor.desregistrar(self)
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+class Difusor:
+    """
+    Envia quadros para os clientes de uma partida, com um CanalSaida por cliente,
+    todos esvaziados pela thread do EscritorSaida
+    """
+    def __init__(self, capacidade=CAPACIDADE_FILA):
+        self.capacidade = capacidade
+        self.canais = {}
+        self.lock = threading.Lock()
+
+    def registrar(self, cliente_socket):
+        """
+        Cria o canal de saída de um cliente
+        """
+        with self.lock:
+            if cliente_socket not in self.canais:
+                self.canais[cliente_socket] = CanalSaida(cliente_socket, escritor_saida(), self.capacidade)
+
+    def remover(self, cliente_socket):
+        """
+        Remove o canal de um cliente que saiu, desligando o socket imediatamente
+        """
+        with self.lock:
+            canal = self.canais.pop(cliente_socket, None)
+        if canal:
+            canal.despejar()
+
+    def enviar(self, cliente_socket, *quadros):
+        """
+        Enfileira quadros para um único cliente
+        """
+        with self.lock:
+            canal = self.canais.get(cliente_socket)
+        if canal:
+            canal.enviar(b''.join(quadros))
+
+    def enviar_para_todos(self, quadro):
+        """
+        Enfileira um quadro para todos os clientes, em tempo O(clientes) sem esperar pela rede
+        """
+        with self.lock:
+            canais = list(self.canais.values())
+        for canal in canais:
+            canal.enviar(quadro)
+
+    def fechar_todos(self):
+        """
+        Fecha todos os canais depois de enviarem o que já está na fila
+        """
+        with self.lock:
+            canais = list(self.canais.values())
+            self.canais.clear()
+        for canal in canais:
+            canal.fechar()
+
+class DifusorAsync:
+    """
+    Difusor do servidor asyncio: o buffer do transporte de cada StreamWriter é a
+    fila de saída do cliente, e tudo roda no loop de eventos, sem threads nem lock
+
+    Um cliente fechado ou com mais de LIMITE_BUFFER_ASYNC bytes pendentes é
+    despejado: o escritor é fechado, e o leitor do cliente recebe EOF e o remove
+    da partida pelo caminho normal de desconexão (nunca de dentro de um envio).
+    """
+    def __init__(self, limite=LIMITE_BUFFER_ASYNC):
+        self.limite = limite
+        # Escritores registrados, em ordem de entrada (dicionário usado como conjunto)
+        self.escritores = {}
+
+    def registrar(self, escritor):
+        self.escritores[escritor] = None
+
+    def remover(self, escritor):
+        """
+        Remove o escritor de um cliente que saiu e o fecha
+        """
+        self.escritores.pop(escritor, None)
+        escritor.close()
+
+    def enviar(self, escritor, *quadros):
+        """
+        Enfileira quadros no buffer de saída de um único cliente
+        """
+        if escritor in self.escritores and not escritor.is_closing():
+            escritor.write(b''.join(quadros))
+
+    def enviar_para_todos(self, quadro):
+        """
+        Enfileira um quadro no buffer de saída de todos os clientes, despejando os lentos ou fechados
+        """
+        for escritor in list(self.escritores):
+            if escritor.is_closing() or escritor.transport.get_write_buffer_size() > self.limite:
+                self.remover(escritor)
+            else:
+                escritor.write(quadro)
+
+    def fechar_todos(self):
+        """
+        Fecha todos os escritores; o transporte envia o que está no buffer antes de fechar
+        """
+        escritores = list(self.escritores)
+        self.escritores.clear()
+        for escritor in escritores:
+            escritor.close()
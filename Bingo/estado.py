@@ -0,0 +1,413 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from cartela import CartelaBingo, GerenciadorCartelas, BIT_CENTRO
+
+# Tipos de sala do app: '1' = Sala Particular, '2' = Sala Pública
+TIPOS_SALA = ("1", "2")
+
+# Travas do processo para as salas, distribuídas por hash do código
+FAIXAS_TRAVAS = 64
+
+# Validade de uma trava entre processos (segundos): a de um worker que morreu expira sozinha
+DURACAO_TRAVA = 30
+
+def normalizar_tipo_sala(tipo_sala):
+    """
+    O app trata qualquer tipo diferente de '1' como Sala Pública
+    """
+    return "1" if tipo_sala == "1" else "2"
+
+def cartela_para_json(cartela):
+    """
+    A semente da cartela, ou a matriz de números das cartelas sem semente; com
+    marcações feitas pelo jogador, {"cartela": ..., "marcacao": máscara}
+    """
+    item = cartela.semente if cartela.semente is not None else cartela.cartela_numeros.tolist()
+    if cartela.marcacao_jogador != BIT_CENTRO:
+        item = {"cartela": item, "marcacao": cartela.marcacao_jogador}
+    return item
+
+def cartela_de_json(item):
+    marcacao = BIT_CENTRO
+    if isinstance(item, dict):
+        item, marcacao = item["cartela"], item["marcacao"]
+    cartela = CartelaBingo(semente=item) if isinstance(item, int) else CartelaBingo(np.array(item))
+    cartela.marcacao_jogador = marcacao
+    return cartela
+
+def cartelas_para_json(gerenciador):
+    """
+    Serializa as cartelas de um jogador (ver cartela_para_json)
+    """
+    return json.dumps([cartela_para_json(cartela) for cartela in gerenciador.cartelas])
+
+def cartelas_de_json(texto):
+    """
+    Reconstrói o GerenciadorCartelas serializado por cartelas_para_json
+    """
+    return GerenciadorCartelas(cartelas=[cartela_de_json(item) for item in json.loads(texto)])
+
+class ImpressoesSala:
+    """
+    Conjunto das impressões digitais das cartelas em jogo em uma sala, guardado no estado
+
+    Serve de `emitidas` para o GerenciadorCartelas: cada consulta e cada acréscimo
+    vão direto ao armazenamento, sem carregar o conjunto inteiro.
+    """
+    def __init__(self, estado, tipo_sala, codigo):
+        self.estado = estado
+        self.tipo_sala = tipo_sala
+        self.codigo = codigo
+
+    def __contains__(self, impressao):
+        return self.estado.impressao_emitida(self.tipo_sala, self.codigo, impressao)
+
+    def add(self, impressao):
+        self.estado.adicionar_impressao(self.tipo_sala, self.codigo, impressao)
+
+class EstadoBase:
+    """
+    Transações dos estados: transacao(tipo_sala, codigo) dá acesso exclusivo a uma
+    sala, e transacao() sem sala toma a trava global, que fica só para o lobby
+
+    Salas diferentes não disputam a mesma trava. A trava global pode ser tomada
+    dentro da de uma sala, nunca o contrário. As transações são reentrantes por
+    green thread: só o nível mais externo trava.
+    """
+    def __init__(self):
+        self.travas = [threading.RLock() for _ in range(FAIXAS_TRAVAS)]
+        self.trava_global = threading.RLock()
+
+        # Profundidade das transações de cada green thread, por chave da trava
+        self.local = threading.local()
+
+        # Histograma da espera pelas travas (opcional, ligado pelo app)
+        self.espera = None
+
+    @contextmanager
+    def transacao(self, tipo_sala=None, codigo=None):
+        chave = None if codigo is None else (normalizar_tipo_sala(tipo_sala), codigo)
+        profundidades = self.local.__dict__.setdefault("profundidades", {})
+        if profundidades.get(chave):
+            profundidades[chave] += 1
+            try:
+                yield
+            finally:
+                profundidades[chave] -= 1
+            return
+
+        lock = self.trava_global if chave is None else self.travas[hash(chave) % FAIXAS_TRAVAS]
+        inicio = time.perf_counter()
+        with lock:
+            token = self._travar(chave)
+            if self.espera is not None:
+                self.espera.observar(time.perf_counter() - inicio)
+            profundidades[chave] = 1
+            try:
+                yield
+            finally:
+                del profundidades[chave]
+                self._destravar(chave, token)
+
+    def _travar(self, chave):
+        """
+        Trava a chave para os outros processos (nada a fazer com um só worker)
+
+        :return: Token entregue a _destravar
+        """
+        return None
+
+    def _destravar(self, chave, token):
+        pass
+
+class EstadoMemoria(EstadoBase):
+    """
+    Estado das salas em dicionários do processo; serve apenas a um worker
+    """
+    compartilhado = False
+
+    def __init__(self):
+        super().__init__()
+        # Salas por tipo (tipo_sala -> código -> dicionário da sala)
+        self.salas = {tipo: {} for tipo in TIPOS_SALA}
+
+        # Cartelas dos jogadores (nome_jogador -> GerenciadorCartelas)
+        self.cartelas = {}
+
+        # Índice reverso: sala atual de cada jogador, por tipo (tipo_sala -> nome_jogador -> código)
+        self.salas_jogadores = {tipo: {} for tipo in TIPOS_SALA}
+
+        # Impressões das cartelas em jogo em cada sala ((tipo_sala, código) -> set de bytes)
+        self.impressoes = {}
+
+    def obter_sala(self, tipo_sala, codigo):
+        return self.salas[normalizar_tipo_sala(tipo_sala)].get(codigo)
+
+    def salvar_sala(self, tipo_sala, codigo, sala):
+        # Os dicionários já são os próprios objetos guardados; salvar só registra salas novas
+        self.salas[normalizar_tipo_sala(tipo_sala)][codigo] = sala
+
+    def remover_sala(self, tipo_sala, codigo):
+        self.salas[normalizar_tipo_sala(tipo_sala)].pop(codigo, None)
+        self.impressoes.pop((normalizar_tipo_sala(tipo_sala), codigo), None)
+
+    def listar_salas(self, tipo_sala):
+        """
+        :return: Lista de (código, sala) do tipo informado
+        """
+        return list(self.salas[normalizar_tipo_sala(tipo_sala)].items())
+
+    def impressao_emitida(self, tipo_sala, codigo, impressao):
+        return impressao in self.impressoes.get((normalizar_tipo_sala(tipo_sala), codigo), ())
+
+    def adicionar_impressao(self, tipo_sala, codigo, impressao):
+        self.impressoes.setdefault((normalizar_tipo_sala(tipo_sala), codigo), set()).add(impressao)
+
+    def remover_impressoes(self, tipo_sala, codigo, impressoes):
+        self.impressoes.get((normalizar_tipo_sala(tipo_sala), codigo), set()).difference_update(impressoes)
+
+    def obter_cartelas(self, nome_jogador):
+        return self.cartelas.get(nome_jogador)
+
+    def salvar_cartelas(self, nome_jogador, gerenciador):
+        self.cartelas[nome_jogador] = gerenciador
+
+    def remover_cartelas(self, nome_jogador):
+        self.cartelas.pop(nome_jogador, None)
+
+    def obter_sala_jogador(self, tipo_sala, nome_jogador):
+        """
+        :return: Código da sala do jogador no tipo informado, ou None
+        """
+        return self.salas_jogadores[normalizar_tipo_sala(tipo_sala)].get(nome_jogador)
+
+    def salvar_sala_jogador(self, tipo_sala, nome_jogador, codigo):
+        self.salas_jogadores[normalizar_tipo_sala(tipo_sala)][nome_jogador] = codigo
+
+    def remover_sala_jogador(self, tipo_sala, nome_jogador, codigo):
+        """
+        Remove a entrada do jogador se ela ainda aponta para a sala informada
+        """
+        salas = self.salas_jogadores[normalizar_tipo_sala(tipo_sala)]
+        if salas.get(nome_jogador) == codigo:
+            del salas[nome_jogador]
+
+class EstadoCompartilhado(EstadoBase):
+    """
+    Base dos estados compartilhados entre processos: as salas são guardadas em
+    JSON e toda alteração precisa de salvar_sala/salvar_cartelas
+
+    Cada escrita vale na hora, como no estado em memória; _travar/_destravar
+    estendem a trava de cada sala (e a global) aos outros workers.
+    """
+    compartilhado = True
+
+    @staticmethod
+    def _nome_trava(chave):
+        return "global" if chave is None else f"{chave[0]}:{chave[1]}"
+
+class EstadoSQLite(EstadoCompartilhado):
+    """
+    Estado em um arquivo SQLite, compartilhado pelos workers da mesma máquina
+
+    Um caminho em /dev/shm mantém o banco em memória compartilhada.
+    """
+    def __init__(self, caminho):
+        super().__init__()
+        import sqlite3
+
+        # Sem transação implícita: cada comando é confirmado sozinho, e a conexão é
+        # usada pelas green threads de todas as salas
+        self.conexao = sqlite3.connect(caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS salas (tipo_sala TEXT, codigo TEXT, dados TEXT, PRIMARY KEY (tipo_sala, codigo))")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS cartelas (nome_jogador TEXT PRIMARY KEY, dados TEXT)")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS salas_jogadores (tipo_sala TEXT, nome_jogador TEXT, codigo TEXT, "
+                             "PRIMARY KEY (tipo_sala, nome_jogador))")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS impressoes (tipo_sala TEXT, codigo TEXT, impressao BLOB, "
+                             "PRIMARY KEY (tipo_sala, codigo, impressao)) WITHOUT ROWID")
+        # Uma linha por trava tomada ('global' ou 'tipo:código'), com o processo dono e a validade
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS travas (chave TEXT PRIMARY KEY, dono TEXT, expira REAL)")
+        self.dono = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+    def _travar(self, chave):
+        # Toma a linha da trava se ela está livre ou vencida; senão tenta de novo
+        # (no máximo uma green thread do processo espera por cada trava)
+        nome = self._nome_trava(chave)
+        limite = time.monotonic() + DURACAO_TRAVA
+        pausa = 0.001
+        while True:
+            instante = time.time()
+            cursor = self.conexao.execute(
+                "INSERT INTO travas (chave, dono, expira) VALUES (?, ?, ?) ON CONFLICT (chave) DO UPDATE "
+                "SET dono = excluded.dono, expira = excluded.expira WHERE travas.expira < ?",
+                (nome, self.dono, instante + DURACAO_TRAVA, instante))
+            if cursor.rowcount == 1:
+                return None
+            if time.monotonic() > limite:
+                raise RuntimeError(f"Tempo esgotado aguardando a trava '{nome}' no SQLite")
+            time.sleep(pausa)
+            pausa = min(pausa * 2, 0.05)
+
+    def _destravar(self, chave, token):
+        self.conexao.execute("DELETE FROM travas WHERE chave = ? AND dono = ?", (self._nome_trava(chave), self.dono))
+
+    def obter_sala(self, tipo_sala, codigo):
+        linha = self.conexao.execute("SELECT dados FROM salas WHERE tipo_sala = ? AND codigo = ?",
+                                     (normalizar_tipo_sala(tipo_sala), codigo)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def salvar_sala(self, tipo_sala, codigo, sala):
+        self.conexao.execute("INSERT OR REPLACE INTO salas (tipo_sala, codigo, dados) VALUES (?, ?, ?)",
+                             (normalizar_tipo_sala(tipo_sala), codigo, json.dumps(sala)))
+
+    def remover_sala(self, tipo_sala, codigo):
+        self.conexao.execute("DELETE FROM salas WHERE tipo_sala = ? AND codigo = ?",
+                             (normalizar_tipo_sala(tipo_sala), codigo))
+        self.conexao.execute("DELETE FROM impressoes WHERE tipo_sala = ? AND codigo = ?",
+                             (normalizar_tipo_sala(tipo_sala), codigo))
+
+    def listar_salas(self, tipo_sala):
+        linhas = self.conexao.execute("SELECT codigo, dados FROM salas WHERE tipo_sala = ?",
+                                      (normalizar_tipo_sala(tipo_sala),)).fetchall()
+        return [(codigo, json.loads(dados)) for codigo, dados in linhas]
+
+    def impressao_emitida(self, tipo_sala, codigo, impressao):
+        return self.conexao.execute("SELECT 1 FROM impressoes WHERE tipo_sala = ? AND codigo = ? AND impressao = ?",
+                                    (normalizar_tipo_sala(tipo_sala), codigo, impressao)).fetchone() is not None
+
+    def adicionar_impressao(self, tipo_sala, codigo, impressao):
+        self.conexao.execute("INSERT OR IGNORE INTO impressoes (tipo_sala, codigo, impressao) VALUES (?, ?, ?)",
+                             (normalizar_tipo_sala(tipo_sala), codigo, impressao))
+
+    def remover_impressoes(self, tipo_sala, codigo, impressoes):
+        self.conexao.executemany("DELETE FROM impressoes WHERE tipo_sala = ? AND codigo = ? AND impressao = ?",
+                                 [(normalizar_tipo_sala(tipo_sala), codigo, impressao) for impressao in impressoes])
+
+    def obter_cartelas(self, nome_jogador):
+        linha = self.conexao.execute("SELECT dados FROM cartelas WHERE nome_jogador = ?", (nome_jogador,)).fetchone()
+        return cartelas_de_json(linha[0]) if linha else None
+
+    def salvar_cartelas(self, nome_jogador, gerenciador):
+        self.conexao.execute("INSERT OR REPLACE INTO cartelas (nome_jogador, dados) VALUES (?, ?)",
+                             (nome_jogador, cartelas_para_json(gerenciador)))
+
+    def remover_cartelas(self, nome_jogador):
+        self.conexao.execute("DELETE FROM cartelas WHERE nome_jogador = ?", (nome_jogador,))
+
+    def obter_sala_jogador(self, tipo_sala, nome_jogador):
+        linha = self.conexao.execute("SELECT codigo FROM salas_jogadores WHERE tipo_sala = ? AND nome_jogador = ?",
+                                     (normalizar_tipo_sala(tipo_sala), nome_jogador)).fetchone()
+        return linha[0] if linha else None
+
+    def salvar_sala_jogador(self, tipo_sala, nome_jogador, codigo):
+        self.conexao.execute("INSERT OR REPLACE INTO salas_jogadores (tipo_sala, nome_jogador, codigo) VALUES (?, ?, ?)",
+                             (normalizar_tipo_sala(tipo_sala), nome_jogador, codigo))
+
+    def remover_sala_jogador(self, tipo_sala, nome_jogador, codigo):
+        self.conexao.execute("DELETE FROM salas_jogadores WHERE tipo_sala = ? AND nome_jogador = ? AND codigo = ?",
+                             (normalizar_tipo_sala(tipo_sala), nome_jogador, codigo))
+
+class EstadoRedis(EstadoCompartilhado):
+    """
+    Estado em um servidor compatível com Redis, compartilhado por workers em várias máquinas
+    """
+    def __init__(self, url, prefixo="bingo"):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("O estado em Redis precisa do pacote 'redis' (pip install redis)")
+
+        self.cliente = redis.Redis.from_url(url, decode_responses=True)
+        self.prefixo = prefixo
+
+        # Remove a entrada do índice reverso só se ela ainda aponta para a sala
+        self.remover_se_igual = self.cliente.register_script(
+            "if redis.call('hget', KEYS[1], ARGV[1]) == ARGV[2] then return redis.call('hdel', KEYS[1], ARGV[1]) end return 0")
+
+    def _chave_salas(self, tipo_sala):
+        return f"{self.prefixo}:salas:{normalizar_tipo_sala(tipo_sala)}"
+
+    def _travar(self, chave):
+        # A global em bingo:trava; a de cada sala em bingo:trava:<tipo>:<código>
+        nome = f"{self.prefixo}:trava" if chave is None else f"{self.prefixo}:trava:{self._nome_trava(chave)}"
+        trava = self.cliente.lock(nome, timeout=DURACAO_TRAVA, blocking_timeout=DURACAO_TRAVA)
+        if not trava.acquire():
+            raise RuntimeError(f"Tempo esgotado aguardando a trava '{nome}' no Redis")
+        return trava
+
+    def _destravar(self, chave, token):
+        token.release()
+
+    def obter_sala(self, tipo_sala, codigo):
+        dados = self.cliente.hget(self._chave_salas(tipo_sala), codigo)
+        return json.loads(dados) if dados else None
+
+    def salvar_sala(self, tipo_sala, codigo, sala):
+        self.cliente.hset(self._chave_salas(tipo_sala), codigo, json.dumps(sala))
+
+    def remover_sala(self, tipo_sala, codigo):
+        self.cliente.hdel(self._chave_salas(tipo_sala), codigo)
+        self.cliente.delete(self._chave_impressoes(tipo_sala, codigo))
+
+    def listar_salas(self, tipo_sala):
+        return [(codigo, json.loads(dados)) for codigo, dados in self.cliente.hgetall(self._chave_salas(tipo_sala)).items()]
+
+    def _chave_impressoes(self, tipo_sala, codigo):
+        return f"{self.prefixo}:impressoes:{normalizar_tipo_sala(tipo_sala)}:{codigo}"
+
+    # As impressões vão em hexadecimal: o cliente decodifica as respostas como texto
+    def impressao_emitida(self, tipo_sala, codigo, impressao):
+        return bool(self.cliente.sismember(self._chave_impressoes(tipo_sala, codigo), impressao.hex()))
+
+    def adicionar_impressao(self, tipo_sala, codigo, impressao):
+        self.cliente.sadd(self._chave_impressoes(tipo_sala, codigo), impressao.hex())
+
+    def remover_impressoes(self, tipo_sala, codigo, impressoes):
+        impressoes = [impressao.hex() for impressao in impressoes]
+        if impressoes:
+            self.cliente.srem(self._chave_impressoes(tipo_sala, codigo), *impressoes)
+
+    def obter_cartelas(self, nome_jogador):
+        dados = self.cliente.hget(f"{self.prefixo}:cartelas", nome_jogador)
+        return cartelas_de_json(dados) if dados else None
+
+    def salvar_cartelas(self, nome_jogador, gerenciador):
+        self.cliente.hset(f"{self.prefixo}:cartelas", nome_jogador, cartelas_para_json(gerenciador))
+
+    def remover_cartelas(self, nome_jogador):
+        self.cliente.hdel(f"{self.prefixo}:cartelas", nome_jogador)
+
+    def _chave_salas_jogadores(self, tipo_sala):
+        return f"{self.prefixo}:salas_jogadores:{normalizar_tipo_sala(tipo_sala)}"
+
+    def obter_sala_jogador(self, tipo_sala, nome_jogador):
+        return self.cliente.hget(self._chave_salas_jogadores(tipo_sala), nome_jogador)
+
+    def salvar_sala_jogador(self, tipo_sala, nome_jogador, codigo):
+        self.cliente.hset(self._chave_salas_jogadores(tipo_sala), nome_jogador, codigo)
+
+    def remover_sala_jogador(self, tipo_sala, nome_jogador, codigo):
+        # Atômico: outra sala pode estar gravando a entrada do jogador ao mesmo tempo
+        self.remover_se_igual(keys=[self._chave_salas_jogadores(tipo_sala)], args=[nome_jogador, codigo])
+
+def criar_estado(url=None):
+    """
+    Cria o estado das salas a partir de uma URL
+
+    :param url: None ou 'memoria' (padrão, um worker), 'sqlite:///caminho.db'
+                ou 'redis://host:porta/banco' (também rediss:// e unix://)
+    """
+    if not url or url == "memoria":
+        return EstadoMemoria()
+    if url.startswith("sqlite:///"):
+        return EstadoSQLite(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return EstadoRedis(url)
+    raise ValueError(f"Backend de estado desconhecido: {url}")
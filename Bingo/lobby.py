@@ -0,0 +1,237 @@
+import base64
+import bisect
+import itertools
+import json
+import math
+import threading
+import time
+
+# Estados em que uma sala pública aparece no lobby
+ESTADOS_LOBBY = ("aguardando", "contagem")
+
+# Ordenações da consulta:
+# criacao = mais antigas primeiro, ocupacao = mais cheias primeiro,
+# contagem = menos tempo restante de contagem primeiro (salas aguardando no fim)
+ORDENS_LOBBY = ("criacao", "ocupacao", "contagem")
+
+# Tamanho padrão e máximo de uma página
+LIMITE_PAGINA = 20
+LIMITE_PAGINA_MAXIMO = 100
+
+# Salas examinadas por página, no máximo, além do limite, quando o filtro de vagas descarta salas
+FATOR_VARREDURA = 10
+
+class SalaLobby:
+    """
+    Entrada de uma sala no índice do lobby
+    """
+    __slots__ = ('codigo', 'jogadores', 'capacidade', 'estado', 'fim_contagem', 'criacao', 'sequencia', 'chaves')
+
+    def __init__(self, codigo, sequencia):
+        self.codigo = codigo
+        self.sequencia = sequencia
+        self.jogadores = 0
+        self.capacidade = None
+        self.estado = "aguardando"
+        self.fim_contagem = None
+        self.criacao = 0.0
+
+        # Chave atual da sala em cada ordenação (ordem -> tupla)
+        self.chaves = {}
+
+    def vagas(self):
+        """
+        :return: Lugares livres, ou None se a sala não tem limite de jogadores
+        """
+        if self.capacidade is None:
+            return None
+        return max(0, self.capacidade - self.jogadores)
+
+    def chave(self, ordem):
+        """
+        Chave de ordenação; a sequência no fim desempata e torna a chave única
+        """
+        if ordem == "criacao":
+            return (self.criacao, self.sequencia)
+        if ordem == "ocupacao":
+            ocupacao = self.jogadores / self.capacidade if self.capacidade else self.jogadores
+            return (-ocupacao, self.criacao, self.sequencia)
+        fim = self.fim_contagem if self.fim_contagem is not None else math.inf
+        return (fim, self.criacao, self.sequencia)
+
+def codificar_cursor(chave):
+    """
+    Cursor opaco com a chave da última sala examinada
+    """
+    return base64.urlsafe_b64encode(json.dumps(chave).encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    try:
+        chave = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))))
+    except (ValueError, TypeError, AttributeError, UnicodeError):
+        raise ValueError("Cursor inválido")
+    # Só números: outra chave não se compara com as das listas ordenadas
+    if not chave or not all(isinstance(valor, (int, float)) and not isinstance(valor, bool) for valor in chave):
+        raise ValueError("Cursor inválido")
+    return chave
+
+def inteiro_consulta(valor, nome):
+    """
+    Inteiro de um parâmetro da consulta, recebido como texto (TCP) ou JSON (Socket.IO)
+
+    :raise ValueError: Valor que não é um inteiro nem um texto com um inteiro
+    """
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValueError(f"{nome} inválido: {valor!r}")
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"{nome} inválido: {valor!r}")
+
+class IndiceLobby:
+    """
+    Índice das salas públicas disponíveis, mantido a cada entrada, saída e mudança de estado
+
+    Para cada ordenação e cada filtro de estado há uma lista ordenada de chaves,
+    então uma página é uma busca binária pelo cursor seguida da leitura de até
+    `limite` salas, sem percorrer todas as partidas nem segurar lock_partidas.
+    """
+    def __init__(self, relogio=time.monotonic):
+        # Função que retorna o instante atual em segundos (a mesma usada em fim_contagem)
+        self.relogio = relogio
+
+        # Salas indexadas (código -> SalaLobby) e salas por sequência (para resolver as chaves)
+        self.salas = {}
+        self.por_sequencia = {}
+        self.sequencia = itertools.count()
+
+        # Listas ordenadas de chaves ((ordem, estado ou None) -> lista)
+        self.listas = {(ordem, estado): [] for ordem in ORDENS_LOBBY for estado in (None,) + ESTADOS_LOBBY}
+
+        self.lock = threading.RLock()
+
+    def _retirar(self, sala):
+        for ordem, chave in sala.chaves.items():
+            for estado in (None, sala.estado):
+                lista = self.listas[(ordem, estado)]
+                posicao = bisect.bisect_left(lista, chave)
+                if posicao < len(lista) and lista[posicao] == chave:
+                    del lista[posicao]
+        sala.chaves = {}
+
+    def _inserir(self, sala):
+        for ordem in ORDENS_LOBBY:
+            chave = sala.chave(ordem)
+            sala.chaves[ordem] = chave
+            bisect.insort(self.listas[(ordem, None)], chave)
+            bisect.insort(self.listas[(ordem, sala.estado)], chave)
+
+    def atualizar(self, codigo, jogadores, estado, capacidade=None, fim_contagem=None, criacao=None):
+        """
+        Insere ou atualiza uma sala; estados fora de ESTADOS_LOBBY a retiram do índice
+
+        :param jogadores: Quantidade de jogadores na sala
+        :param capacidade: Máximo de jogadores, ou None se não há limite
+        :param fim_contagem: Instante (no relógio do índice) em que a contagem termina
+        :param criacao: Instante de criação, usado na ordem 'criacao' (padrão: ordem de inserção)
+        """
+        if estado not in ESTADOS_LOBBY:
+            self.remover(codigo)
+            return
+
+        with self.lock:
+            sala = self.salas.get(codigo)
+            if sala is None:
+                sala = SalaLobby(codigo, next(self.sequencia))
+                sala.criacao = criacao if criacao is not None else float(sala.sequencia)
+                self.salas[codigo] = sala
+                self.por_sequencia[sala.sequencia] = sala
+            elif (sala.jogadores, sala.capacidade, sala.estado, sala.fim_contagem) == (jogadores, capacidade, estado, fim_contagem):
+                return
+            else:
+                self._retirar(sala)
+
+            sala.jogadores = jogadores
+            sala.capacidade = capacidade
+            sala.estado = estado
+            sala.fim_contagem = fim_contagem if estado == "contagem" else None
+            self._inserir(sala)
+
+    def remover(self, codigo):
+        with self.lock:
+            sala = self.salas.pop(codigo, None)
+            if sala is not None:
+                self._retirar(sala)
+                del self.por_sequencia[sala.sequencia]
+
+    def recarregar(self, salas):
+        """
+        Reconstrói o índice a partir de uma lista de dicionários com os argumentos de atualizar()
+        """
+        with self.lock:
+            self.salas.clear()
+            self.por_sequencia.clear()
+            for lista in self.listas.values():
+                lista.clear()
+            for sala in salas:
+                self.atualizar(**sala)
+
+    def codigos(self):
+        """
+        :return: Códigos de todas as salas do índice, em ordem de criação
+        """
+        with self.lock:
+            return [self.por_sequencia[chave[-1]].codigo for chave in self.listas[("criacao", None)]]
+
+    def descrever(self, sala, agora):
+        restante = None
+        if sala.fim_contagem is not None:
+            restante = max(0, math.ceil(sala.fim_contagem - agora))
+        return {
+            "codigo": sala.codigo,
+            "jogadores": sala.jogadores,
+            "capacidade": sala.capacidade,
+            "vagas": sala.vagas(),
+            "estado": sala.estado,
+            "contagem": restante,
+        }
+
+    def consultar(self, estado=None, vagas_minimas=0, ordem="criacao", cursor=None, limite=LIMITE_PAGINA):
+        """
+        Uma página do lobby
+
+        :param estado: None (todos), 'aguardando' ou 'contagem'
+        :param vagas_minimas: Mínimo de lugares livres (salas sem limite sempre passam)
+        :param ordem: Uma de ORDENS_LOBBY
+        :param cursor: proximo_cursor da página anterior, ou None para a primeira
+        :param limite: Salas por página (até LIMITE_PAGINA_MAXIMO)
+        :return: Dicionário com 'partidas', 'proximo_cursor' (None na última página) e 'total'
+        """
+        if estado is not None and estado not in ESTADOS_LOBBY:
+            raise ValueError(f"Estado inválido: {estado}")
+        if ordem not in ORDENS_LOBBY:
+            raise ValueError(f"Ordem inválida: {ordem}")
+        limite = max(1, min(inteiro_consulta(limite, "Limite"), LIMITE_PAGINA_MAXIMO))
+        vagas_minimas = inteiro_consulta(vagas_minimas, "Número de vagas")
+        inicio_chave = decodificar_cursor(cursor) if cursor else None
+
+        with self.lock:
+            lista = self.listas[(ordem, estado)]
+            posicao = bisect.bisect_right(lista, inicio_chave) if inicio_chave is not None else 0
+            agora = self.relogio()
+
+            # O filtro de vagas é aplicado na leitura; a varredura por página é limitada
+            # e o cursor continua de onde ela parou
+            fim_varredura = min(len(lista), posicao + limite * FATOR_VARREDURA)
+            partidas = []
+            ultima = None
+            while posicao < fim_varredura and len(partidas) < limite:
+                ultima = lista[posicao]
+                sala = self.por_sequencia[ultima[-1]]
+                vagas = sala.vagas()
+                if vagas is None or vagas >= vagas_minimas:
+                    partidas.append(self.descrever(sala, agora))
+                posicao += 1
+
+            proximo_cursor = codificar_cursor(ultima) if ultima is not None and posicao < len(lista) else None
+            return {"partidas": partidas, "proximo_cursor": proximo_cursor, "total": len(lista)}
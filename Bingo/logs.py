@@ -0,0 +1,252 @@
+"""
+Logs estruturados do servidor, das partidas e do app
+
+Registrar uma mensagem não escreve nada: o registro vai para uma fila, e uma
+thread do sistema operacional (real mesmo com eventlet) o formata e escreve em
+lotes. Cada registro leva campos (sala, jogador, evento...), e os eventos
+frequentes de cada sala são amostrados e limitados por segundo antes de entrar
+na fila.
+
+Uso:
+    log = obter_logger(__name__)
+    log.info("Número sorteado", sala=codigo, evento="sorteio", numero=numero)
+
+Configuração de configurar_logs (ou das variáveis de ambiente):
+    BINGO_LOG_NIVEL      DEBUG, INFO (padrão), WARNING...
+    BINGO_LOG_FORMATO    texto (padrão) ou json (um objeto por linha)
+    BINGO_LOG_ARQUIVO    arquivo de saída (padrão: stdout)
+"""
+import atexit
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+
+# Logger pai de todos os loggers do jogo
+LOGGER_RAIZ = "bingo"
+
+# Eventos amostrados por sala: só 1 a cada N registros de cada sala é escrito
+AMOSTRAGEM_PADRAO = {"sorteio": 10, "contagem": 10}
+
+# Máximo de registros por segundo de cada (sala, evento); avisos e erros não são limitados
+LIMITE_POR_SALA = 20
+
+# Registros na fila além deste limite são descartados (e contados)
+LIMITE_FILA = 10_000
+
+# Registros escritos de uma vez pela thread de escrita
+LOTE_ESCRITA = 256
+
+# Argumentos próprios do logging; os demais argumentos nomeados viram campos do registro
+ARGUMENTOS_LOGGING = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+class AdaptadorCampos(logging.LoggerAdapter):
+    """
+    Logger que recebe os campos estruturados como argumentos nomeados
+    """
+    def process(self, msg, kwargs):
+        campos = {chave: kwargs.pop(chave) for chave in list(kwargs) if chave not in ARGUMENTOS_LOGGING}
+        kwargs["extra"] = {"campos": campos}
+        return msg, kwargs
+
+def obter_logger(nome):
+    """
+    :param nome: Nome do módulo (ex.: __name__)
+    :return: AdaptadorCampos de um logger filho de LOGGER_RAIZ
+    """
+    return AdaptadorCampos(logging.getLogger(f"{LOGGER_RAIZ}.{nome}"), {})
+
+class FiltroSalas(logging.Filter):
+    """
+    Amostragem e limite por segundo dos registros de cada (sala, evento)
+
+    Os registros suprimidos pelo limite são contados e informados no campo
+    "suprimidos" do próximo registro aceito da mesma sala e evento.
+    """
+    # Acima desta quantidade de chaves, as contagens são recomeçadas (salas que já terminaram)
+    MAXIMO_CHAVES = 10_000
+
+    def __init__(self, amostragem=None, limite=LIMITE_POR_SALA):
+        super().__init__()
+        self.amostragem = dict(AMOSTRAGEM_PADRAO if amostragem is None else amostragem)
+        self.limite = limite
+
+        # (sala, evento) -> registros vistos, para a amostragem
+        self.vistos = {}
+
+        # (sala, evento) -> [segundo, aceitos no segundo, suprimidos no segundo]
+        self.janelas = {}
+
+    def filter(self, registro):
+        campos = getattr(registro, "campos", None)
+        if not campos or "sala" not in campos or registro.levelno >= logging.WARNING:
+            return True
+
+        evento = campos.get("evento")
+        chave = (campos["sala"], evento)
+        if len(self.janelas) > self.MAXIMO_CHAVES:
+            self.vistos.clear()
+            self.janelas.clear()
+
+        amostra = self.amostragem.get(evento, 1)
+        if amostra > 1:
+            vistos = self.vistos.get(chave, 0)
+            self.vistos[chave] = vistos + 1
+            if vistos % amostra:
+                return False
+            campos["amostra"] = amostra
+
+        segundo = int(time.monotonic())
+        janela = self.janelas.get(chave)
+        if janela is None or janela[0] != segundo:
+            if janela is not None and janela[2]:
+                campos["suprimidos"] = janela[2]
+            janela = self.janelas[chave] = [segundo, 0, 0]
+        if janela[1] >= self.limite:
+            janela[2] += 1
+            return False
+        janela[1] += 1
+        return True
+
+class ManipuladorFila(logging.Handler):
+    """
+    Põe o registro na fila sem formatá-lo (a formatação é feita pela thread de escrita)
+    """
+    def __init__(self, fila, limite=LIMITE_FILA):
+        super().__init__()
+        self.fila = fila
+        self.limite = limite
+        self.descartados = 0
+
+    def emit(self, registro):
+        if self.fila.qsize() >= self.limite:
+            self.descartados += 1
+            return
+        self.fila.put_nowait(registro)
+
+class FormatadorEstruturado(logging.Formatter):
+    """
+    Uma linha por registro: texto com os campos como chave=valor, ou um objeto JSON
+    """
+    def __init__(self, formato="texto"):
+        super().__init__()
+        self.json = formato == "json"
+
+    def format(self, registro):
+        campos = getattr(registro, "campos", {})
+        modulo = registro.name[len(LOGGER_RAIZ) + 1:] if registro.name.startswith(LOGGER_RAIZ + ".") else registro.name
+        if self.json:
+            dados = {"instante": registro.created, "nivel": registro.levelname, "modulo": modulo,
+                     "mensagem": registro.getMessage(), **campos}
+            if registro.exc_info:
+                dados["excecao"] = self.formatException(registro.exc_info)
+            return json.dumps(dados, ensure_ascii=False, default=str)
+
+        texto = f"{self.formatTime(registro)} {registro.levelname} [{modulo}] {registro.getMessage()}"
+        if campos:
+            texto += " | " + " ".join(f"{chave}={valor}" for chave, valor in campos.items())
+        if registro.exc_info:
+            texto += "\n" + self.formatException(registro.exc_info)
+        return texto
+
+def modulo_original(nome):
+    """
+    Módulo da biblioteca padrão sem o monkey patching do eventlet (threading, queue)
+
+    A thread de escrita e a fila precisam ser do sistema operacional: uma fila
+    verde acordaria a thread de escrita pelo hub do eventlet, de outra thread.
+    """
+    if "eventlet" in sys.modules:
+        from eventlet import patcher
+        return patcher.original(nome)
+    return importlib.import_module(nome)
+
+class EscritorLogs:
+    """
+    Esvazia a fila de registros em lotes, formatando e escrevendo na saída
+    """
+    def __init__(self, fila, formatador, saida):
+        self.fila = fila
+        self.formatador = formatador
+        self.saida = saida
+        self.vazia = modulo_original("queue").Empty
+        self.thread = modulo_original("threading").Thread(target=self.executar)
+        self.thread.daemon = True
+
+    def iniciar(self):
+        self.thread.start()
+
+    def executar(self):
+        while True:
+            registros = [self.fila.get()]
+            while len(registros) < LOTE_ESCRITA:
+                try:
+                    registros.append(self.fila.get_nowait())
+                except self.vazia:
+                    break
+
+            linhas = []
+            encerrar = False
+            for registro in registros:
+                if registro is None:
+                    encerrar = True
+                    continue
+                try:
+                    linhas.append(self.formatador.format(registro) + "\n")
+                except Exception as e:
+                    linhas.append(f"Erro ao formatar registro de log {registro.msg!r}: {e}\n")
+            try:
+                self.saida.write("".join(linhas))
+                self.saida.flush()
+            except (OSError, ValueError):
+                pass
+            if encerrar:
+                return
+
+    def encerrar(self, espera=2):
+        """
+        Escreve os registros pendentes e para a thread
+        """
+        self.fila.put_nowait(None)
+        self.thread.join(espera)
+
+# Escritor da configuração atual (configurar_logs só configura uma vez por processo)
+_escritor = None
+
+def configurar_logs(nivel=None, formato=None, arquivo=None, amostragem=None, limite_por_sala=LIMITE_POR_SALA):
+    """
+    Liga os logs do jogo: fila, filtro por sala e thread de escrita
+
+    Sem configurar_logs, os loggers do jogo só mostram avisos e erros (pelo logging padrão).
+
+    :param nivel: Nível mínimo (padrão: BINGO_LOG_NIVEL ou INFO)
+    :param formato: 'texto' ou 'json' (padrão: BINGO_LOG_FORMATO ou texto)
+    :param arquivo: Caminho do arquivo de saída (padrão: BINGO_LOG_ARQUIVO ou stdout)
+    :param amostragem: Dicionário evento -> N (1 registro a cada N por sala); padrão AMOSTRAGEM_PADRAO
+    :param limite_por_sala: Máximo de registros por segundo de cada (sala, evento)
+    :return: EscritorLogs
+    """
+    global _escritor
+    if _escritor is not None:
+        return _escritor
+
+    nivel = nivel or os.environ.get("BINGO_LOG_NIVEL", "INFO")
+    formato = formato or os.environ.get("BINGO_LOG_FORMATO", "texto")
+    arquivo = arquivo or os.environ.get("BINGO_LOG_ARQUIVO")
+    saida = open(arquivo, "a", encoding="utf-8") if arquivo else sys.stdout
+
+    fila = modulo_original("queue").SimpleQueue()
+    manipulador = ManipuladorFila(fila)
+    manipulador.addFilter(FiltroSalas(amostragem, limite_por_sala))
+
+    logger = logging.getLogger(LOGGER_RAIZ)
+    logger.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    logger.addHandler(manipulador)
+    logger.propagate = False
+
+    _escritor = EscritorLogs(fila, FormatadorEstruturado(formato), saida)
+    _escritor.iniciar()
+    atexit.register(_escritor.encerrar)
+    return _escritor
@@ -0,0 +1,239 @@
+"""
+Métricas de operação do servidor e do app, no formato de texto do Prometheus
+
+Contadores e histogramas são listas de inteiros incrementadas sem lock: uma
+observação custa um bisect e um incremento. Sob o GIL, dois incrementos
+simultâneos no mesmo balde podem, raramente, contar como um; para métricas, a
+perda é aceitável e o custo fica baixo o bastante para deixá-las sempre ligadas.
+Os medidores (salas por estado, jogadores) são calculados só na leitura.
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# Limites superiores (em segundos) dos baldes de latência: de 10 us a ~10 s, dobrando
+LIMITES_LATENCIA = tuple(1e-5 * 2 ** expoente for expoente in range(21))
+
+# Janela (em segundos) das taxas por segundo
+JANELA_TAXA = 10
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Contador:
+    """
+    Contador monotônico, com a taxa por segundo dos últimos JANELA_TAXA segundos
+    """
+    def __init__(self, nome, descricao):
+        self.nome = nome
+        self.descricao = descricao
+        self.valor = 0
+
+        # Contagem de cada um dos últimos segundos, em um anel indexado pelo segundo
+        self.segundos = [0] * (JANELA_TAXA + 1)
+        self.contagens = [0] * (JANELA_TAXA + 1)
+
+    def incrementar(self, quantidade=1):
+        self.valor += quantidade
+        segundo = int(time.monotonic())
+        posicao = segundo % len(self.segundos)
+        if self.segundos[posicao] != segundo:
+            self.segundos[posicao] = segundo
+            self.contagens[posicao] = 0
+        self.contagens[posicao] += quantidade
+
+    def taxa(self):
+        """
+        Média por segundo nos últimos JANELA_TAXA segundos completos
+        """
+        atual = int(time.monotonic())
+        total = sum(contagem for segundo, contagem in zip(self.segundos, self.contagens)
+                    if atual - JANELA_TAXA <= segundo < atual)
+        return total / JANELA_TAXA
+
+    def exportar(self):
+        return [f"# HELP {self.nome}_total {self.descricao}",
+                f"# TYPE {self.nome}_total counter",
+                f"{self.nome}_total {self.valor}",
+                f"# HELP {self.nome}_por_segundo {self.descricao} (média dos últimos {JANELA_TAXA}s)",
+                f"# TYPE {self.nome}_por_segundo gauge",
+                f"{self.nome}_por_segundo {self.taxa():g}"]
+
+class Histograma:
+    """
+    Histograma de baldes fixos (padrão: LIMITES_LATENCIA)
+    """
+    __slots__ = ('nome', 'descricao', 'limites', 'contagens', 'soma')
+
+    def __init__(self, nome, descricao, limites=LIMITES_LATENCIA):
+        self.nome = nome
+        self.descricao = descricao
+        self.limites = limites
+
+        # Uma contagem por balde, mais o balde acima do último limite
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        contagens = list(self.contagens)
+        acumulado = 0
+        for limite, contagem in zip(self.limites, contagens):
+            acumulado += contagem
+            linhas.append(f'{self.nome}_bucket{{le="{limite:g}"}} {acumulado}')
+        acumulado += contagens[-1]
+        linhas.append(f'{self.nome}_bucket{{le="+Inf"}} {acumulado}')
+        linhas.append(f"{self.nome}_sum {self.soma:g}")
+        linhas.append(f"{self.nome}_count {acumulado}")
+        return linhas
+
+class Medidor:
+    """
+    Valor calculado na leitura; a função devolve um número ou um dicionário rótulo -> número
+    """
+    def __init__(self, nome, descricao, funcao, rotulo=None):
+        self.nome = nome
+        self.descricao = descricao
+        self.funcao = funcao
+        self.rotulo = rotulo
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} gauge"]
+        valor = self.funcao()
+        if isinstance(valor, dict):
+            linhas.extend(f'{self.nome}{{{self.rotulo}="{chave}"}} {quantidade:g}' for chave, quantidade in valor.items())
+        else:
+            linhas.append(f"{self.nome} {valor:g}")
+        return linhas
+
+class LockMedido:
+    """
+    Lock (ou RLock) que mede a espera por ele em um Histograma
+
+    Sem disputa, a aquisição é a tentativa sem bloqueio mais uma observação de espera zero.
+    """
+    __slots__ = ('lock', 'espera')
+
+    def __init__(self, lock, espera):
+        self.lock = lock
+        self.espera = espera
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.lock.acquire(False):
+            self.espera.observar(0.0)
+            return True
+        if not blocking:
+            return False
+        inicio = time.perf_counter()
+        adquirido = self.lock.acquire(True, timeout)
+        self.espera.observar(time.perf_counter() - inicio)
+        return adquirido
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *excecao):
+        self.release()
+
+class Metricas:
+    """
+    Conjunto de métricas de um processo, exportadas juntas em texto()
+    """
+    def __init__(self):
+        self.metricas = []
+
+    def adicionar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, descricao):
+        return self.adicionar(Contador(nome, descricao))
+
+    def histograma(self, nome, descricao, limites=LIMITES_LATENCIA):
+        return self.adicionar(Histograma(nome, descricao, limites))
+
+    def medidor(self, nome, descricao, funcao, rotulo=None):
+        return self.adicionar(Medidor(nome, descricao, funcao, rotulo))
+
+    def texto(self):
+        """
+        Todas as métricas no formato de texto do Prometheus
+        """
+        linhas = []
+        for metrica in self.metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+class MetricasBingo(Metricas):
+    """
+    Métricas comuns ao ServidorBingo e ao app; cada um registra seus medidores
+    (salas por estado, jogadores conectados)
+    """
+    def __init__(self):
+        super().__init__()
+        self.sorteios = self.contador('bingo_sorteios', 'Números sorteados em todas as salas')
+        self.difusao = self.histograma('bingo_difusao_segundos', 'Duração do envio de um evento a todos os jogadores de uma sala')
+        self.verificacao_bingo = self.histograma('bingo_verificacao_segundos', 'Duração da verificação de um pedido de BINGO')
+        self.atraso_agendador = self.histograma('bingo_atraso_loop_segundos', 'Atraso das tarefas do agendador em relação ao instante marcado (lag do loop de eventos)')
+
+class MetricasServidor(MetricasBingo):
+    """
+    Métricas do ServidorBingo: as comuns mais a espera pelos locks do servidor e das partidas
+    """
+    def __init__(self):
+        super().__init__()
+        self.espera_lock_partidas = self.histograma('bingo_espera_lock_partidas_segundos', 'Espera pelo lock_partidas do ServidorBingo')
+        self.espera_lock_partida = self.histograma('bingo_espera_lock_partida_segundos', 'Espera pelo lock de uma PartidaBingo')
+
+def servir_metricas(metricas, host='0.0.0.0', porta=9100, rotas=None):
+    """
+    Serve GET /metrics em uma thread própria
+
+    :param rotas: Rotas POST extras: caminho -> função(parâmetros, cabeçalhos) que devolve (status, texto)
+    :return: ThreadingHTTPServer (shutdown() para parar)
+    """
+    rotas = rotas or {}
+
+    class TratadorMetricas(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            corpo = metricas.texto().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', TIPO_CONTEUDO)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_POST(self):
+            caminho, _, consulta = self.path.partition('?')
+            if caminho not in rotas:
+                self.send_error(404)
+                return
+            status, texto = rotas[caminho](dict(parse_qsl(consulta)), self.headers)
+            corpo = (texto + '\n').encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), TratadorMetricas)
+    servidor.daemon_threads = True
+    thread = threading.Thread(target=servidor.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return servidor
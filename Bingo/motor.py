@@ -0,0 +1,136 @@
+import numpy as np
+from cartela import BIT_CENTRO
+from padroes import RegistroPadroes
+
+# Maior número que pode ser sorteado
+MAIOR_NUMERO = 75
+
+class MotorSala:
+    def __init__(self, capacidade=64, padroes=None):
+        # Padrões que valem como bingo, compilados em um array de máscaras
+        self.padroes = padroes or RegistroPadroes()
+        self.mascaras_padroes = np.array(self.padroes.mascaras_ativas, dtype=np.uint32)
+        self.nomes_padroes = [nome for _, nome in self.padroes.ativos]
+
+        # Quantidade de cartelas registradas
+        self.total_cartelas = 0
+
+        # Máscara de marcação de cada cartela da sala (uma linha por cartela)
+        self.mascaras = np.zeros(capacidade, dtype=np.uint32)
+
+        # Bit de cada número em cada cartela (0 se a cartela não tem o número)
+        self.bits_por_numero = np.zeros((MAIOR_NUMERO + 1, capacidade), dtype=np.uint32)
+
+        # Dono de cada linha: (nome_jogador, índice da cartela do jogador)
+        self.donos = []
+
+        # Linhas de cada jogador
+        self.linhas_por_jogador = {}
+
+        # Jogadores com algum padrão completo (nome_jogador -> índice da cartela)
+        self.vencedores = {}
+
+        # Padrão completado por cada vencedor
+        self.padroes_vencedores = {}
+
+        # Quantidade de números sorteados quando surgiu o primeiro vencedor
+        self.sorteio_vitoria = None
+
+        # Quantidade de números sorteados
+        self.total_sorteados = 0
+
+    def _garantir_capacidade(self, capacidade):
+        """
+        Aumenta os arrays (dobrando a capacidade) para caber mais cartelas
+        """
+        capacidade_atual = len(self.mascaras)
+        if capacidade <= capacidade_atual:
+            return
+
+        nova_capacidade = max(capacidade, capacidade_atual * 2)
+        mascaras = np.zeros(nova_capacidade, dtype=np.uint32)
+        mascaras[:capacidade_atual] = self.mascaras
+        bits_por_numero = np.zeros((MAIOR_NUMERO + 1, nova_capacidade), dtype=np.uint32)
+        bits_por_numero[:, :capacidade_atual] = self.bits_por_numero
+        self.mascaras = mascaras
+        self.bits_por_numero = bits_por_numero
+
+    def adicionar_cartela(self, nome_jogador, indice, cartela):
+        """
+        Registra uma cartela da sala no motor
+
+        :param nome_jogador: Dono da cartela
+        :param indice: Índice da cartela entre as cartelas do jogador
+        :param cartela: CartelaBingo a ser registrada
+        """
+        linha = self.total_cartelas
+        self._garantir_capacidade(linha + 1)
+
+        for numero, bit in cartela.posicoes():
+            self.bits_por_numero[numero, linha] = bit
+        # Só o centro começa marcado: as marcações do jogador não valem para o motor
+        self.mascaras[linha] = BIT_CENTRO
+
+        self.donos.append((nome_jogador, indice))
+        self.linhas_por_jogador.setdefault(nome_jogador, []).append(linha)
+        self.total_cartelas += 1
+
+    def adicionar_jogador(self, nome_jogador, gerenciador):
+        """
+        Registra todas as cartelas de um jogador
+
+        :param nome_jogador: Nome do jogador
+        :param gerenciador: GerenciadorCartelas do jogador
+        """
+        for indice, cartela in enumerate(gerenciador.cartelas, 1):
+            self.adicionar_cartela(nome_jogador, indice, cartela)
+
+    def remover_jogador(self, nome_jogador):
+        """
+        Desativa as cartelas de um jogador que saiu da sala
+        """
+        linhas = self.linhas_por_jogador.pop(nome_jogador, [])
+        if linhas:
+            self.bits_por_numero[:, linhas] = 0
+            self.mascaras[linhas] = 0
+        self.vencedores.pop(nome_jogador, None)
+        self.padroes_vencedores.pop(nome_jogador, None)
+
+    def sortear(self, numero):
+        """
+        Marca um número sorteado em todas as cartelas da sala de uma vez
+
+        :param numero: Número sorteado
+        :return: Lista com os jogadores que completaram um padrão neste sorteio
+        """
+        total = self.total_cartelas
+        self.total_sorteados += 1
+
+        # Marca o número em todas as cartelas com uma única operação
+        bits = self.bits_por_numero[numero, :total]
+        self.mascaras[:total] |= bits
+
+        # Só as cartelas que têm o número podem ter completado um padrão
+        tocadas = np.flatnonzero(bits)
+        mascaras = self.mascaras[tocadas]
+        completos = (mascaras[:, None] & self.mascaras_padroes) == self.mascaras_padroes
+
+        novos_vencedores = []
+        for posicao in np.flatnonzero(completos.any(axis=1)).tolist():
+            nome_jogador, indice = self.donos[tocadas[posicao]]
+            if nome_jogador not in self.vencedores:
+                self.vencedores[nome_jogador] = indice
+                self.padroes_vencedores[nome_jogador] = self.nomes_padroes[int(np.argmax(completos[posicao]))]
+                novos_vencedores.append(nome_jogador)
+
+        if novos_vencedores and self.sorteio_vitoria is None:
+            self.sorteio_vitoria = self.total_sorteados
+        return novos_vencedores
+
+    def verificar_bingo(self, nome_jogador):
+        """
+        Verifica se o jogador completou algum padrão em alguma cartela
+
+        :return: Índice da cartela completa, ou None
+        """
+        return self.vencedores.get(nome_jogador)
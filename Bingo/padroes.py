@@ -0,0 +1,107 @@
+from cartela import BIT_CENTRO, MASCARA_COMPLETA
+
+# Padrão usado quando nenhum outro é escolhido
+PADRAO_PADRAO = 'cartela_cheia'
+
+def mascara_de_posicoes(posicoes):
+    """
+    Compila uma lista de posições (linha, coluna) em uma máscara de 25 bits
+
+    O centro da cartela sempre faz parte da máscara, pois começa marcado.
+
+    :param posicoes: Iterável de tuplas (linha, coluna), com valores de 0 a 4
+    :return: Máscara de bits do padrão
+    """
+    mascara = BIT_CENTRO
+    for linha, coluna in posicoes:
+        if not (0 <= linha < 5 and 0 <= coluna < 5):
+            raise ValueError(f"Posição inválida no padrão: ({linha}, {coluna})")
+        mascara |= 1 << (linha * 5 + coluna)
+    return mascara
+
+# Padrões pré-definidos: nome -> máscaras alternativas (basta completar uma delas)
+PADROES_DISPONIVEIS = {
+    'linha': [mascara_de_posicoes((linha, coluna) for coluna in range(5)) for linha in range(5)],
+    'coluna': [mascara_de_posicoes((linha, coluna) for linha in range(5)) for coluna in range(5)],
+    'diagonal': [
+        mascara_de_posicoes((i, i) for i in range(5)),
+        mascara_de_posicoes((i, 4 - i) for i in range(5)),
+    ],
+    'quatro_cantos': [mascara_de_posicoes([(0, 0), (0, 4), (4, 0), (4, 4)])],
+    'x': [mascara_de_posicoes([(i, i) for i in range(5)] + [(i, 4 - i) for i in range(5)])],
+    'cartela_cheia': [MASCARA_COMPLETA],
+}
+
+class RegistroPadroes:
+    def __init__(self, padroes=None):
+        # Padrões conhecidos (nome -> máscaras)
+        self.padroes = {nome: list(mascaras) for nome, mascaras in PADROES_DISPONIVEIS.items()}
+
+        # Padrões ativos na partida, compilados em uma lista plana de (máscara, nome)
+        self.ativos = []
+        self.mascaras_ativas = []
+        self.nomes_ativos = []
+
+        self.ativar(padroes or [PADRAO_PADRAO])
+
+    def registrar(self, nome, posicoes):
+        """
+        Registra um padrão personalizado
+
+        :param nome: Nome do padrão
+        :param posicoes: Lista de (linha, coluna), ou lista de listas de
+                         posições para um padrão com várias alternativas
+        """
+        if posicoes and isinstance(posicoes[0][0], (list, tuple)):
+            self.padroes[nome] = [mascara_de_posicoes(alternativa) for alternativa in posicoes]
+        else:
+            self.padroes[nome] = [mascara_de_posicoes(posicoes)]
+
+    def ativar(self, nomes):
+        """
+        Define os padrões que valem como bingo na partida
+
+        :param nomes: Lista de nomes de padrões registrados
+        """
+        for nome in nomes:
+            if nome not in self.padroes:
+                raise ValueError(f"Padrão desconhecido: {nome}")
+
+        self.ativos = [(mascara, nome) for nome in nomes for mascara in self.padroes[nome]]
+        self.mascaras_ativas = [mascara for mascara, _ in self.ativos]
+        self.nomes_ativos = list(nomes)
+
+    def para_texto(self):
+        """
+        Serializa os padrões ativos no formato nome=máscara,máscara;nome=...
+        """
+        return ";".join(
+            f"{nome}=" + ",".join(str(mascara) for mascara in self.padroes[nome])
+            for nome in self.nomes_ativos
+        )
+
+    @classmethod
+    def de_texto(cls, texto):
+        """
+        Cria um registro com os padrões ativos serializados por para_texto
+        """
+        registro = cls()
+        nomes = []
+        for item in texto.split(";"):
+            nome, mascaras = item.split("=", 1)
+            registro.padroes[nome] = [int(mascara) for mascara in mascaras.split(",")]
+            nomes.append(nome)
+        registro.ativar(nomes)
+        return registro
+
+    def verificar(self, mascara_marcacao):
+        """
+        Verifica se uma máscara de marcação completa algum padrão ativo
+
+        :param mascara_marcacao: Máscara de 25 bits de uma cartela
+        :return: Nome do padrão completado, ou None
+        """
+        for mascara, nome in self.ativos:
+            if mascara_marcacao & mascara == mascara:
+                return nome
+        return None
@@ -1,10 +1,20 @@
-import socket
 import threading
 import time
-import random
+from array import array
+from collections import defaultdict
+from agendador import Agendador
+from cartela import GerenciadorCartelas, MAX_CARTELAS, BITS_POSICOES
+from padroes import RegistroPadroes
+from difusao import Difusor
+from protocolo import quadro_texto, quadro_numero
+from registro_eventos import nova_semente, ordem_sorteio
+from metricas import LockMedido
+from logs import obter_logger
+
+log = obter_logger(__name__)
 
 class PartidaBingo:
-    def __init__(self, codigo_partida, min_clientes=2, max_clientes=30, tempo_espera=6, publica=True):
+    def __init__(self, codigo_partida, min_clientes=2, max_clientes=30, tempo_espera=6, publica=True, pool_cartelas=None, padroes=None, agendador=None, registro=None, semente=None, metricas=None):
         # Identificador da partida
         self.codigo_partida = codigo_partida
         
@@ -24,6 +34,27 @@ class PartidaBingo:
         # Números já sorteados
         self.numeros_sorteados = []
         
+        # Cartelas emitidas pelo servidor (cliente_socket -> GerenciadorCartelas)
+        self.pool_cartelas = pool_cartelas
+        self.gerenciadores = {}
+        
+        # Impressões digitais das cartelas em jogo na sala: nenhuma cartela se repete
+        self.impressoes = set()
+        
+        # Cartelas em jogo na sala, uma por linha: (cliente_socket, índice da cartela, cartela),
+        # ou None depois que o dono sai; e as linhas de cada cliente
+        self.cartelas_sala = []
+        self.linhas_jogador = defaultdict(list)
+        
+        # Índice invertido compacto: número -> array de (linha << 5 | posição na cartela)
+        self.indice_sorteio = defaultdict(lambda: array('I'))
+        
+        # Padrões que valem como bingo nesta partida
+        self.padroes = RegistroPadroes(padroes)
+        
+        # Clientes com algum padrão completo (cliente_socket -> (índice da cartela, padrão))
+        self.cartelas_completas = {}
+        
         # Tempo entre os sorteios em segundos
         self.tempo_para_sorteio = 1 #Tempo para testes
         # self.tempo_para_sorteio = 3 #Tempo de espera entre os sorteios 
@@ -34,14 +65,65 @@ class PartidaBingo:
         self.partida_encerrada = False
         self.bingo_verificado = False  # Nova flag para controlar se um bingo já foi verificado
         
-        # Thread de sorteio
-        self.thread_sorteio = None
+        # Agendador que dispara os sorteios e a contagem de espera, e as tarefas pendentes
+        self.agendador = agendador or Agendador()
+        self.tarefa_sorteio = None
+        self.tarefa_temporizador = None
+        
+        # Números ainda não sorteados, em ordem de sorteio
+        self.numeros_disponiveis = []
+        
+        # Instante (no relógio do agendador) em que a contagem de espera termina, se houver
+        self.fim_contagem = None
+        
+        # Função chamada com a partida após entradas, saídas e mudanças de estado (ex.: índice do lobby)
+        self.ao_mudar = None
+        
+        # Semente da partida: define a ordem dos sorteios e permite reproduzi-la
+        self.semente = semente if semente is not None else nova_semente()
+        
+        # Registro de eventos (RegistroEventos) compartilhado pelo servidor, se houver
+        self.registro = registro
+        if self.registro:
+            self.registro.partida(self.codigo_partida, self.semente, self.padroes)
+        
+        # Métricas do servidor (MetricasBingo), se houver
+        self.metricas = metricas
         
         # Lock para sincronização
-        self.lock = threading.Lock()
+        self.lock = self.criar_lock()
+        
+        # Filas de saída dos clientes; envios nunca esperam pela rede com o lock
+        self.difusor = self.criar_difusor()
         
-        print(f"Partida {self.codigo_partida} criada. Status: {'Pública' if self.publica else 'Privada'}. Aguardando jogadores...")
+        log.info("Partida criada, aguardando jogadores", sala=self.codigo_partida, evento="criada", publica=self.publica)
 
+    def criar_lock(self):
+        """
+        Lock da partida; com métricas, a espera por ele é medida
+        """
+        lock = threading.Lock()
+        return LockMedido(lock, self.metricas.espera_lock_partida) if self.metricas else lock
+    
+    def criar_difusor(self):
+        """
+        Difusor dos quadros aos clientes: um CanalSaida por socket
+        """
+        return Difusor()
+    
+    def agendar_sorteio(self):
+        """
+        Encerra a contagem de espera e agenda o primeiro sorteio (chamado com o lock)
+        """
+        self.agendador.cancelar(self.tarefa_temporizador)
+        self.tarefa_sorteio = self.agendador.agendar(0, self.sortear_numero)
+    
+    def cancelar_tarefas(self):
+        """
+        Cancela o próximo sorteio e a contagem de espera, sem esperar que disparem (chamado com o lock)
+        """
+        self.agendador.cancelar(self.tarefa_sorteio)
+        self.agendador.cancelar(self.tarefa_temporizador)
     
     def adicionar_cliente(self, cliente_socket, nome_jogador):
         """
@@ -50,99 +132,208 @@ class PartidaBingo:
         with self.lock:
             # Verifica se o jogo já começou
             if self.jogo_em_andamento:
-                print(f"\nJogo já em andamento. {nome_jogador} não pode entrar na partida {self.codigo_partida}.")
+                log.info("Entrada recusada: jogo em andamento", sala=self.codigo_partida, jogador=nome_jogador, evento="entrada_recusada")
                 return "jogo_em_andamento"
                 
             if cliente_socket not in self.clientes:
                 self.clientes.append(cliente_socket)
                 self.clientes_prontos.append(cliente_socket)
                 self.nomes_jogadores[cliente_socket] = nome_jogador
-                print(f"\nJogador '{nome_jogador}' conectado à partida {self.codigo_partida}. Total: {len(self.clientes_prontos)}/{self.max_clientes}")
+                self.registrar_saida(cliente_socket)
+
+                # Emite a cartela inicial do jogador
+                gerenciador = GerenciadorCartelas(self.pool_cartelas, emitidas=self.impressoes)
+                self.gerenciadores[cliente_socket] = gerenciador
+                self.registrar_cartela(cliente_socket, 0, gerenciador.cartelas[0])
+                if self.registro:
+                    self.registro.entrada(self.codigo_partida, nome_jogador)
+                    self.registro.cartela(self.codigo_partida, nome_jogador, 0, gerenciador.cartelas[0])
+                log.info("Jogador conectado", sala=self.codigo_partida, jogador=nome_jogador, evento="entrada",
+                         jogadores=len(self.clientes_prontos), maximo=self.max_clientes)
             
             # Verifica se atingiu o máximo de jogadores
             if len(self.clientes_prontos) >= self.max_clientes and not self.sorteio_iniciado:
-                print(f"\nNúmero máximo de jogadores atingido na partida {self.codigo_partida}. Iniciando o jogo...")
-                return True
+                log.info("Máximo de jogadores atingido, iniciando o jogo", sala=self.codigo_partida, evento="sala_cheia")
+                resultado = True
             
             # Se atingiu o mínimo, pode iniciar o temporizador
-            if len(self.clientes_prontos) >= self.min_clientes and not self.sorteio_iniciado:
-                print(f"\nMínimo de jogadores atingido na partida {self.codigo_partida}. Aguardando mais jogadores ou início da partida...")
-                return "iniciar_temporizador"
+            elif len(self.clientes_prontos) >= self.min_clientes and not self.sorteio_iniciado:
+                log.info("Mínimo de jogadores atingido, iniciando a espera", sala=self.codigo_partida, evento="minimo_atingido")
+                resultado = "iniciar_temporizador"
             
-            return False
+            else:
+                resultado = False
+        
+        self.notificar_mudanca()
+        return resultado
+    
+    def notificar_mudanca(self):
+        """
+        Avisa ao_mudar (fora do lock da partida) que jogadores ou estado mudaram
+        """
+        if self.ao_mudar is not None:
+            self.ao_mudar(self)
+    
+    def registrar_cartela(self, cliente_socket, indice, cartela):
+        """
+        Registra as posições de uma cartela no índice invertido (chamado com o lock)
+        
+        Os números são derivados da semente só aqui; a cartela continua guardando
+        apenas a semente e a máscara de marcação.
+        """
+        linha = len(self.cartelas_sala)
+        self.cartelas_sala.append((cliente_socket, indice, cartela))
+        self.linhas_jogador[cliente_socket].append(linha)
+        for numero, bit in cartela.posicoes():
+            self.indice_sorteio[numero].append(linha << 5 | (bit.bit_length() - 1))
+    
+    def adicionar_cartela(self, cliente_socket):
+        """
+        Emite uma nova cartela para o cliente, respeitando o limite por jogador
+        
+        :return: A nova CartelaBingo, ou None se não for possível emitir
+        """
+        with self.lock:
+            gerenciador = self.gerenciadores.get(cliente_socket)
+            if gerenciador is None or self.jogo_em_andamento or len(gerenciador.cartelas) >= MAX_CARTELAS:
+                return None
+            
+            cartela = gerenciador.nova_cartela()
+            gerenciador.cartelas.append(cartela)
+            self.registrar_cartela(cliente_socket, len(gerenciador.cartelas) - 1, cartela)
+            if self.registro:
+                self.registro.cartela(self.codigo_partida, self.nomes_jogadores[cliente_socket], len(gerenciador.cartelas) - 1, cartela)
+            return cartela
+    
+    def cartelas_do_jogador(self, cliente_socket):
+        """
+        Retorna as cartelas emitidas para o cliente
+        """
+        with self.lock:
+            gerenciador = self.gerenciadores.get(cliente_socket)
+            return list(gerenciador.cartelas) if gerenciador else []
+    
+    def descartar_cartelas(self, cliente_socket):
+        """
+        Remove as cartelas do cliente do índice invertido (chamado com o lock)
+        
+        As linhas do cliente viram None; as entradas do índice que apontam para
+        elas são ignoradas no sorteio.
+        """
+        gerenciador = self.gerenciadores.pop(cliente_socket, None)
+        if gerenciador:
+            for cartela in gerenciador.cartelas:
+                self.impressoes.discard(cartela.impressao)
+        for linha in self.linhas_jogador.pop(cliente_socket, ()):
+            self.cartelas_sala[linha] = None
+        self.cartelas_completas.pop(cliente_socket, None)
+    
+    def marcar_numero_sorteado(self, numero):
+        """
+        Marca o número apenas nas cartelas que o contêm (chamado com o lock)
+        """
+        for entrada in self.indice_sorteio.pop(numero, ()):
+            cartela_sala = self.cartelas_sala[entrada >> 5]
+            if cartela_sala is None:
+                continue
+            cliente_socket, indice, cartela = cartela_sala
+            cartela.marcar_posicao(BITS_POSICOES[entrada & 31])
+            if cliente_socket not in self.cartelas_completas:
+                padrao = self.padroes.verificar(cartela.mascara_marcacao)
+                if padrao:
+                    self.cartelas_completas[cliente_socket] = (indice, padrao)
+    
+    def registrar_saida(self, cliente_socket):
+        """
+        Cria a fila de saída do cliente (chamado com o lock)
+        """
+        self.difusor.registrar(cliente_socket)
+    
+    def enviar_para(self, cliente_socket, *quadros):
+        """
+        Enfileira quadros para um único cliente
+        """
+        self.difusor.enviar(cliente_socket, *quadros)
     
     def remover_cliente(self, cliente_socket):
         """
         Remove um cliente da partida e notifica outros jogadores
         """
         with self.lock:
-            nome_jogador = "Jogador desconhecido"
-            if cliente_socket in self.nomes_jogadores:
-                nome_jogador = self.nomes_jogadores[cliente_socket]
-                del self.nomes_jogadores[cliente_socket]
+            # Um cliente despejado pode ser removido por mais de um caminho
+            if cliente_socket not in self.nomes_jogadores and cliente_socket not in self.clientes:
+                cancelar = None
+            else:
+                nome_jogador = self.nomes_jogadores.pop(cliente_socket, "Jogador desconhecido")
                 
-            if cliente_socket in self.clientes:
-                self.clientes.remove(cliente_socket)
-            if cliente_socket in self.clientes_prontos:
-                self.clientes_prontos.remove(cliente_socket)
-            
-            try:
-                cliente_socket.shutdown(socket.SHUT_RDWR)
-                cliente_socket.close()
-            except:
-                pass
-            
-            print(f"Jogador '{nome_jogador}' desconectado da partida {self.codigo_partida}. Jogadores restantes: {len(self.clientes_prontos)}")
-            
-            # Notificar todos os jogadores sobre a saída
-            self.enviar_mensagem_para_todos(f"JOGADOR_SAIU:{nome_jogador}")
-            
-            # Se não houver jogadores suficientes durante o jogo, finaliza
-            if self.jogo_em_andamento and len(self.clientes_prontos) < self.min_clientes:
-                print(f"\nNão há jogadores suficientes para continuar a partida {self.codigo_partida}. Encerrando jogo...")
-                self.finalizar_jogo('JOGO_CANCELADO:Não há jogadores suficientes')
-                return "partida_cancelada"
-            
+                if cliente_socket in self.clientes:
+                    self.clientes.remove(cliente_socket)
+                if cliente_socket in self.clientes_prontos:
+                    self.clientes_prontos.remove(cliente_socket)
+                
+                # Remove as cartelas do jogador do índice invertido
+                self.descartar_cartelas(cliente_socket)
+                if self.registro:
+                    self.registro.saida(self.codigo_partida, nome_jogador)
+                
+                cancelar = self.jogo_em_andamento and len(self.clientes_prontos) < self.min_clientes
+        
+        # Desliga o socket e notifica os outros jogadores fora do lock
+        self.difusor.remover(cliente_socket)
+        if cancelar is None:
             return "cliente_removido"
+        
+        self.notificar_mudanca()
+        log.info("Jogador desconectado", sala=self.codigo_partida, jogador=nome_jogador, evento="saida",
+                 jogadores=len(self.clientes_prontos))
+        self.enviar_mensagem_para_todos(f"JOGADOR_SAIU:{nome_jogador}")
+        
+        # Se não houver jogadores suficientes durante o jogo, finaliza
+        if cancelar:
+            log.info("Jogadores insuficientes, encerrando o jogo", sala=self.codigo_partida, evento="cancelada")
+            self.finalizar_jogo('JOGO_CANCELADO:Não há jogadores suficientes')
+            return "partida_cancelada"
+        
+        return "cliente_removido"
     
     def verificar_bingo(self, cliente_socket):
         """
-        Verifica se um cliente fez bingo
+        Verifica se um cliente fez bingo, consultando as cartelas emitidas pelo servidor
         """
+        inicio = time.perf_counter()
         with self.lock:
             # Verifica se já houve um bingo anteriormente
             if self.bingo_verificado:
-                print(f"Outro jogador já fez bingo nesta partida. Ignorando nova solicitação.")
+                log.info("Pedido de bingo ignorado: outro jogador já venceu", sala=self.codigo_partida,
+                         jogador=self.nomes_jogadores.get(cliente_socket), evento="bingo_ignorado")
+                if self.registro:
+                    self.registro.bingo(self.codigo_partida, self.nomes_jogadores.get(cliente_socket, "Jogador desconhecido"), False)
                 return False
-                
-            # Marca que um bingo já foi verificado
-            self.bingo_verificado = True
-            
-            # Para o jogo imediatamente
-            self.jogo_em_andamento = False
-            
-            vencedor = self.nomes_jogadores.get(cliente_socket, "Jogador desconhecido")
-            print(f"\n--- BINGO! {vencedor} venceu a partida {self.codigo_partida}! ---")
-            
-            # Notifica todos os jogadores sobre o vencedor
-            mensagem_vencedor = f'BINGO_VENCEDOR:{vencedor}'
-            
-            # Envia a mensagem para cada cliente individualmente com um pequeno delay
-            clientes_copia = self.clientes.copy()
-            for cliente in clientes_copia:
-                try:
-                    cliente.send(mensagem_vencedor.encode('utf-8'))
-                    time.sleep(0.5)  # Aguarda meio segundo entre cada envio
-                except:
-                    pass
             
-            # Aguarda um momento para garantir que todos recebam a mensagem
-            time.sleep(3)
-            
-            # Finaliza o jogo imediatamente
-            self.finalizar_jogo('BINGO_VENCEDOR', vencedor)
-            
-            return True
+            # Verifica se alguma cartela do cliente está completa
+            valido = cliente_socket in self.cartelas_completas
+            if valido:
+                # Marca que um bingo já foi verificado e para o jogo imediatamente
+                self.bingo_verificado = True
+                self.jogo_em_andamento = False
+                indice, padrao = self.cartelas_completas[cliente_socket]
+            nome = self.nomes_jogadores.get(cliente_socket, "Jogador desconhecido")
+            if self.registro:
+                self.registro.bingo(self.codigo_partida, nome, valido)
+        if self.metricas:
+            self.metricas.verificacao_bingo.observar(time.perf_counter() - inicio)
+        
+        if not valido:
+            log.info("Bingo inválido", sala=self.codigo_partida, jogador=nome, evento="bingo_invalido")
+            self.enviar_para(cliente_socket, quadro_texto('BINGO_INVALIDO'))
+            return False
+        
+        log.info("BINGO!", sala=self.codigo_partida, jogador=nome, evento="bingo", padrao=padrao, cartela=indice + 1)
+        
+        # Finaliza o jogo (fora do lock), notificando todos os jogadores sobre o vencedor
+        self.finalizar_jogo('BINGO_VENCEDOR', nome)
+        
+        return True
 
     def iniciar_jogo(self):
         """
@@ -155,95 +346,75 @@ class PartidaBingo:
             self.jogo_em_andamento = True
             self.sorteio_iniciado = True
             
-            # Inicia a thread de sorteio
-            self.thread_sorteio = threading.Thread(target=self.iniciar_sorteio)
-            self.thread_sorteio.daemon = True  # Thread em segundo plano
-            self.thread_sorteio.start()
+            # Ordem dos sorteios derivada da semente (invertida, pois os números saem do fim)
+            self.numeros_disponiveis = ordem_sorteio(self.semente)[::-1]
             
+            # O primeiro sorteio é imediato; os seguintes são agendados por sortear_numero
+            log.info("Iniciando sorteio", sala=self.codigo_partida, evento="inicio")
+            self.fim_contagem = None
+            self.agendar_sorteio()
+        
+        self.notificar_mudanca()
         return True
     
-    def iniciar_sorteio(self):
+    def sortear_numero(self):
         """
-        Método para sortear números a cada 3 segundos
+        Sorteia um número e agenda o próximo sorteio para daqui a tempo_para_sorteio segundos
         """
-        # Cria uma lista de números de 1 a 75 e embaralha
-        numeros_disponiveis = list(range(1, 76))
-        random.shuffle(numeros_disponiveis)
-        
-        print(f"\nIniciando sorteio para a partida {self.codigo_partida}")
+        if self.sortear_proximo():
+            self.tarefa_sorteio = self.agendador.agendar(self.tempo_para_sorteio, self.sortear_numero)
+    
+    def sortear_proximo(self):
+        """
+        Sorteia o próximo número, envia aos clientes e finaliza a partida se ela acabou
         
-        while self.jogo_em_andamento and len(self.numeros_sorteados) < 75:
-            # Cópia local da flag para evitar condições de corrida
-            if not self.jogo_em_andamento:
-                print(f"\nSorteio interrompido - jogo não está mais em andamento")
-                break
-                
-            # Pega o próximo número da lista embaralhada
-            numero = numeros_disponiveis.pop()
-            with self.lock:
-                if not self.jogo_em_andamento:
-                    break
-                self.numeros_sorteados.append(numero)
-            
-            # Imprime a lista de números sorteados
-            print(f"\n--- Partida {self.codigo_partida} - Números Sorteados ---")
-            print(self.numeros_sorteados)
-            print(f"Total de números sorteados: {len(self.numeros_sorteados)}")
-            
-            # Envia o número para todos os clientes
-            self.enviar_numero(numero)
-            
-            # Verifica se ainda há clientes conectados
-            if not self.clientes:
-                print(f"Todos os clientes desconectados da partida {self.codigo_partida}. Encerrando jogo.")
-                self.finalizar_jogo('TODOS_DESCONECTADOS')
-                break
-            
-            # Verifica novamente se o jogo ainda está em andamento
+        :return: True se a partida segue e o próximo sorteio deve ser agendado
+        """
+        with self.lock:
             if not self.jogo_em_andamento:
-                print(f"\nSorteio interrompido após enviar número - jogo finalizado")
-                break
-                
-            # Pausa entre os sorteios
-            for _ in range(self.tempo_para_sorteio * 10):  # dividir em pequenos intervalos para checagem frequente
-                if not self.jogo_em_andamento:
-                    print(f"\nSorteio interrompido durante tempo de espera - jogo finalizado")
-                    break
-                time.sleep(0.1)  # pausa de 0.1 segundo
+                return False
             
-            # Verificação final antes de continuar o loop
-            if not self.jogo_em_andamento:
-                break
+            # Pega o próximo número da lista embaralhada
+            numero = self.numeros_disponiveis.pop()
+            self.numeros_sorteados.append(numero)
+            self.marcar_numero_sorteado(numero)
+            restantes = len(self.numeros_disponiveis)
+            if self.registro:
+                self.registro.sorteio(self.codigo_partida, numero)
+        if self.metricas:
+            self.metricas.sorteios.incrementar()
+        
+        log.info("Número sorteado", sala=self.codigo_partida, evento="sorteio", numero=numero,
+                 sorteados=len(self.numeros_sorteados))
+        
+        # Envia o número para todos os clientes
+        self.enviar_numero(numero)
         
-        # Finaliza o jogo se não foi finalizado por bingo e ainda está em andamento
-        if self.jogo_em_andamento:
-            print(f"\nTodos os números sorteados ou limite atingido. Finalizando partida {self.codigo_partida}.")
+        # Verifica se ainda há clientes conectados
+        if not self.clientes:
+            log.info("Todos os jogadores desconectados, encerrando o jogo", sala=self.codigo_partida, evento="abandonada")
+            self.finalizar_jogo('TODOS_DESCONECTADOS')
+            return False
+        if not restantes:
+            log.info("Todos os números sorteados, finalizando a partida", sala=self.codigo_partida, evento="numeros_esgotados")
             self.finalizar_jogo('FIM_JOGO')
+            return False
+        return self.jogo_em_andamento
     
     def enviar_numero(self, numero):
         """
-        Envia um número para todos os clientes conectados de forma segura
+        Enfileira um número para todos os clientes conectados
+        
+        Clientes lentos ou desconectados são despejados pelo difusor e removidos
+        pela própria thread de atendimento, fora do lock da partida.
         """
-        with self.lock:
-            # Se o jogo não estiver mais em andamento, não envia nada
-            if not self.jogo_em_andamento:
-                return
-                
-            clientes_remover = []
-            for cliente in self.clientes[:]:  # Cria uma cópia da lista para iterar
-                try:
-                    cliente.send(str(numero).encode('utf-8'))
-                except (socket.error, ConnectionError):  # Especifica melhor os erros
-                    clientes_remover.append(cliente)
-            
-            # Remove clientes desconectados
-            for cliente in clientes_remover:
-                self.remover_cliente(cliente)
-            
-            # Se não houver mais clientes, finaliza o jogo
-            if not self.clientes:
-                print(f"\nTodos os clientes desconectados da partida {self.codigo_partida}. Encerrando jogo.")
-                self.finalizar_jogo('TODOS_DESCONECTADOS')
+        # Se o jogo não estiver mais em andamento, não envia nada
+        if not self.jogo_em_andamento:
+            return
+        inicio = time.perf_counter()
+        self.difusor.enviar_para_todos(quadro_numero(numero))
+        if self.metricas:
+            self.metricas.difusao.observar(time.perf_counter() - inicio)
     
     def finalizar_jogo(self, mensagem='FIM_JOGO', vencedor=None):
         """
@@ -254,8 +425,6 @@ class PartidaBingo:
             if self.partida_encerrada:
                 return
             
-            print(f"\nFinalizando partida {self.codigo_partida} com mensagem: {mensagem}")
-            
             # Define flags de estado
             self.jogo_em_andamento = False
             self.sorteio_iniciado = False
@@ -268,49 +437,32 @@ class PartidaBingo:
                 mensagem_final = 'JOGO_CANCELADO:Não há jogadores suficientes'
             else:
                 mensagem_final = mensagem
-            
-            # Envia a mensagem para todos os clientes
-            clientes_copia = self.clientes.copy()
-            for cliente in clientes_copia:
-                try:
-                    cliente.send(mensagem_final.encode('utf-8'))
-                    time.sleep(0.5)  # Aumenta o tempo de espera para garantir que a mensagem seja recebida
-                except:
-                    pass
-            
-            # Aguarda um momento para garantir que todos recebam a mensagem
-            time.sleep(2)
-            
-            # Fecha as conexões de todos os clientes
-            for cliente in clientes_copia:
-                try:
-                    cliente.shutdown(socket.SHUT_RDWR)
-                    cliente.close()
-                except:
-                    pass
+            if self.registro:
+                self.registro.fim(self.codigo_partida, mensagem_final)
             
             # Limpa as listas diretamente
             self.clientes.clear()
             self.clientes_prontos.clear()
             self.nomes_jogadores.clear()
-            
-            print(f"\nPartida {self.codigo_partida} finalizada com sucesso.")
+            self.gerenciadores.clear()
+            self.impressoes.clear()
+            self.indice_sorteio.clear()
+            self.cartelas_sala.clear()
+            self.linhas_jogador.clear()
+            self.cartelas_completas.clear()
+            
+            # Cancela o próximo sorteio e a contagem de espera
+            self.cancelar_tarefas()
+        
+        # Enfileira a mensagem final; cada canal fecha o socket depois de esvaziar a fila
+        self.difusor.enviar_para_todos(quadro_texto(mensagem_final))
+        self.difusor.fechar_todos()
+        self.notificar_mudanca()
+        
+        log.info("Partida finalizada", sala=self.codigo_partida, evento="fim", mensagem=mensagem_final)
                 
     def enviar_mensagem_para_todos(self, mensagem):
         """
-        Envia uma mensagem para todos os clientes conectados
+        Enfileira uma mensagem para todos os clientes conectados
         """
-        with self.lock:
-            clientes_remover = []
-            for cliente in self.clientes[:]:  # Cria uma cópia da lista para iterar
-                try:
-                    # Envia a mensagem
-                    cliente.send(mensagem.encode('utf-8'))
-                    # Aguarda um momento para garantir que a mensagem seja enviada
-                    time.sleep(0.1)
-                except:
-                    clientes_remover.append(cliente)
-            
-            # Remove clientes desconectados
-            for cliente in clientes_remover:
-                self.remover_cliente(cliente)
+        self.difusor.enviar_para_todos(quadro_texto(mensagem))
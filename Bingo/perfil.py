@@ -0,0 +1,249 @@
+"""
+Perfil de CPU sob demanda, por amostragem, de uma sala ou de funções escolhidas
+
+Sem perfil ativo nada é instalado: nenhum hook de profile, nenhum wrapper nos
+handlers. Um perfil ativo é uma thread do sistema operacional que, a cada
+INTERVALO_AMOSTRA, lê a pilha atual de cada thread (sys._current_frames; com
+eventlet, a do greenlet em execução) e guarda as que passam por uma das
+funções-alvo e/ou pertencem à sala-alvo. Ao final, grava em um arquivo:
+    colapsado   uma linha "raiz;...;folha amostras" por pilha (flamegraph.pl, speedscope)
+    pstats      estatísticas no formato do cProfile (python -m pstats arquivo, snakeviz);
+                os tempos são estimados pelas amostras e as "chamadas" contam amostras
+
+As amostras são de tempo de parede: no servidor.py, threads paradas esperando a
+rede (recv) também aparecem, enquanto com eventlet e asyncio só o código em
+execução é lido.
+
+Uma pilha pertence a uma sala quando algum quadro dela tem a variável local
+codigo ou codigo_partida (ou self.codigo_partida) igual ao código da sala.
+
+Parâmetros de iniciar_perfil_de_parametros (rota POST /admin/perfil do app e do
+servidor de métricas do servidor.py, com o cabeçalho X-Token-Admin):
+    funcoes    nomes separados por vírgula (ex.: handle_bingo,entrar_partida)
+    sala       código da sala
+    segundos   duração (padrão: 10, até DURACAO_MAXIMA)
+    formato    colapsado (padrão) ou pstats
+"""
+import hmac
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from logs import modulo_original
+
+# Intervalo (em segundos) entre duas leituras das pilhas; com threads ocupadas, a
+# leitura ainda espera pelo GIL (sys.getswitchinterval(), 5 ms por padrão)
+INTERVALO_AMOSTRA = 0.005
+
+# Duração máxima de um perfil, em segundos
+DURACAO_MAXIMA = 300
+
+FORMATOS = ('colapsado', 'pstats')
+
+# Variáveis locais que identificam a sala de um quadro
+LOCAIS_SALA = ('codigo', 'codigo_partida')
+
+class PerfilEmAndamento(ValueError):
+    """
+    Já há um perfil em andamento neste processo (HTTP 409 nas rotas de administração)
+    """
+
+def token_admin_valido(token):
+    """
+    Confere o token de administração com BINGO_TOKEN_ADMIN; sem a variável, nenhum token vale
+    """
+    esperado = os.environ.get('BINGO_TOKEN_ADMIN')
+    if not esperado or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), esperado.encode('utf-8'))
+
+def codigos_funcoes(nomes, *origens):
+    """
+    Objetos de código das funções nomeadas, procuradas em cada origem (módulo ou classe), na ordem
+
+    :raise ValueError: Nome que não é uma função de nenhuma das origens
+    """
+    codigos = set()
+    for nome in nomes:
+        for origem in origens:
+            codigo = getattr(getattr(origem, nome, None), '__code__', None)
+            if codigo is not None:
+                codigos.add(codigo)
+                break
+        else:
+            raise ValueError(f"Função desconhecida: {nome}")
+    return codigos
+
+class PerfilAmostrado:
+    """
+    Amostras das pilhas que passam pelas funções-alvo e pertencem à sala-alvo
+    (sem funções, qualquer pilha da sala; sem sala, qualquer pilha das funções)
+    """
+    def __init__(self, codigos=(), sala=None, intervalo=INTERVALO_AMOSTRA):
+        self.codigos = frozenset(codigos)
+        self.sala = sala
+        self.intervalo = intervalo
+
+        # Pilha (tupla de (arquivo, linha, função), da raiz à folha) -> amostras
+        self.pilhas = Counter()
+        self.leituras = 0
+
+        self.parar = modulo_original('threading').Event()
+        self.thread = None
+
+    def sala_do_quadro(self, quadro):
+        nomes = quadro.f_code.co_varnames
+        if 'self' not in nomes and not any(nome in nomes for nome in LOCAIS_SALA):
+            return None
+        locais = quadro.f_locals
+        for nome in LOCAIS_SALA:
+            if locais.get(nome) is not None:
+                return locais[nome]
+        return getattr(locais.get('self'), 'codigo_partida', None)
+
+    def alvo(self, quadro):
+        """
+        True se a pilha do quadro passa por uma função-alvo e pertence à sala-alvo
+        """
+        na_funcao = not self.codigos
+        na_sala = self.sala is None
+        while quadro is not None and not (na_funcao and na_sala):
+            if not na_funcao and quadro.f_code in self.codigos:
+                na_funcao = True
+            if not na_sala and self.sala_do_quadro(quadro) == self.sala:
+                na_sala = True
+            quadro = quadro.f_back
+        return na_funcao and na_sala
+
+    def amostrar(self, propria):
+        """
+        Uma leitura das pilhas de todas as threads, menos a do próprio perfil
+        """
+        for identificador, quadro in sys._current_frames().items():
+            if identificador == propria or not self.alvo(quadro):
+                continue
+            pilha = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                pilha.append((codigo.co_filename, codigo.co_firstlineno, codigo.co_name))
+                quadro = quadro.f_back
+            self.pilhas[tuple(reversed(pilha))] += 1
+        self.leituras += 1
+
+    def executar(self, duracao, arquivo, formato):
+        propria = modulo_original('threading').get_ident()
+        fim = time.monotonic() + duracao
+        while not self.parar.wait(self.intervalo) and time.monotonic() < fim:
+            self.amostrar(propria)
+        self.salvar(arquivo, formato)
+
+    def iniciar(self, duracao, arquivo, formato='colapsado'):
+        """
+        Amostra em uma thread própria por duracao segundos e grava o arquivo ao final
+        """
+        self.thread = modulo_original('threading').Thread(target=self.executar, args=(duracao, arquivo, formato))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def encerrar(self):
+        """
+        Para as amostras antes do fim da duração (o arquivo ainda é gravado)
+        """
+        self.parar.set()
+
+    def ativo(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def colapsado(self):
+        """
+        Pilhas no formato colapsado, da mais amostrada para a menos
+        """
+        linhas = []
+        for pilha, amostras in self.pilhas.most_common():
+            quadros = ";".join(f"{nome} ({os.path.basename(arquivo)}:{linha})" for arquivo, linha, nome in pilha)
+            linhas.append(f"{quadros} {amostras}\n")
+        return "".join(linhas)
+
+    def estatisticas(self):
+        """
+        Dicionário no formato do pstats: função -> (cc, nc, tt, ct, chamadores)
+        """
+        proprias = Counter()
+        inclusivas = Counter()
+        chamadores = defaultdict(Counter)
+        for pilha, amostras in self.pilhas.items():
+            proprias[pilha[-1]] += amostras
+            # Funções recursivas contam uma vez por amostra
+            for funcao in set(pilha):
+                inclusivas[funcao] += amostras
+            for chamador, funcao in set(zip(pilha, pilha[1:])):
+                chamadores[funcao][chamador] += amostras
+        return {funcao: (amostras, amostras, proprias[funcao] * self.intervalo, amostras * self.intervalo,
+                         dict(chamadores[funcao]))
+                for funcao, amostras in inclusivas.items()}
+
+    def salvar(self, arquivo, formato):
+        if formato == 'pstats':
+            with open(arquivo, 'wb') as saida:
+                marshal.dump(self.estatisticas(), saida)
+        else:
+            with open(arquivo, 'w', encoding='utf-8') as saida:
+                saida.write(self.colapsado())
+
+# Perfil em andamento neste processo (um de cada vez); a checagem e o início
+# acontecem com _lock_perfil, para que duas requisições não iniciem dois perfis
+_perfil = None
+_lock_perfil = threading.Lock()
+
+def iniciar_perfil(codigos=(), sala=None, segundos=10, formato='colapsado', diretorio=None):
+    """
+    Inicia um perfil em segundo plano
+
+    :param codigos: Objetos de código das funções-alvo (ver codigos_funcoes)
+    :param sala: Código da sala-alvo
+    :param segundos: Duração do perfil
+    :param formato: 'colapsado' ou 'pstats'
+    :param diretorio: Diretório do arquivo (padrão: BINGO_DIR_PERFIS ou o diretório temporário)
+    :return: Caminho do arquivo, gravado ao fim do perfil
+    :raise ValueError: Sem alvo, duração ou formato inválidos
+    :raise PerfilEmAndamento: Outro perfil em andamento
+    """
+    global _perfil
+    if not codigos and sala is None:
+        raise ValueError("Informe uma sala ou ao menos uma função")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use {' ou '.join(FORMATOS)})")
+    if not 0 < segundos <= DURACAO_MAXIMA:
+        raise ValueError(f"Duração inválida: {segundos} (até {DURACAO_MAXIMA}s)")
+
+    diretorio = diretorio or os.environ.get('BINGO_DIR_PERFIS') or tempfile.gettempdir()
+    extensao = 'pstats' if formato == 'pstats' else 'txt'
+    arquivo = os.path.join(diretorio, f"perfil_{os.getpid()}_{time.strftime('%Y%m%d_%H%M%S')}.{extensao}")
+
+    with _lock_perfil:
+        if _perfil is not None and _perfil.ativo():
+            raise PerfilEmAndamento("Já há um perfil em andamento neste processo")
+        _perfil = PerfilAmostrado(codigos, sala)
+        _perfil.iniciar(segundos, arquivo, formato)
+    return arquivo
+
+def iniciar_perfil_de_parametros(parametros, *origens):
+    """
+    Inicia um perfil a partir dos parâmetros de uma requisição (funcoes, sala, segundos, formato)
+
+    :param parametros: Dicionário de parâmetros (strings)
+    :param origens: Módulos ou classes onde as funções são procuradas
+    :return: Caminho do arquivo, gravado ao fim do perfil
+    :raise ValueError: Parâmetros inválidos
+    :raise PerfilEmAndamento: Outro perfil em andamento
+    """
+    nomes = [nome.strip() for nome in parametros.get('funcoes', '').split(',') if nome.strip()]
+    try:
+        segundos = float(parametros.get('segundos', 10))
+    except ValueError:
+        raise ValueError(f"Duração inválida: {parametros.get('segundos')}")
+    return iniciar_perfil(codigos_funcoes(nomes, *origens), parametros.get('sala') or None,
+                          segundos, parametros.get('formato', 'colapsado'))
@@ -0,0 +1,163 @@
+"""
+Simulador Monte Carlo das chances de uma sala
+
+Quantos sorteios uma sala com N jogadores e K cartelas cada leva até o
+primeiro vencedor, e com que probabilidade há empate (dois ou mais jogadores
+completando o padrão no mesmo sorteio), para cada padrão.
+
+As cartelas são geradas como em CartelaBingo.gerar_cartela (sementes
+derivadas por cartelas_das_sementes) e os jogos são simulados em lote com
+NumPy: para cada jogo, o instante em que cada número sai; para cada cartela, o
+instante em que cada padrão se completa é o máximo dos instantes das posições
+do padrão (o mínimo entre as alternativas). Os lotes são divididos entre
+processos.
+
+Uso (a partir da pasta Bingo):
+    python -m probabilidades --jogadores 20 --cartelas 3 --padroes linha,cartela_cheia --jogos 1000000
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cartela import gerar_sementes, cartelas_das_sementes, POSICOES_CARTELA
+from padroes import RegistroPadroes
+
+# Maior número sorteado (e quantidade de sorteios de um jogo completo)
+MAIOR_NUMERO = 75
+
+# Cartelas simuladas por lote em cada processo (limita a memória: ~1 KB por cartela)
+CARTELAS_POR_LOTE = 100_000
+
+def posicoes_padroes(padroes):
+    """
+    Posições de cada alternativa de cada padrão
+
+    :param padroes: Lista de nomes de padrões
+    :return: Dicionário nome -> lista de arrays de posições (0 a 24)
+    """
+    registro = RegistroPadroes(padroes)
+    return {
+        nome: [np.array([posicao for posicao in range(POSICOES_CARTELA) if mascara >> posicao & 1])
+               for mascara in registro.padroes[nome]]
+        for nome in registro.nomes_ativos
+    }
+
+def simular_lote(jogos, jogadores, cartelas, padroes, gerador):
+    """
+    Simula um lote de jogos
+
+    :return: Dicionário nome -> (histograma de sorteios até o primeiro vencedor, jogos com empate)
+    """
+    total_cartelas = jogadores * cartelas
+    sementes = gerar_sementes(jogos * total_cartelas, gerador)
+    numeros = cartelas_das_sementes(sementes).reshape(jogos, total_cartelas * POSICOES_CARTELA)
+    # O centro (-1) aponta para a coluna 0, sempre "sorteada" no instante 0
+    numeros[numeros < 0] = 0
+
+    # Instante (1 a 75) em que cada número sai em cada jogo
+    ordem = gerador.permuted(np.broadcast_to(np.arange(1, MAIOR_NUMERO + 1), (jogos, MAIOR_NUMERO)), axis=1)
+    instantes = np.zeros((jogos, MAIOR_NUMERO + 1), dtype=np.int8)
+    np.put_along_axis(instantes, ordem, np.arange(1, MAIOR_NUMERO + 1, dtype=np.int8)[None, :], axis=1)
+
+    # Instante em que cada posição de cada cartela é marcada: (jogos, cartelas, 25)
+    marcacao = np.take_along_axis(instantes, numeros, axis=1).reshape(jogos, total_cartelas, POSICOES_CARTELA)
+
+    resultados = {}
+    for nome, alternativas in padroes.items():
+        conclusao = np.min([marcacao[:, :, posicoes].max(axis=2) for posicoes in alternativas], axis=0)
+        por_jogador = conclusao.reshape(jogos, jogadores, cartelas).min(axis=2)
+        primeiro = por_jogador.min(axis=1)
+        empates = int(np.count_nonzero((por_jogador == primeiro[:, None]).sum(axis=1) > 1))
+        resultados[nome] = (np.bincount(primeiro, minlength=MAIOR_NUMERO + 1), empates)
+    return resultados
+
+def simular(jogos, jogadores, cartelas, nomes_padroes, semente):
+    """
+    Simula `jogos` jogos em lotes de até CARTELAS_POR_LOTE cartelas (executado em cada processo)
+    """
+    gerador = np.random.default_rng(semente)
+    padroes = posicoes_padroes(nomes_padroes)
+    jogos_por_lote = max(1, CARTELAS_POR_LOTE // (jogadores * cartelas))
+
+    totais = {nome: (np.zeros(MAIOR_NUMERO + 1, dtype=np.int64), 0) for nome in padroes}
+    restantes = jogos
+    while restantes > 0:
+        lote = min(jogos_por_lote, restantes)
+        for nome, (histograma, empates) in simular_lote(lote, jogadores, cartelas, padroes, gerador).items():
+            totais[nome] = (totais[nome][0] + histograma, totais[nome][1] + empates)
+        restantes -= lote
+    return totais
+
+def percentil(histograma, fracao):
+    """
+    Menor quantidade de sorteios que cobre `fracao` dos jogos
+    """
+    acumulado = np.cumsum(histograma)
+    return int(np.searchsorted(acumulado, fracao * acumulado[-1]))
+
+def executar(jogos, jogadores, cartelas, padroes, processos=None, semente=None):
+    """
+    Divide os jogos entre os processos e soma os resultados
+
+    :return: Dicionário nome -> (histograma, jogos com empate)
+    """
+    processos = processos or os.cpu_count() or 1
+    tarefas = min(jogos, processos * 4)
+    sementes = np.random.SeedSequence(semente).spawn(tarefas)
+    divisao = [jogos // tarefas + (1 if indice < jogos % tarefas else 0) for indice in range(tarefas)]
+
+    totais = {}
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        parciais = executor.map(simular, divisao, [jogadores] * tarefas, [cartelas] * tarefas,
+                                [padroes] * tarefas, sementes)
+        for parcial in parciais:
+            for nome, (histograma, empates) in parcial.items():
+                histograma_total, empates_total = totais.get(nome, (0, 0))
+                totais[nome] = (histograma_total + histograma, empates_total + empates)
+    return totais
+
+def relatorio(totais, jogos, jogadores, cartelas, duracao, histograma=False):
+    print(f"\n=== {jogos} jogos, {jogadores} jogadores com {cartelas} cartela(s) cada "
+          f"({duracao:.2f}s, {jogos / duracao:.0f} jogos/s) ===")
+    print(f"{'padrão':<15}{'média':>8}{'p10':>6}{'p50':>6}{'p90':>6}{'p99':>6}{'empate':>10}")
+    for nome, (contagens, empates) in totais.items():
+        media = float(np.dot(np.arange(len(contagens)), contagens)) / jogos
+        print(f"{nome:<15}{media:>8.2f}" + "".join(f"{percentil(contagens, fracao):>6}" for fracao in (0.1, 0.5, 0.9, 0.99))
+              + f"{empates / jogos:>10.2%}")
+
+    if histograma:
+        for nome, (contagens, _) in totais.items():
+            print(f"\nSorteios até o primeiro vencedor ({nome}): probabilidade / acumulada")
+            acumulado = 0
+            for sorteios, quantidade in enumerate(contagens):
+                if quantidade:
+                    acumulado += quantidade
+                    print(f"{sorteios:>3}: {quantidade / jogos:8.4%} {acumulado / jogos:8.2%}")
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Chances de vitória e empate em uma sala de Bingo (Monte Carlo)")
+    parser.add_argument('--jogadores', type=int, default=10, help='Jogadores na sala')
+    parser.add_argument('--cartelas', type=int, default=1, help='Cartelas por jogador')
+    parser.add_argument('--padroes', default='linha,coluna,diagonal,quatro_cantos,x,cartela_cheia',
+                        help='Padrões (separados por vírgula), cada um simulado como o único padrão da sala')
+    parser.add_argument('--jogos', type=int, default=100_000, help='Jogos simulados')
+    parser.add_argument('--processos', type=int, default=None, help='Processos (padrão: um por núcleo)')
+    parser.add_argument('--semente', type=int, default=None, help='Semente, para repetir uma simulação')
+    parser.add_argument('--histograma', action='store_true', help='Mostra a distribuição completa')
+    return parser
+
+def main(argv=None):
+    argumentos = criar_parser().parse_args(argv)
+    padroes = argumentos.padroes.split(",")
+    # Valida os nomes antes de criar os processos
+    RegistroPadroes(padroes)
+
+    inicio = time.perf_counter()
+    totais = executar(argumentos.jogos, argumentos.jogadores, argumentos.cartelas, padroes,
+                      argumentos.processos, argumentos.semente)
+    relatorio(totais, argumentos.jogos, argumentos.jogadores, argumentos.cartelas,
+              time.perf_counter() - inicio, argumentos.histograma)
+
+if __name__ == "__main__":
+    main()
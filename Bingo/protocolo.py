@@ -0,0 +1,328 @@
+import asyncio
+import socket
+import struct
+from collections import deque
+import numpy as np
+from cartela import CartelaBingo, POSICOES_CARTELA, CARTELA_COMPACTA
+
+# Versão do protocolo; clientes com outra versão são recusados no handshake
+VERSAO_PROTOCOLO = 1
+ASSINATURA = b'BNG'
+
+# Tipos de quadro
+TIPO_HANDSHAKE = 0x01  # assinatura + versão (1 byte)
+TIPO_TEXTO = 0x02      # mensagem de controle em UTF-8
+TIPO_NUMERO = 0x03     # número sorteado (1 byte)
+TIPO_CARTELA = 0x04    # 24 números da cartela, linha a linha, sem o centro (1 byte cada)
+TIPOS_VALIDOS = {TIPO_HANDSHAKE, TIPO_TEXTO, TIPO_NUMERO, TIPO_CARTELA}
+
+# Cabeçalho: tipo (1 byte) + tamanho do conteúdo (4 bytes, big-endian)
+CABECALHO = struct.Struct('!BI')
+TAMANHO_MAXIMO = 1 << 20
+
+# Tempo máximo para o cliente iniciar o handshake (clientes antigos não o fazem)
+TEMPO_HANDSHAKE = 2
+
+# Resposta em texto puro para clientes antigos, que esperam 'CONECTADO'
+RESPOSTA_CLIENTE_ANTIGO = b'VERSAO_INCOMPATIVEL'
+
+# Tamanho máximo (em bytes UTF-8) do nome de um jogador e do código de uma partida
+TAMANHO_MAXIMO_NOME = 64
+
+class ErroProtocolo(Exception):
+    pass
+
+def nome_valido(texto):
+    """
+    True se o nome do jogador (ou código da partida) cabe em TAMANHO_MAXIMO_NOME bytes
+    """
+    return len(texto.encode('utf-8')) <= TAMANHO_MAXIMO_NOME
+
+def codificar_quadro(tipo, conteudo=b''):
+    """
+    Monta um quadro: cabeçalho (tipo + tamanho) seguido do conteúdo
+    """
+    return CABECALHO.pack(tipo, len(conteudo)) + conteudo
+
+def quadro_texto(texto):
+    """
+    Quadro com uma mensagem de controle
+    """
+    return codificar_quadro(TIPO_TEXTO, texto.encode('utf-8'))
+
+def quadro_numero(numero):
+    """
+    Quadro com um número sorteado
+    """
+    return codificar_quadro(TIPO_NUMERO, bytes((numero,)))
+
+def quadro_cartela(cartela):
+    """
+    Quadro com os 24 números de uma cartela
+    """
+    return codificar_quadro(TIPO_CARTELA, cartela.numeros_compactos)
+
+def quadro_handshake(versao=VERSAO_PROTOCOLO):
+    """
+    Quadro de handshake com a versão do protocolo
+    """
+    return codificar_quadro(TIPO_HANDSHAKE, ASSINATURA + bytes((versao,)))
+
+def ler_numero(conteudo):
+    """
+    Lê o número de um quadro TIPO_NUMERO
+    """
+    return conteudo[0]
+
+def ler_cartela(conteudo):
+    """
+    Cria uma CartelaBingo a partir do conteúdo de um quadro TIPO_CARTELA
+    """
+    if len(conteudo) != POSICOES_CARTELA - 1:
+        raise ErroProtocolo(f"Cartela com tamanho inválido: {len(conteudo)} bytes")
+    numeros = list(conteudo)
+    numeros.insert(POSICOES_CARTELA // 2, -1)
+    return CartelaBingo(np.array(numeros).reshape(5, 5))
+
+def ler_cartela_compacta(conteudo):
+    """
+    Cria uma CartelaBingo, com as marcações do jogador, a partir de CartelaBingo.compactar()
+    """
+    if len(conteudo) != CARTELA_COMPACTA.size:
+        raise ErroProtocolo(f"Cartela compacta com tamanho inválido: {len(conteudo)} bytes")
+    numeros, mascara = CARTELA_COMPACTA.unpack(conteudo)
+    cartela = ler_cartela(numeros)
+    cartela.marcacao_jogador = mascara
+    return cartela
+
+class DecodificadorQuadros:
+    def __init__(self):
+        # Bytes recebidos que ainda não formam um quadro completo
+        self.buffer = bytearray()
+
+    def alimentar(self, dados):
+        """
+        Acrescenta bytes recebidos e extrai os quadros completos
+
+        :param dados: Bytes lidos do socket
+        :return: Lista de tuplas (tipo, conteúdo)
+        """
+        self.buffer += dados
+        quadros = []
+        inicio = 0
+        while len(self.buffer) - inicio >= CABECALHO.size:
+            tipo, tamanho = CABECALHO.unpack_from(self.buffer, inicio)
+            if tipo not in TIPOS_VALIDOS:
+                raise ErroProtocolo(f"Tipo de quadro desconhecido: {tipo}")
+            if tamanho > TAMANHO_MAXIMO:
+                raise ErroProtocolo(f"Quadro grande demais: {tamanho} bytes")
+
+            fim = inicio + CABECALHO.size + tamanho
+            if len(self.buffer) < fim:
+                break
+            quadros.append((tipo, bytes(self.buffer[inicio + CABECALHO.size:fim])))
+            inicio = fim
+
+        del self.buffer[:inicio]
+        return quadros
+
+class ConexaoQuadros:
+    def __init__(self, sock):
+        # Socket da conexão
+        self.socket = sock
+
+        # Decodificador e quadros já decodificados ainda não consumidos
+        self.decodificador = DecodificadorQuadros()
+        self.pendentes = deque()
+
+    def enviar(self, *quadros):
+        """
+        Envia um ou mais quadros com uma única chamada a sendall
+        """
+        self.socket.sendall(b''.join(quadros))
+
+    def enviar_texto(self, texto):
+        """
+        Envia uma mensagem de controle
+        """
+        self.enviar(quadro_texto(texto))
+
+    def receber(self):
+        """
+        Recebe o próximo quadro
+
+        :return: Tupla (tipo, conteúdo), ou None se a conexão foi fechada
+        """
+        while not self.pendentes:
+            dados = self.socket.recv(4096)
+            if not dados:
+                return None
+            self.pendentes.extend(self.decodificador.alimentar(dados))
+        return self.pendentes.popleft()
+
+    def receber_texto(self):
+        """
+        Recebe a próxima mensagem de controle
+
+        :return: Texto da mensagem, ou None se a conexão foi fechada
+        """
+        quadro = self.receber()
+        if quadro is None:
+            return None
+        tipo, conteudo = quadro
+        if tipo != TIPO_TEXTO:
+            raise ErroProtocolo(f"Esperava uma mensagem de texto, recebeu o tipo {tipo}")
+        return conteudo.decode('utf-8')
+
+class ConexaoQuadrosAsync:
+    def __init__(self, leitor, escritor):
+        # Streams da conexão (asyncio)
+        self.leitor = leitor
+        self.escritor = escritor
+
+        # Decodificador e quadros já decodificados ainda não consumidos
+        self.decodificador = DecodificadorQuadros()
+        self.pendentes = deque()
+
+    def enviar(self, *quadros):
+        """
+        Enfileira um ou mais quadros no buffer de saída do transporte
+        """
+        self.escritor.write(b''.join(quadros))
+
+    def enviar_texto(self, texto):
+        """
+        Enfileira uma mensagem de controle
+        """
+        self.enviar(quadro_texto(texto))
+
+    async def receber(self):
+        """
+        Recebe o próximo quadro
+
+        :return: Tupla (tipo, conteúdo), ou None se a conexão foi fechada
+        """
+        while not self.pendentes:
+            dados = await self.leitor.read(4096)
+            if not dados:
+                return None
+            self.pendentes.extend(self.decodificador.alimentar(dados))
+        return self.pendentes.popleft()
+
+    async def receber_texto(self):
+        """
+        Recebe a próxima mensagem de controle
+
+        :return: Texto da mensagem, ou None se a conexão foi fechada
+        """
+        quadro = await self.receber()
+        if quadro is None:
+            return None
+        tipo, conteudo = quadro
+        if tipo != TIPO_TEXTO:
+            raise ErroProtocolo(f"Esperava uma mensagem de texto, recebeu o tipo {tipo}")
+        return conteudo.decode('utf-8')
+
+def recusa_handshake(quadro):
+    """
+    Verifica o quadro de handshake recebido do cliente
+
+    Clientes antigos (sem handshake) devem receber a resposta em texto puro
+    RESPOSTA_CLIENTE_ANTIGO e clientes com outra versão recebem
+    VERSAO_INCOMPATIVEL:<versão>; em ambos os casos a conexão deve ser fechada.
+
+    :return: Bytes a enviar antes de fechar a conexão, ou None se o handshake é válido
+    """
+    if (quadro is None or quadro[0] != TIPO_HANDSHAKE
+            or len(quadro[1]) != len(ASSINATURA) + 1 or not quadro[1].startswith(ASSINATURA)):
+        return RESPOSTA_CLIENTE_ANTIGO
+
+    versao = quadro[1][len(ASSINATURA)]
+    if versao != VERSAO_PROTOCOLO:
+        return quadro_texto(f"VERSAO_INCOMPATIVEL:{VERSAO_PROTOCOLO}")
+    return None
+
+def handshake_servidor(sock):
+    """
+    Executa o handshake do lado do servidor
+
+    :return: ConexaoQuadros se o handshake foi aceito, None caso contrário
+    """
+    conexao = ConexaoQuadros(sock)
+    sock.settimeout(TEMPO_HANDSHAKE)
+    try:
+        quadro = conexao.receber()
+    except (socket.timeout, ErroProtocolo):
+        quadro = None
+    finally:
+        sock.settimeout(None)
+
+    recusa = recusa_handshake(quadro)
+    if recusa is not None:
+        try:
+            sock.sendall(recusa)
+        except OSError:
+            pass
+        return None
+
+    conexao.enviar(quadro_handshake())
+    return conexao
+
+async def handshake_servidor_async(leitor, escritor):
+    """
+    Executa o handshake do lado do servidor, no modo asyncio
+
+    :return: ConexaoQuadrosAsync se o handshake foi aceito, None caso contrário
+    """
+    conexao = ConexaoQuadrosAsync(leitor, escritor)
+    try:
+        quadro = await asyncio.wait_for(conexao.receber(), TEMPO_HANDSHAKE)
+    except (asyncio.TimeoutError, ErroProtocolo):
+        quadro = None
+
+    recusa = recusa_handshake(quadro)
+    if recusa is not None:
+        escritor.write(recusa)
+        return None
+
+    conexao.enviar(quadro_handshake())
+    return conexao
+
+def verificar_resposta_handshake(quadro):
+    """
+    Verifica a resposta do servidor ao handshake do cliente
+
+    :raises ErroProtocolo: se o servidor recusar ou não falar este protocolo
+    """
+    if quadro is None:
+        raise ErroProtocolo("Servidor fechou a conexão durante o handshake")
+
+    tipo, conteudo = quadro
+    if tipo == TIPO_TEXTO:
+        raise ErroProtocolo(f"Servidor recusou a conexão: {conteudo.decode('utf-8')}")
+    if tipo != TIPO_HANDSHAKE or conteudo != ASSINATURA + bytes((VERSAO_PROTOCOLO,)):
+        raise ErroProtocolo("Resposta de handshake inválida")
+
+def handshake_cliente(sock):
+    """
+    Executa o handshake do lado do cliente
+
+    :return: ConexaoQuadros pronta para uso
+    :raises ErroProtocolo: se o servidor recusar ou não falar este protocolo
+    """
+    conexao = ConexaoQuadros(sock)
+    conexao.enviar(quadro_handshake())
+    verificar_resposta_handshake(conexao.receber())
+    return conexao
+
+async def handshake_cliente_async(leitor, escritor):
+    """
+    Executa o handshake do lado do cliente, no modo asyncio
+
+    :return: ConexaoQuadrosAsync pronta para uso
+    :raises ErroProtocolo: se o servidor recusar ou não falar este protocolo
+    """
+    conexao = ConexaoQuadrosAsync(leitor, escritor)
+    conexao.enviar(quadro_handshake())
+    verificar_resposta_handshake(await conexao.receber())
+    return conexao
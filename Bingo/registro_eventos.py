@@ -0,0 +1,189 @@
+"""
+Registro binário, só de acréscimo, dos eventos das partidas
+
+Cada partida tem uma semente registrada; a ordem dos sorteios é derivada dela
+(ordem_sorteio), então a mesma semente reproduz a mesma partida. O arquivo
+guarda, de todas as partidas do processo, as entradas, cartelas, saídas,
+sorteios, pedidos de BINGO e resultados, e é lido por reproducao.py.
+
+Formato: ASSINATURA_REGISTRO seguida de eventos, cada um com
+CABECALHO_EVENTO (tipo, instante, tamanho do corpo) e o corpo: o código da
+partida (1 byte de tamanho + UTF-8, até 255 bytes) e os campos do tipo.
+"""
+import os
+import random
+import struct
+import threading
+import time
+from protocolo import CABECALHO, quadro_cartela
+from logs import obter_logger
+
+log = obter_logger(__name__)
+
+# Início do arquivo: identificação + versão do formato
+ASSINATURA_REGISTRO = b'BGEV\x02'
+
+# Tipo (1 byte), instante de parede (8 bytes) e tamanho do corpo (4 bytes)
+CABECALHO_EVENTO = struct.Struct('!BdI')
+
+# Tamanho máximo do código da partida no corpo (1 byte de tamanho)
+TAMANHO_MAXIMO_CODIGO = 255
+
+# Tipos de evento e campos do corpo, depois do código da partida
+EVENTO_PARTIDA = 0x01   # semente (8 bytes) + padrões ativos (RegistroPadroes.para_texto)
+EVENTO_ENTRADA = 0x02   # nome do jogador
+EVENTO_CARTELA = 0x03   # índice da cartela (1 byte) + 24 números (como TIPO_CARTELA) + nome do jogador
+EVENTO_SAIDA = 0x04     # nome do jogador
+EVENTO_SORTEIO = 0x05   # número sorteado (1 byte)
+EVENTO_BINGO = 0x06     # válido (1 byte) + nome do jogador
+EVENTO_FIM = 0x07       # mensagem final (ex.: BINGO_VENCEDOR:nome)
+
+NOMES_EVENTOS = {
+    EVENTO_PARTIDA: 'partida',
+    EVENTO_ENTRADA: 'entrada',
+    EVENTO_CARTELA: 'cartela',
+    EVENTO_SAIDA: 'saida',
+    EVENTO_SORTEIO: 'sorteio',
+    EVENTO_BINGO: 'bingo',
+    EVENTO_FIM: 'fim',
+}
+
+SEMENTE = struct.Struct('!Q')
+TAMANHO_CARTELA = 24
+
+def nova_semente():
+    """
+    :return: Semente aleatória de 64 bits para uma partida
+    """
+    return random.SystemRandom().getrandbits(64)
+
+def ordem_sorteio(semente):
+    """
+    Ordem em que os 75 números são sorteados em uma partida com esta semente
+    """
+    numeros = list(range(1, 76))
+    random.Random(semente).shuffle(numeros)
+    return numeros
+
+class RegistroEventos:
+    """
+    Escritor do registro de eventos, compartilhado por todas as partidas do processo
+
+    As escritas vão para o buffer do arquivo com um lock curto; o buffer é
+    descarregado no fim de cada partida e ao fechar o registro.
+    """
+    def __init__(self, caminho, relogio=time.time):
+        self.caminho = caminho
+        self.relogio = relogio
+        self.lock = threading.Lock()
+
+        novo = not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+        self.arquivo = open(caminho, 'ab')
+        if novo:
+            self.arquivo.write(ASSINATURA_REGISTRO)
+
+    @classmethod
+    def do_ambiente(cls, variavel='BINGO_REGISTRO'):
+        """
+        Registro no caminho da variável de ambiente, ou None se ela não estiver definida
+
+        '{pid}' no caminho é trocado pelo PID, para que cada worker tenha seu arquivo.
+        """
+        caminho = os.environ.get(variavel)
+        if not caminho:
+            return None
+        return cls(caminho.replace('{pid}', str(os.getpid())))
+
+    def escrever(self, tipo, codigo, corpo=b''):
+        """
+        Acrescenta um evento ao buffer; um código de partida que não cabe no formato
+        descarta o evento com um aviso, sem interromper a partida
+        """
+        codigo = codigo.encode('utf-8')
+        if len(codigo) > TAMANHO_MAXIMO_CODIGO:
+            log.warning("Evento não registrado: código da partida grande demais", evento="registro_descartado",
+                        tipo=NOMES_EVENTOS.get(tipo, tipo), tamanho=len(codigo))
+            return
+        corpo = bytes((len(codigo),)) + codigo + corpo
+        evento = CABECALHO_EVENTO.pack(tipo, self.relogio(), len(corpo)) + corpo
+        with self.lock:
+            if not self.arquivo.closed:
+                self.arquivo.write(evento)
+
+    def partida(self, codigo, semente, padroes):
+        """
+        :param padroes: RegistroPadroes da partida
+        """
+        self.escrever(EVENTO_PARTIDA, codigo, SEMENTE.pack(semente) + padroes.para_texto().encode('utf-8'))
+
+    def entrada(self, codigo, nome):
+        self.escrever(EVENTO_ENTRADA, codigo, nome.encode('utf-8'))
+
+    def cartela(self, codigo, nome, indice, cartela):
+        numeros = quadro_cartela(cartela)[CABECALHO.size:]
+        self.escrever(EVENTO_CARTELA, codigo, bytes((indice,)) + numeros + nome.encode('utf-8'))
+
+    def saida(self, codigo, nome):
+        self.escrever(EVENTO_SAIDA, codigo, nome.encode('utf-8'))
+
+    def sorteio(self, codigo, numero):
+        self.escrever(EVENTO_SORTEIO, codigo, bytes((numero,)))
+
+    def bingo(self, codigo, nome, valido):
+        self.escrever(EVENTO_BINGO, codigo, bytes((int(valido),)) + nome.encode('utf-8'))
+
+    def fim(self, codigo, mensagem):
+        self.escrever(EVENTO_FIM, codigo, mensagem.encode('utf-8'))
+        self.descarregar()
+
+    def descarregar(self):
+        with self.lock:
+            if not self.arquivo.closed:
+                self.arquivo.flush()
+
+    def fechar(self):
+        with self.lock:
+            if not self.arquivo.closed:
+                self.arquivo.close()
+
+def ler_eventos(dados):
+    """
+    Decodifica um registro
+
+    :param dados: Conteúdo do arquivo (bytes)
+    :return: Lista de (tipo, instante, codigo, campos); um evento truncado no fim é ignorado
+    """
+    if not dados.startswith(ASSINATURA_REGISTRO):
+        if dados.startswith(ASSINATURA_REGISTRO[:-1]):
+            raise ValueError(f"Versão do registro de eventos não suportada: {dados[len(ASSINATURA_REGISTRO) - 1]}")
+        raise ValueError("Arquivo não é um registro de eventos do Bingo")
+
+    eventos = []
+    visao = memoryview(dados)
+    posicao = len(ASSINATURA_REGISTRO)
+    while posicao + CABECALHO_EVENTO.size <= len(dados):
+        tipo, instante, tamanho = CABECALHO_EVENTO.unpack_from(dados, posicao)
+        posicao += CABECALHO_EVENTO.size
+        if posicao + tamanho > len(dados):
+            break
+        corpo = visao[posicao:posicao + tamanho]
+        posicao += tamanho
+
+        tamanho_codigo = corpo[0]
+        codigo = bytes(corpo[1:1 + tamanho_codigo]).decode('utf-8')
+        eventos.append((tipo, instante, codigo, decodificar_campos(tipo, corpo[1 + tamanho_codigo:])))
+    return eventos
+
+def decodificar_campos(tipo, campos):
+    """
+    Campos de um evento, conforme o tipo
+    """
+    if tipo == EVENTO_PARTIDA:
+        return SEMENTE.unpack_from(campos)[0], bytes(campos[SEMENTE.size:]).decode('utf-8')
+    if tipo == EVENTO_CARTELA:
+        return bytes(campos[1 + TAMANHO_CARTELA:]).decode('utf-8'), campos[0], bytes(campos[1:1 + TAMANHO_CARTELA])
+    if tipo == EVENTO_SORTEIO:
+        return campos[0]
+    if tipo == EVENTO_BINGO:
+        return bytes(campos[1:]).decode('utf-8'), bool(campos[0])
+    return bytes(campos).decode('utf-8')
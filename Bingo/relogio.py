@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+class RelogioReal:
+    """
+    Relógio de parede monotônico: as esperas duram o tempo real
+    """
+    virtual = False
+
+    def agora(self):
+        """
+        :return: Instante atual em segundos
+        """
+        return time.monotonic()
+
+    def dormir(self, segundos):
+        time.sleep(segundos)
+
+    async def dormir_async(self, segundos):
+        await asyncio.sleep(segundos)
+
+    def esperar(self, condicao, segundos):
+        """
+        Espera uma notificação na condição (já adquirida) por até `segundos` (None = sem limite)
+        """
+        condicao.wait(segundos)
+
+class RelogioParede(RelogioReal):
+    """
+    Relógio real em segundos desde a época (time.time)
+
+    Os instantes são comparáveis entre processos, máquinas e o navegador, mas
+    um ajuste do relógio do sistema adianta ou atrasa as esperas em andamento.
+    """
+    def agora(self):
+        return time.time()
+
+class RelogioVirtual:
+    """
+    Relógio simulado: o tempo só anda quando alguém espera, e anda na hora
+
+    Com o Agendador, o tempo salta direto para o próximo evento, então uma
+    partida de 75 sorteios roda em microssegundos em vez de minutos.
+    """
+    virtual = True
+
+    def __init__(self, inicio=0.0):
+        self.instante = inicio
+        self.lock = threading.Lock()
+
+    def agora(self):
+        return self.instante
+
+    def avancar_para(self, instante):
+        """
+        Leva o relógio até `instante`; o tempo nunca volta
+        """
+        with self.lock:
+            if instante > self.instante:
+                self.instante = instante
+
+    def avancar(self, segundos):
+        with self.lock:
+            self.instante += segundos
+
+    def dormir(self, segundos):
+        self.avancar(segundos)
+
+    async def dormir_async(self, segundos):
+        # Cede o loop aos outros clientes e partidas e só então avança o relógio;
+        # a ordem entre corrotinas segue o loop, não o instante virtual de cada uma
+        alvo = self.instante + segundos
+        await asyncio.sleep(0)
+        self.avancar_para(alvo)
+
+    def esperar(self, condicao, segundos):
+        # Sem limite, espera de verdade por uma notificação (ex.: um novo evento agendado)
+        if segundos is None:
+            condicao.wait()
+        else:
+            self.avancar(segundos)
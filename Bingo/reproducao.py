@@ -0,0 +1,224 @@
+"""
+Reprodução de partidas a partir do registro de eventos (registro_eventos.py)
+
+Uso (a partir da pasta Bingo):
+    python -m reproducao partidas.bgev                      # lista as partidas do registro
+    python -m reproducao partidas.bgev --partida partida_1234 --evento 40
+    python -m reproducao partidas.bgev --verificar          # confere sorteios e vencedores
+    python -m reproducao partidas.bgev --medir              # tempo para reconstruir cada partida
+
+Vários arquivos (ex.: um por worker do app.py) são combinados pela ordem dos instantes.
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict
+from padroes import RegistroPadroes
+from protocolo import ler_cartela
+from registro_eventos import (ler_eventos, ordem_sorteio, NOMES_EVENTOS, EVENTO_PARTIDA, EVENTO_ENTRADA,
+                              EVENTO_CARTELA, EVENTO_SAIDA, EVENTO_SORTEIO, EVENTO_BINGO, EVENTO_FIM)
+
+class EstadoPartida:
+    """
+    Estado de uma partida reconstruído evento a evento, com as cartelas marcadas
+    """
+    def __init__(self, codigo):
+        self.codigo = codigo
+        self.semente = None
+        self.padroes = RegistroPadroes()
+        self.eventos_aplicados = 0
+        self.instante = None
+
+        # Jogadores presentes, em ordem de entrada, e suas cartelas (nome -> lista de CartelaBingo)
+        self.jogadores = []
+        self.cartelas = {}
+
+        # Índice invertido: número -> lista de (nome, índice da cartela, cartela, bit)
+        self.indice_sorteio = defaultdict(list)
+
+        self.numeros_sorteados = []
+
+        # Primeiro padrão completado por jogador (nome -> (índice da cartela, padrão, sorteios até então))
+        self.completas = {}
+
+        # Pedidos de BINGO (nome, válido no servidor) e a mensagem final
+        self.bingos = []
+        self.resultado = None
+
+    def aplicar(self, evento):
+        tipo, instante, _, campos = evento
+        self.eventos_aplicados += 1
+        self.instante = instante
+
+        if tipo == EVENTO_PARTIDA:
+            self.semente, padroes = campos
+            self.padroes = RegistroPadroes.de_texto(padroes)
+        elif tipo == EVENTO_ENTRADA:
+            if campos not in self.jogadores:
+                self.jogadores.append(campos)
+                self.cartelas[campos] = []
+        elif tipo == EVENTO_CARTELA:
+            nome, indice, numeros = campos
+            cartela = ler_cartela(numeros)
+            self.cartelas.setdefault(nome, []).append(cartela)
+            for numero in self.numeros_sorteados:
+                cartela.marcar_numero(numero)
+            for numero, bit in cartela.indice_numeros.items():
+                self.indice_sorteio[numero].append((nome, indice, cartela, bit))
+            self.verificar_cartela(nome, indice, cartela)
+        elif tipo == EVENTO_SAIDA:
+            if campos in self.jogadores:
+                self.jogadores.remove(campos)
+        elif tipo == EVENTO_SORTEIO:
+            self.numeros_sorteados.append(campos)
+            for nome, indice, cartela, bit in self.indice_sorteio.get(campos, ()):
+                cartela.marcar_posicao(bit)
+                self.verificar_cartela(nome, indice, cartela)
+        elif tipo == EVENTO_BINGO:
+            self.bingos.append(campos)
+        elif tipo == EVENTO_FIM:
+            self.resultado = campos
+
+    def verificar_cartela(self, nome, indice, cartela):
+        if nome not in self.completas:
+            padrao = self.padroes.verificar(cartela.mascara_marcacao)
+            if padrao:
+                self.completas[nome] = (indice, padrao, len(self.numeros_sorteados))
+
+    def divergencias(self):
+        """
+        Confere o estado reconstruído com a semente e com as decisões registradas pelo servidor
+
+        :return: Lista de descrições das divergências (vazia se tudo confere)
+        """
+        problemas = []
+        if self.semente is not None:
+            esperados = ordem_sorteio(self.semente)[:len(self.numeros_sorteados)]
+            if esperados != self.numeros_sorteados:
+                problemas.append("sorteios não seguem a semente registrada")
+        for nome, valido in self.bingos:
+            if valido and nome not in self.completas:
+                problemas.append(f"BINGO de {nome} aceito sem cartela completa")
+        return problemas
+
+    def resumo(self):
+        return {
+            "codigo": self.codigo,
+            "semente": self.semente,
+            "padroes": self.padroes.nomes_ativos,
+            "eventos": self.eventos_aplicados,
+            "jogadores": list(self.jogadores),
+            "sorteados": len(self.numeros_sorteados),
+            "ultimo_numero": self.numeros_sorteados[-1] if self.numeros_sorteados else None,
+            "completas": {nome: {"cartela": indice + 1, "padrao": padrao, "no_sorteio": sorteio}
+                          for nome, (indice, padrao, sorteio) in self.completas.items()},
+            "bingos": self.bingos,
+            "resultado": self.resultado,
+        }
+
+class Reproducao:
+    """
+    Eventos de um ou mais registros, separados por partida
+
+    Um código reaproveitado em outra partida (novo EVENTO_PARTIDA) ganha o sufixo #2, #3...
+    """
+    def __init__(self, caminhos):
+        eventos = []
+        for caminho in caminhos:
+            with open(caminho, 'rb') as arquivo:
+                eventos.extend(ler_eventos(arquivo.read()))
+        if len(caminhos) > 1:
+            eventos.sort(key=lambda evento: evento[1])
+
+        # Identificador da partida -> eventos, em ordem
+        self.partidas = {}
+        atual = {}
+        ocorrencias = defaultdict(int)
+        for evento in eventos:
+            codigo = evento[2]
+            if evento[0] == EVENTO_PARTIDA or codigo not in atual:
+                ocorrencias[codigo] += 1
+                atual[codigo] = codigo if ocorrencias[codigo] == 1 else f"{codigo}#{ocorrencias[codigo]}"
+                self.partidas[atual[codigo]] = []
+            self.partidas[atual[codigo]].append(evento)
+
+    def estado_em(self, partida, evento=None):
+        """
+        Reconstrói a partida até um deslocamento
+
+        :param partida: Identificador da partida (código, ou código#n)
+        :param evento: Quantidade de eventos aplicados (None = todos)
+        :return: EstadoPartida
+        """
+        estado = EstadoPartida(partida)
+        for registro in self.partidas[partida][:evento]:
+            estado.aplicar(registro)
+        return estado
+
+def listar(reproducao):
+    for partida, eventos in reproducao.partidas.items():
+        estado = reproducao.estado_em(partida)
+        print(f"{partida}: {len(eventos)} eventos, {len(estado.cartelas)} jogadores, "
+              f"{len(estado.numeros_sorteados)} sorteios, resultado: {estado.resultado or 'em andamento'}")
+
+def mostrar(reproducao, partida, evento):
+    if partida not in reproducao.partidas:
+        print(f"Partida {partida} não está no registro")
+        return 1
+    eventos = reproducao.partidas[partida]
+    estado = reproducao.estado_em(partida, evento)
+    for chave, valor in estado.resumo().items():
+        print(f"{chave}: {valor}")
+    if estado.eventos_aplicados < len(eventos):
+        tipo, _, _, campos = eventos[estado.eventos_aplicados]
+        print(f"próximo evento: {NOMES_EVENTOS.get(tipo, tipo)} {campos}")
+    return 0
+
+def verificar(reproducao):
+    falhas = 0
+    for partida in reproducao.partidas:
+        for problema in reproducao.estado_em(partida).divergencias():
+            falhas += 1
+            print(f"{partida}: {problema}")
+    print(f"{len(reproducao.partidas)} partidas verificadas, {falhas} divergências")
+    return 1 if falhas else 0
+
+def medir(reproducao):
+    """
+    Mede a reconstrução completa de cada partida (um benchmark com tráfego real)
+    """
+    tempos = []
+    for partida, eventos in reproducao.partidas.items():
+        inicio = time.perf_counter()
+        reproducao.estado_em(partida)
+        tempos.append((time.perf_counter() - inicio) / max(1, len(eventos)))
+    if not tempos:
+        print("Registro sem partidas")
+        return 0
+    tempos.sort()
+    total = sum(len(eventos) for eventos in reproducao.partidas.values())
+    print(f"{len(tempos)} partidas, {total} eventos | por evento: "
+          f"p50={tempos[len(tempos) // 2] * 1e6:.2f}us max={tempos[-1] * 1e6:.2f}us")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproduz partidas do registro de eventos do Bingo")
+    parser.add_argument('registros', nargs='+', help='Arquivos de registro (BINGO_REGISTRO)')
+    parser.add_argument('--partida', help='Partida a reconstruir')
+    parser.add_argument('--evento', type=int, default=None, help='Quantidade de eventos aplicados (padrão: todos)')
+    parser.add_argument('--verificar', action='store_true', help='Confere sorteios com a semente e os BINGOs aceitos')
+    parser.add_argument('--medir', action='store_true', help='Mede o tempo de reconstrução das partidas')
+    argumentos = parser.parse_args(argv)
+
+    reproducao = Reproducao(argumentos.registros)
+    if argumentos.partida:
+        return mostrar(reproducao, argumentos.partida, argumentos.evento)
+    if argumentos.verificar:
+        return verificar(reproducao)
+    if argumentos.medir:
+        return medir(reproducao)
+    listar(reproducao)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,26 @@ import threading
 import time
 import random
 import sys
+import json
+import os
+from urllib.parse import parse_qsl
 from partida import PartidaBingo
+from cartela import PoolCartelas
+from agendador import Agendador
+from registro_eventos import RegistroEventos
+from lobby import IndiceLobby, LIMITE_PAGINA
+from protocolo import handshake_servidor, quadro_texto, quadro_cartela, nome_valido, TAMANHO_MAXIMO_NOME
+from metricas import MetricasServidor, LockMedido, servir_metricas
+from logs import obter_logger, configurar_logs
+from perfil import token_admin_valido, iniciar_perfil_de_parametros, PerfilEmAndamento
+
+log = obter_logger(__name__)
 
 class ServidorBingo:
-    def __init__(self, host='0.0.0.0', porta=12345, min_clientes=2, max_clientes=10, tempo_espera=30):
+    # Classe usada para criar as partidas
+    classe_partida = PartidaBingo
+    
+    def __init__(self, host='0.0.0.0', porta=12345, min_clientes=2, max_clientes=10, tempo_espera=30, padroes=None, agendador=None, registro=None):
         # Configurações de conexão
         self.host = host
         self.porta = porta
@@ -14,11 +30,11 @@ class ServidorBingo:
         self.max_clientes = max_clientes
         self.tempo_espera = tempo_espera
         
+        # Padrões que valem como bingo nas partidas (None = cartela cheia)
+        self.padroes = padroes
+        
         # Socket do servidor
-        self.servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Permite reutilizar o endereço
-        self.servidor.bind((self.host, self.porta))
-        self.servidor.listen(100)  # Aumentado para permitir mais conexões
+        self.servidor = self.criar_socket_servidor()
         
         # Dicionário de partidas ativas (código_partida -> objeto PartidaBingo)
         self.partidas = {}
@@ -26,14 +42,47 @@ class ServidorBingo:
         # Lista de partidas públicas disponíveis
         self.partidas_publicas = []
         
-        # Locks para sincronização
-        self.lock_partidas = threading.Lock()
+        # Agendador único para os sorteios e contagens de espera de todas as partidas,
+        # e o relógio dele (real, ou virtual para simulações aceleradas)
+        self.agendador = agendador or Agendador()
+        self.relogio = self.agendador.relogio
+        
+        # Índice das partidas públicas abertas, atualizado pelas próprias partidas
+        # (consultas ao lobby não percorrem self.partidas nem usam lock_partidas)
+        self.indice_lobby = IndiceLobby(relogio=self.relogio.agora)
+        
+        # Pool de cartelas pré-geradas, compartilhado pelas partidas
+        self.pool_cartelas = PoolCartelas()
+        
+        # Registro binário de eventos das partidas (RegistroEventos), para reproduzi-las com reproducao.py
+        self.registro = registro
+        
+        # Métricas do servidor e das partidas; servidas em /metrics por iniciar_metricas
+        self.metricas = MetricasServidor()
+        self.metricas.medidor('bingo_salas', 'Salas ativas por estado', self.contar_partidas_por_estado, rotulo='estado')
+        self.metricas.medidor('bingo_jogadores_conectados', 'Jogadores conectados às salas',
+                              lambda: sum(len(partida.clientes) for partida in list(self.partidas.values())))
+        self.agendador.atraso = self.metricas.atraso_agendador
+        self.servidor_metricas = None
+        
+        # Locks para sincronização (a espera por lock_partidas é medida)
+        self.lock_partidas = LockMedido(threading.Lock(), self.metricas.espera_lock_partidas)
         
         # Flag de controle
         self.aceitando_conexoes = True
         
-        print(f"Servidor de Bingo iniciado em {self.host}:{self.porta}")
-        print(f"Configuração: min_jogadores={self.min_clientes}, max_jogadores={self.max_clientes}, tempo_espera={self.tempo_espera}s")
+        log.info("Servidor de Bingo iniciado", evento="inicio_servidor", host=self.host, porta=self.porta,
+                 min_jogadores=self.min_clientes, max_jogadores=self.max_clientes, tempo_espera=self.tempo_espera)
+    
+    def criar_socket_servidor(self):
+        """
+        Cria o socket que aceita as conexões dos clientes
+        """
+        servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Permite reutilizar o endereço
+        servidor.bind((self.host, self.porta))
+        servidor.listen(100)  # Aumentado para permitir mais conexões
+        return servidor
     
     def remover_partida(self, codigo_partida, motivo=None):
         """
@@ -50,11 +99,9 @@ class ServidorBingo:
                 # Remove da lista de partidas públicas se estiver lá
                 if codigo_partida in self.partidas_publicas:
                     self.partidas_publicas.remove(codigo_partida)
+                self.indice_lobby.remover(codigo_partida)
                     
-                if motivo:
-                    print(f"\nRemovendo partida {codigo_partida}: {motivo}")
-                else:
-                    print(f"\nRemovendo partida {codigo_partida}")
+                log.info("Removendo partida", sala=codigo_partida, evento="removida", motivo=motivo)
                 del self.partidas[codigo_partida]
                 return True
             return False
@@ -63,12 +110,98 @@ class ServidorBingo:
         """
         Retorna uma lista de códigos de partidas públicas disponíveis
         """
-        with self.lock_partidas:
-            partidas_disponiveis = []
-            for codigo in self.partidas_publicas:
-                if codigo in self.partidas and not self.partidas[codigo].jogo_em_andamento:
-                    partidas_disponiveis.append(codigo)
-            return partidas_disponiveis
+        return self.indice_lobby.codigos()
+    
+    def consultar_lobby(self, parametros=""):
+        """
+        Consulta paginada das partidas públicas disponíveis
+        
+        :param parametros: Query string com estado, vagas, ordem, cursor e limite
+                           (ex.: 'estado=contagem&vagas=2&ordem=ocupacao&limite=10')
+        :return: Dicionário com 'partidas', 'proximo_cursor' e 'total' (ver IndiceLobby.consultar)
+        """
+        filtros = dict(parse_qsl(parametros))
+        return self.indice_lobby.consultar(estado=filtros.get("estado") or None,
+                                           vagas_minimas=filtros.get("vagas", 0),
+                                           ordem=filtros.get("ordem", "criacao"),
+                                           cursor=filtros.get("cursor") or None,
+                                           limite=filtros.get("limite", LIMITE_PAGINA))
+    
+    def responder_consulta_lobby(self, comando):
+        """
+        Resposta de texto ao comando LISTAR_PARTIDAS ou LISTAR_PARTIDAS:<parâmetros>
+        
+        O comando sem parâmetros mantém o formato antigo (apenas códigos);
+        com parâmetros, a página vai em JSON depois de 'PAGINA_PARTIDAS:'.
+        """
+        if comando == "LISTAR_PARTIDAS":
+            return "PARTIDAS_PUBLICAS:" + ",".join(self.listar_partidas_publicas())
+        try:
+            pagina = self.consultar_lobby(comando.split(":", 1)[1])
+        except (TypeError, ValueError) as e:
+            return f"ERRO_CONSULTA:{e}"
+        return "PAGINA_PARTIDAS:" + json.dumps(pagina)
+    
+    def atualizar_lobby(self, partida):
+        """
+        Reflete jogadores e estado da partida no índice do lobby (chamado por partida.ao_mudar)
+        """
+        # Lê a partida com o lock do índice, para que duas atualizações concorrentes não se invertam
+        with self.indice_lobby.lock:
+            if not partida.publica or partida.partida_encerrada or partida.sorteio_iniciado:
+                self.indice_lobby.remover(partida.codigo_partida)
+                return
+            self.indice_lobby.atualizar(partida.codigo_partida,
+                                        len(partida.clientes_prontos),
+                                        "contagem" if partida.fim_contagem is not None else "aguardando",
+                                        capacidade=partida.max_clientes,
+                                        fim_contagem=partida.fim_contagem)
+    
+    def contar_partidas_por_estado(self):
+        """
+        Quantidade de partidas ativas em cada estado (lida sem lock_partidas, para as métricas)
+        """
+        estados = {'aguardando': 0, 'contagem': 0, 'em_andamento': 0, 'finalizado': 0}
+        for partida in list(self.partidas.values()):
+            if partida.partida_encerrada:
+                estados['finalizado'] += 1
+            elif partida.sorteio_iniciado:
+                estados['em_andamento'] += 1
+            elif partida.fim_contagem is not None:
+                estados['contagem'] += 1
+            else:
+                estados['aguardando'] += 1
+        return estados
+    
+    def iniciar_metricas(self, porta, host=None):
+        """
+        Serve as métricas do servidor em http://host:porta/metrics, em uma thread própria
+        
+        No mesmo endereço, POST /admin/perfil inicia um perfil de CPU (ver perfil.py).
+        """
+        self.servidor_metricas = servir_metricas(self.metricas, host or self.host, porta,
+                                                 rotas={'/admin/perfil': self.tratar_perfil})
+        log.info("Métricas disponíveis", evento="metricas", url=f"http://{host or self.host}:{porta}/metrics")
+    
+    def tratar_perfil(self, parametros, cabecalhos):
+        """
+        Inicia um perfil de CPU de uma sala e/ou de métodos da partida e do servidor
+        
+        :param parametros: funcoes (ex.: verificar_bingo,sortear_numero), sala, segundos e formato
+        :param cabecalhos: Cabeçalhos da requisição (X-Token-Admin deve ser o BINGO_TOKEN_ADMIN)
+        :return: (status HTTP, caminho do arquivo do perfil ou mensagem de erro)
+        """
+        if not token_admin_valido(cabecalhos.get('X-Token-Admin')):
+            return 404, "Não encontrado"
+        try:
+            arquivo = iniciar_perfil_de_parametros(parametros, self.classe_partida, type(self))
+        except PerfilEmAndamento as e:
+            return 409, str(e)
+        except ValueError as e:
+            return 400, str(e)
+        log.info("Perfil de CPU iniciado", sala=parametros.get('sala'), evento="perfil", arquivo=arquivo,
+                 funcoes=parametros.get('funcoes'))
+        return 202, arquivo
     
     def verificar_partida_existe(self, codigo_partida):
         """
@@ -112,38 +245,48 @@ class ServidorBingo:
                 codigo_partida = novo_codigo
                 
                 # Cria uma nova partida com a flag publica
-                print(f"\nCriando nova partida com código: {codigo_partida}, Status: {'Pública' if publica else 'Privada'}")
-                partida = PartidaBingo(codigo_partida, 
+                partida = self.classe_partida(codigo_partida, 
                                       self.min_clientes, 
                                       self.max_clientes, 
                                       self.tempo_espera,
-                                      publica)
+                                      publica,
+                                      self.pool_cartelas,
+                                      self.padroes,
+                                      self.agendador,
+                                      self.registro,
+                                      metricas=self.metricas)
                                       
                 self.partidas[codigo_partida] = partida
+                partida.ao_mudar = self.atualizar_lobby
                 
                 # Adiciona à lista de partidas públicas se for pública
                 if publica:
                     self.partidas_publicas.append(codigo_partida)
-                    print(f"Partida {codigo_partida} adicionada à lista de partidas públicas")
+                    self.atualizar_lobby(partida)
                 
                 return codigo_partida, partida
             
             # Verifica se a partida já existe
             if codigo_partida not in self.partidas:
                 # Cria uma nova partida com código específico e flag pública
-                print(f"\nCriando nova partida com código específico: {codigo_partida}, Status: {'Pública' if publica else 'Privada'}")
-                partida = PartidaBingo(codigo_partida, 
+                partida = self.classe_partida(codigo_partida, 
                                       self.min_clientes, 
                                       self.max_clientes, 
                                       self.tempo_espera,
-                                      publica)
+                                      publica,
+                                      self.pool_cartelas,
+                                      self.padroes,
+                                      self.agendador,
+                                      self.registro,
+                                      metricas=self.metricas)
                                       
                 self.partidas[codigo_partida] = partida
+                partida.ao_mudar = self.atualizar_lobby
                 
                 # Adiciona à lista de partidas públicas se for pública
                 if publica:
                     self.partidas_publicas.append(codigo_partida)
-                    print(f"Partida {codigo_partida} adicionada à lista de partidas públicas")
+                    self.atualizar_lobby(partida)
                 
                 return codigo_partida, partida
             
@@ -157,24 +300,27 @@ class ServidorBingo:
         partida = None
         
         try:
-            # Envia confirmação de conexão
-            cliente_socket.send('CONECTADO'.encode('utf-8'))
+            # Handshake de versão do protocolo (substitui o antigo 'CONECTADO')
+            conexao = handshake_servidor(cliente_socket)
+            if conexao is None:
+                log.info("Cliente recusado: versão de protocolo incompatível", evento="handshake_recusado", endereco=endereco)
+                cliente_socket.close()
+                return
             
             # Recebe o nome do jogador
-            nome_jogador = cliente_socket.recv(1024).decode('utf-8')
+            nome_jogador = conexao.receber_texto()
             if not nome_jogador:
-                print(f"Cliente {endereco} desconectou sem informar nome")
+                log.info("Cliente desconectou sem informar nome", evento="desconexao", endereco=endereco)
                 cliente_socket.close()
                 return
             
-            # Verifica se o cliente solicitou a lista de partidas públicas
-            if nome_jogador == "LISTAR_PARTIDAS":
-                partidas_disponiveis = self.listar_partidas_publicas()
-                resposta = "PARTIDAS_PUBLICAS:" + ",".join(partidas_disponiveis)
-                cliente_socket.send(resposta.encode('utf-8'))
+            # Verifica se o cliente solicitou a lista de partidas públicas; páginas
+            # seguintes podem ser pedidas na mesma conexão
+            while nome_jogador == "LISTAR_PARTIDAS" or nome_jogador.startswith("LISTAR_PARTIDAS:"):
+                conexao.enviar_texto(self.responder_consulta_lobby(nome_jogador))
                 # Espera para ver se o cliente vai se conectar com uma partida específica
                 try:
-                    nome_jogador = cliente_socket.recv(1024).decode('utf-8')
+                    nome_jogador = conexao.receber_texto()
                     if not nome_jogador or nome_jogador == "SAIR":
                         cliente_socket.close()
                         return
@@ -182,19 +328,19 @@ class ServidorBingo:
                     cliente_socket.close()
                     return
             # Verifica se o cliente solicitou verificar uma partida específica
-            elif nome_jogador.startswith("VERIFICAR_PARTIDA:"):
+            if nome_jogador.startswith("VERIFICAR_PARTIDA:"):
                 codigo_partida = nome_jogador.split(":", 1)[1]
                 if self.verificar_partida_existe(codigo_partida):
-                    cliente_socket.send("PARTIDA_EXISTE".encode('utf-8'))
+                    conexao.enviar_texto("PARTIDA_EXISTE")
                 else:
-                    cliente_socket.send("PARTIDA_NAO_EXISTE".encode('utf-8'))
+                    conexao.enviar_texto("PARTIDA_NAO_EXISTE")
                 cliente_socket.close()
                 return
             
             # Recebe o código da partida e informação sobre pública/privada
-            codigo_partida_info = cliente_socket.recv(1024).decode('utf-8')
+            codigo_partida_info = conexao.receber_texto()
             if not codigo_partida_info:
-                print(f"Cliente {endereco} desconectou sem informar código da partida")
+                log.info("Cliente desconectou sem informar código da partida", evento="desconexao", endereco=endereco, jogador=nome_jogador)
                 cliente_socket.close()
                 return
             
@@ -212,57 +358,67 @@ class ServidorBingo:
             else:
                 codigo_partida_recebido = codigo_partida_info
             
-            # Cria ou obtém a partida solicitada
-            codigo_partida, partida = self.criar_ou_obter_partida(codigo_partida_recebido, publica)
-            
-            # Envia o código real da partida para o cliente
-            try:
-                cliente_socket.send(codigo_partida.encode('utf-8'))
-                time.sleep(0.5)
-            except:
-                print(f"Erro ao enviar código da partida para o cliente {nome_jogador}")
+            # Nomes e códigos longos demais não entram no protocolo nem no registro de eventos
+            if not nome_valido(nome_jogador) or not nome_valido(codigo_partida_recebido):
+                log.info("Cliente recusado: nome ou código da partida grande demais", evento="nome_invalido",
+                         endereco=endereco, limite=TAMANHO_MAXIMO_NOME)
+                try:
+                    conexao.enviar(quadro_texto(""), quadro_texto("nome_invalido"))
+                except:
+                    pass
                 cliente_socket.close()
                 return
             
-            # Resto do código permanece o mesmo
-            # ...
+            # Cria ou obtém a partida solicitada
+            codigo_partida, partida = self.criar_ou_obter_partida(codigo_partida_recebido, publica)
             
-            # A parte restante do método permanece inalterada
             # Adiciona o cliente à partida
             resultado = partida.adicionar_cliente(cliente_socket, nome_jogador)
             
             # Se o jogo já estiver em andamento, notifica o cliente e fecha a conexão
             if resultado == "jogo_em_andamento":
                 try:
-                    cliente_socket.send("jogo_em_andamento".encode('utf-8'))
-                    time.sleep(0.5)
+                    conexao.enviar(quadro_texto(codigo_partida), quadro_texto("jogo_em_andamento"))
                 except:
                     pass
                 cliente_socket.close()
                 return
             
-            # Envia confirmação de que o jogador pode entrar na partida
+            # Envia, de uma só vez, o código real da partida, a confirmação de entrada,
+            # as cartelas emitidas pelo servidor e os padrões que valem como bingo.
+            # A partir daqui os envios passam pela fila de saída do cliente na partida
             try:
-                cliente_socket.send("pode_entrar".encode('utf-8'))
-                time.sleep(0.5)
+                quadros = [quadro_texto(codigo_partida), quadro_texto("pode_entrar")]
+                quadros += [quadro_cartela(cartela) for cartela in partida.cartelas_do_jogador(cliente_socket)]
+                quadros.append(quadro_texto(f"PADROES:{partida.padroes.para_texto()}"))
+                partida.enviar_para(cliente_socket, *quadros)
             except:
-                print(f"Erro ao enviar confirmação para o cliente {nome_jogador}")
+                log.warning("Erro ao enviar confirmação", sala=codigo_partida, jogador=nome_jogador, evento="erro_envio")
                 partida.remover_cliente(cliente_socket)
                 return
             
-            # Aguarda confirmação "PRONTO" do cliente
+            # Atende pedidos de novas cartelas até a confirmação "PRONTO" do cliente
             try:
-                confirmacao = cliente_socket.recv(1024).decode('utf-8')
-                if confirmacao != 'PRONTO':
-                    print(f"Cliente {nome_jogador} enviou confirmação inválida: {confirmacao}")
+                while True:
+                    confirmacao = conexao.receber_texto()
+                    if confirmacao == 'COMPRAR_CARTELA':
+                        cartela = partida.adicionar_cartela(cliente_socket)
+                        if cartela:
+                            partida.enviar_para(cliente_socket, quadro_cartela(cartela))
+                        else:
+                            partida.enviar_para(cliente_socket, quadro_texto('LIMITE_CARTELAS'))
+                        continue
+                    if confirmacao != 'PRONTO':
+                        log.warning("Confirmação inválida", sala=codigo_partida, jogador=nome_jogador, evento="confirmacao_invalida", confirmacao=confirmacao)
+                    break
             except:
-                print(f"Erro ao receber confirmação do cliente {nome_jogador}")
+                log.warning("Erro ao receber confirmação", sala=codigo_partida, jogador=nome_jogador, evento="erro_recebimento")
                 partida.remover_cliente(cliente_socket)
                 return
             
             # Inicia o temporizador se atingiu o mínimo de jogadores
             if resultado == "iniciar_temporizador":
-                threading.Thread(target=self.iniciar_temporizador, args=(partida,)).start()
+                self.iniciar_temporizador(partida)
             
             # Inicia o jogo se atingiu o número máximo de jogadores
             elif resultado is True:
@@ -271,7 +427,7 @@ class ServidorBingo:
             # Loop para receber mensagens do cliente durante o jogo
             while not partida.partida_encerrada:
                 try:
-                    mensagem = cliente_socket.recv(1024).decode('utf-8')
+                    mensagem = conexao.receber_texto()
                     if not mensagem:  # Cliente desconectou
                         resultado = partida.remover_cliente(cliente_socket)
                         if resultado == "partida_cancelada":
@@ -279,13 +435,13 @@ class ServidorBingo:
                         break
                     
                     if mensagem == 'BINGO':
-                        print(f"\nCliente {nome_jogador} informou BINGO!")
+                        log.info("Pedido de bingo", sala=codigo_partida, jogador=nome_jogador, evento="pedido_bingo")
                         if partida.verificar_bingo(cliente_socket):
                             # Remover a partida do dicionário quando terminar
                             self.remover_partida(codigo_partida, "Finalizada: jogador fez bingo")
                             break
                 except Exception as e:
-                    print(f"Erro ao receber mensagem do cliente {nome_jogador}: {e}")
+                    log.warning("Erro ao receber mensagem", sala=codigo_partida, jogador=nome_jogador, evento="erro_recebimento", erro=e)
                     if not partida.partida_encerrada:
                         resultado = partida.remover_cliente(cliente_socket)
                         if resultado == "partida_cancelada":
@@ -296,8 +452,8 @@ class ServidorBingo:
             if codigo_partida and partida and partida.partida_encerrada:
                 self.remover_partida(codigo_partida, "Partida encerrada")
 
-        except Exception as e:
-            print(f"Erro ao gerenciar cliente {endereco}: {e}")
+        except Exception:
+            log.exception("Erro ao gerenciar cliente", sala=codigo_partida, evento="erro_cliente", endereco=endereco)
             # Se tiver uma partida associada, tenta remover o cliente
             if partida and cliente_socket:
                 resultado = partida.remover_cliente(cliente_socket)
@@ -313,12 +469,12 @@ class ServidorBingo:
         """
         Aguarda conexões dos clientes
         """
-        print("\nAguardando conexões de clientes...")
+        log.info("Aguardando conexões de clientes", evento="aguardando_conexoes")
         
         while self.aceitando_conexoes:
             try:
                 cliente_socket, endereco = self.servidor.accept()
-                print(f"\nNova conexão de: {endereco}")
+                log.debug("Nova conexão", evento="conexao", endereco=endereco)
                 
                 # Inicia thread para gerenciar cada cliente
                 threading.Thread(target=self.gerenciar_cliente, 
@@ -326,39 +482,60 @@ class ServidorBingo:
             
             except Exception as e:
                 if self.aceitando_conexoes:
-                    print(f"Erro ao aceitar conexão: {e}")
+                    log.warning("Erro ao aceitar conexão", evento="erro_conexao", erro=e)
                     time.sleep(1)
     
     def iniciar_temporizador(self, partida):
         """
-        Inicia o temporizador para a partida e depois inicia o jogo
+        Inicia o temporizador para a partida; cada segundo da espera é um evento do agendador
+        """
+        with partida.lock:
+            # Já existe uma contagem em andamento para esta partida
+            if partida.sorteio_iniciado or partida.tarefa_temporizador is not None:
+                return
+            partida.fim_contagem = self.relogio.agora() + partida.tempo_espera
+            partida.tarefa_temporizador = self.agendador.agendar(0, self.passo_temporizador, partida, partida.tempo_espera)
+        partida.notificar_mudanca()
+    
+    def passo_temporizador(self, partida, tempo_restante):
+        """
+        Um segundo da contagem de espera; inicia o jogo ao final
         """
         codigo_partida = partida.codigo_partida
-        tempo_restante = partida.tempo_espera
+        if partida.sorteio_iniciado or partida.partida_encerrada:
+            partida.tarefa_temporizador = None
+            partida.fim_contagem = None
+            return
         
-        while tempo_restante > 0 and not partida.sorteio_iniciado:
-            if tempo_restante % 5 == 0 or tempo_restante <= 3:  # Mostra a cada 5 segundos e nos últimos 3
-                print(f"\nPartida {codigo_partida}: Aguardando mais jogadores... {tempo_restante}s restantes")
-            
-            time.sleep(1)
-            tempo_restante -= 1
-            
+        # Verificações feitas após cada segundo de espera
+        if tempo_restante < partida.tempo_espera:
             # Verifica se já atingiu o máximo de jogadores durante a espera
             if len(partida.clientes_prontos) >= partida.max_clientes:
-                print(f"\nPartida {codigo_partida}: Número máximo de jogadores atingido durante a espera")
-                break
+                log.info("Máximo de jogadores atingido durante a espera", sala=codigo_partida, evento="sala_cheia")
+                tempo_restante = 0
             
             # Verifica se ainda tem jogadores suficientes
-            if len(partida.clientes_prontos) < partida.min_clientes:
-                print(f"\nPartida {codigo_partida}: Jogadores insuficientes durante a espera, reiniciando temporizador")
+            elif len(partida.clientes_prontos) < partida.min_clientes:
+                log.info("Jogadores insuficientes durante a espera, reiniciando temporizador", sala=codigo_partida, evento="contagem_interrompida")
+                partida.tarefa_temporizador = None
+                partida.fim_contagem = None
+                partida.notificar_mudanca()
                 return  # Sai sem iniciar o jogo
         
+        if tempo_restante > 0:
+            log.info("Aguardando mais jogadores", sala=codigo_partida, evento="contagem", restantes=tempo_restante)
+            partida.tarefa_temporizador = self.agendador.agendar(1, self.passo_temporizador, partida, tempo_restante - 1)
+            return
+        
+        partida.tarefa_temporizador = None
+        partida.fim_contagem = None
+        
         # Inicia o jogo se não foi iniciado ainda e tem jogadores suficientes
-        if not partida.sorteio_iniciado and len(partida.clientes_prontos) >= partida.min_clientes:
-            print(f"\nPartida {codigo_partida}: Temporizador concluído. Iniciando jogo com {len(partida.clientes_prontos)} jogadores")
+        if len(partida.clientes_prontos) >= partida.min_clientes:
+            log.info("Temporizador concluído, iniciando o jogo", sala=codigo_partida, evento="fim_contagem", jogadores=len(partida.clientes_prontos))
             partida.iniciar_jogo()
-        elif not partida.sorteio_iniciado:
-            print(f"\nPartida {codigo_partida}: Não há jogadores suficientes após o temporizador. Cancelando partida.")
+        else:
+            log.info("Jogadores insuficientes após o temporizador, cancelando a partida", sala=codigo_partida, evento="cancelada")
             partida.finalizar_jogo('JOGO_CANCELADO')
             # Remove a partida do dicionário
             self.remover_partida(codigo_partida, "Cancelada: jogadores insuficientes após temporizador")
@@ -367,7 +544,7 @@ class ServidorBingo:
         """
         Encerra o servidor e todas as partidas ativas
         """
-        print("\nEncerrando o servidor...")
+        log.info("Encerrando o servidor", evento="encerramento")
         self.aceitando_conexoes = False
         
         # Finaliza todas as partidas ativas
@@ -375,32 +552,61 @@ class ServidorBingo:
             for codigo, partida in list(self.partidas.items()):
                 try:
                     partida.finalizar_jogo('SERVIDOR_ENCERRADO')
-                except Exception as e:
-                    print(f"Erro ao finalizar partida {codigo}: {e}")
+                except Exception:
+                    log.exception("Erro ao finalizar partida", sala=codigo, evento="erro_encerramento")
             self.partidas.clear()
         
+        # Para a thread do agendador e o servidor de métricas
+        self.agendador.encerrar()
+        if self.servidor_metricas:
+            self.servidor_metricas.shutdown()
+        
+        # Grava os eventos pendentes do registro
+        if self.registro:
+            self.registro.fechar()
+        
         # Fecha o socket do servidor
         try:
             self.servidor.close()
         except Exception as e:
-            print(f"Erro ao fechar socket do servidor: {e}")
+            log.warning("Erro ao fechar socket do servidor", evento="erro_encerramento", erro=e)
 
 def main():
+    configurar_logs()
+    
+    # --async usa o servidor asyncio (uma única thread para todas as conexões)
+    modo_async = '--async' in sys.argv
+    argumentos = [sys.argv[0]] + [arg for arg in sys.argv[1:] if arg != '--async']
+    
     # Verifica se o IP e porta foram fornecidos como argumentos
-    host = sys.argv[1] if len(sys.argv) > 1 else '0.0.0.0'
-    porta = int(sys.argv[2]) if len(sys.argv) > 2 else 12345
-    min_clientes = int(sys.argv[3]) if len(sys.argv) > 3 else 2
-    max_clientes = int(sys.argv[4]) if len(sys.argv) > 4 else 10
-    tempo_espera = int(sys.argv[5]) if len(sys.argv) > 5 else 10
+    host = argumentos[1] if len(argumentos) > 1 else '0.0.0.0'
+    porta = int(argumentos[2]) if len(argumentos) > 2 else 12345
+    min_clientes = int(argumentos[3]) if len(argumentos) > 3 else 2
+    max_clientes = int(argumentos[4]) if len(argumentos) > 4 else 10
+    tempo_espera = int(argumentos[5]) if len(argumentos) > 5 else 10
+    padroes = argumentos[6].split(',') if len(argumentos) > 6 else None
+    
+    if modo_async:
+        from servidor_async import ServidorBingoAsync
+        classe_servidor = ServidorBingoAsync
+    else:
+        classe_servidor = ServidorBingo
+    
+    servidor = classe_servidor(host=host, porta=porta, 
+                               min_clientes=min_clientes,
+                               max_clientes=max_clientes, 
+                               tempo_espera=tempo_espera,
+                               padroes=padroes,
+                               registro=RegistroEventos.do_ambiente())
     
-    servidor = ServidorBingo(host=host, porta=porta, 
-                           min_clientes=min_clientes,
-                           max_clientes=max_clientes, 
-                           tempo_espera=tempo_espera)
+    # BINGO_PORTA_METRICAS liga o endpoint /metrics do servidor nessa porta
+    porta_metricas = os.environ.get('BINGO_PORTA_METRICAS')
+    if porta_metricas:
+        servidor.iniciar_metricas(int(porta_metricas))
     try:
         servidor.aguardar_conexoes()
     except KeyboardInterrupt:
-        print("\nEncerrando o servidor por interrupção do teclado...")
+        log.info("Encerrando o servidor por interrupção do teclado", evento="interrupcao")
     finally:
         servidor.encerrar_servidor()
 
@@ -0,0 +1,292 @@
+import asyncio
+import contextlib
+from partida import PartidaBingo
+from servidor import ServidorBingo
+from difusao import DifusorAsync
+from protocolo import handshake_servidor_async, quadro_texto, quadro_cartela, nome_valido, TAMANHO_MAXIMO_NOME
+from logs import obter_logger
+
+log = obter_logger(__name__)
+
+class PartidaBingoAsync(PartidaBingo):
+    """
+    Partida do servidor asyncio: os clientes são StreamWriters e o sorteio
+    roda como uma tarefa no loop de eventos, em vez de uma thread
+
+    Entradas, saídas, pedidos de bingo e o fim da partida são os de PartidaBingo;
+    só os ganchos de lock, difusão e tarefas mudam.
+    """
+    def criar_lock(self):
+        """
+        Tudo roda no loop de eventos: a partida não precisa de lock
+        """
+        return contextlib.nullcontext()
+
+    def criar_difusor(self):
+        return DifusorAsync()
+
+    def agendar_sorteio(self):
+        """
+        Encerra a contagem de espera e inicia a tarefa de sorteio
+        """
+        self.cancelar_tarefa(self.tarefa_temporizador)
+        self.tarefa_sorteio = asyncio.get_running_loop().create_task(self.iniciar_sorteio())
+
+    async def iniciar_sorteio(self):
+        """
+        Sorteia um número a cada tempo_para_sorteio segundos
+        """
+        # A pausa é cancelada por finalizar_jogo, sem necessidade de checagens periódicas
+        while self.sortear_proximo():
+            await self.agendador.relogio.dormir_async(self.tempo_para_sorteio)
+
+    def cancelar_tarefas(self):
+        """
+        Cancela as tarefas de sorteio e de contagem de espera
+        """
+        self.cancelar_tarefa(self.tarefa_sorteio)
+        self.cancelar_tarefa(self.tarefa_temporizador)
+
+    @staticmethod
+    def cancelar_tarefa(tarefa):
+        # A tarefa que está finalizando a partida (ou iniciando o sorteio) termina sozinha;
+        # fora do loop de eventos não há tarefa atual
+        try:
+            atual = asyncio.current_task()
+        except RuntimeError:
+            atual = None
+        if tarefa is not None and tarefa is not atual:
+            tarefa.cancel()
+
+class ServidorBingoAsync(ServidorBingo):
+    """
+    Servidor de Bingo em asyncio: handshake, partidas, temporizadores e
+    envios rodam como corrotinas em um único loop de eventos
+    """
+    classe_partida = PartidaBingoAsync
+
+    def criar_socket_servidor(self):
+        """
+        O socket é criado por asyncio.start_server em aguardar_conexoes
+        """
+        return None
+
+    async def gerenciar_cliente(self, leitor, escritor):
+        """
+        Gerencia a conexão com cada cliente
+        """
+        endereco = escritor.get_extra_info('peername')
+        codigo_partida = None
+        partida = None
+        log.debug("Nova conexão", evento="conexao", endereco=endereco)
+
+        try:
+            # Handshake de versão do protocolo
+            conexao = await handshake_servidor_async(leitor, escritor)
+            if conexao is None:
+                log.info("Cliente recusado: versão de protocolo incompatível", evento="handshake_recusado", endereco=endereco)
+                escritor.close()
+                return
+
+            # Recebe o nome do jogador
+            nome_jogador = await conexao.receber_texto()
+            if not nome_jogador:
+                log.info("Cliente desconectou sem informar nome", evento="desconexao", endereco=endereco)
+                escritor.close()
+                return
+
+            # Verifica se o cliente solicitou a lista de partidas públicas; páginas
+            # seguintes podem ser pedidas na mesma conexão
+            while nome_jogador == "LISTAR_PARTIDAS" or nome_jogador.startswith("LISTAR_PARTIDAS:"):
+                conexao.enviar_texto(self.responder_consulta_lobby(nome_jogador))
+                nome_jogador = await conexao.receber_texto()
+                if not nome_jogador or nome_jogador == "SAIR":
+                    escritor.close()
+                    return
+            # Verifica se o cliente solicitou verificar uma partida específica
+            if nome_jogador.startswith("VERIFICAR_PARTIDA:"):
+                codigo = nome_jogador.split(":", 1)[1]
+                conexao.enviar_texto("PARTIDA_EXISTE" if self.verificar_partida_existe(codigo) else "PARTIDA_NAO_EXISTE")
+                escritor.close()
+                return
+
+            # Recebe o código da partida e informação sobre pública/privada
+            codigo_partida_info = await conexao.receber_texto()
+            if not codigo_partida_info:
+                log.info("Cliente desconectou sem informar código da partida", evento="desconexao", endereco=endereco, jogador=nome_jogador)
+                escritor.close()
+                return
+
+            info_partida = codigo_partida_info.split(':')
+            publica = True  # padrão é público
+            if len(info_partida) > 1:
+                try:
+                    publica = int(info_partida[1]) == 0  # 0 = pública, 1 = privada
+                except ValueError:
+                    publica = True
+                codigo_partida_recebido = info_partida[0]
+            else:
+                codigo_partida_recebido = codigo_partida_info
+
+            # Nomes e códigos longos demais não entram no protocolo nem no registro de eventos
+            if not nome_valido(nome_jogador) or not nome_valido(codigo_partida_recebido):
+                log.info("Cliente recusado: nome ou código da partida grande demais", evento="nome_invalido",
+                         endereco=endereco, limite=TAMANHO_MAXIMO_NOME)
+                conexao.enviar(quadro_texto(""), quadro_texto("nome_invalido"))
+                escritor.close()
+                return
+
+            codigo_partida, partida = self.criar_ou_obter_partida(codigo_partida_recebido, publica)
+
+            # Adiciona o cliente à partida
+            resultado = partida.adicionar_cliente(escritor, nome_jogador)
+
+            if resultado == "jogo_em_andamento":
+                conexao.enviar(quadro_texto(codigo_partida), quadro_texto("jogo_em_andamento"))
+                escritor.close()
+                return
+
+            # Envia código, confirmação, cartelas e padrões de uma só vez
+            quadros = [quadro_texto(codigo_partida), quadro_texto("pode_entrar")]
+            quadros += [quadro_cartela(cartela) for cartela in partida.cartelas_do_jogador(escritor)]
+            quadros.append(quadro_texto(f"PADROES:{partida.padroes.para_texto()}"))
+            partida.enviar_para(escritor, *quadros)
+
+            # Atende pedidos de novas cartelas até a confirmação "PRONTO" do cliente
+            while True:
+                confirmacao = await conexao.receber_texto()
+                if confirmacao is None:
+                    partida.remover_cliente(escritor)
+                    return
+                if confirmacao == 'COMPRAR_CARTELA':
+                    cartela = partida.adicionar_cartela(escritor)
+                    if cartela:
+                        partida.enviar_para(escritor, quadro_cartela(cartela))
+                    else:
+                        partida.enviar_para(escritor, quadro_texto('LIMITE_CARTELAS'))
+                    continue
+                if confirmacao != 'PRONTO':
+                    log.warning("Confirmação inválida", sala=codigo_partida, jogador=nome_jogador, evento="confirmacao_invalida", confirmacao=confirmacao)
+                break
+
+            # Inicia o temporizador se atingiu o mínimo de jogadores
+            if resultado == "iniciar_temporizador":
+                self.iniciar_temporizador(partida)
+
+            # Inicia o jogo se atingiu o número máximo de jogadores
+            elif resultado is True:
+                partida.iniciar_jogo()
+
+            # Loop para receber mensagens do cliente durante o jogo
+            while not partida.partida_encerrada:
+                mensagem = await conexao.receber_texto()
+                if not mensagem:  # Cliente desconectou
+                    if partida.remover_cliente(escritor) == "partida_cancelada":
+                        self.remover_partida(codigo_partida, "Cancelada: jogadores insuficientes")
+                    break
+
+                if mensagem == 'BINGO':
+                    log.info("Pedido de bingo", sala=codigo_partida, jogador=nome_jogador, evento="pedido_bingo")
+                    if partida.verificar_bingo(escritor):
+                        self.remover_partida(codigo_partida, "Finalizada: jogador fez bingo")
+                        break
+
+            if codigo_partida and partida and partida.partida_encerrada:
+                self.remover_partida(codigo_partida, "Partida encerrada")
+
+        except Exception:
+            log.exception("Erro ao gerenciar cliente", sala=codigo_partida, evento="erro_cliente", endereco=endereco)
+            if partida and not partida.partida_encerrada:
+                if partida.remover_cliente(escritor) == "partida_cancelada" and codigo_partida:
+                    self.remover_partida(codigo_partida, "Cancelada após erro no gerenciamento")
+            escritor.close()
+
+    def iniciar_temporizador(self, partida):
+        """
+        Inicia a contagem de espera da partida como uma tarefa, guardada para ser cancelada
+        """
+        # Uma contagem já em andamento para esta partida segue sozinha
+        if partida.fim_contagem is not None:
+            return
+        partida.fim_contagem = self.relogio.agora() + partida.tempo_espera
+        partida.notificar_mudanca()
+        partida.tarefa_temporizador = asyncio.get_running_loop().create_task(self.contar_espera(partida))
+
+    async def contar_espera(self, partida):
+        """
+        Conta o tempo de espera e depois inicia o jogo
+        """
+        codigo_partida = partida.codigo_partida
+        tempo_restante = partida.tempo_espera
+
+        while tempo_restante > 0 and not partida.sorteio_iniciado:
+            log.info("Aguardando mais jogadores", sala=codigo_partida, evento="contagem", restantes=tempo_restante)
+
+            await self.relogio.dormir_async(1)
+            tempo_restante -= 1
+
+            if len(partida.clientes_prontos) >= partida.max_clientes:
+                log.info("Máximo de jogadores atingido durante a espera", sala=codigo_partida, evento="sala_cheia")
+                break
+
+            if len(partida.clientes_prontos) < partida.min_clientes:
+                log.info("Jogadores insuficientes durante a espera, reiniciando temporizador", sala=codigo_partida, evento="contagem_interrompida")
+                partida.fim_contagem = None
+                partida.notificar_mudanca()
+                return
+
+        partida.fim_contagem = None
+        if not partida.sorteio_iniciado and len(partida.clientes_prontos) >= partida.min_clientes:
+            log.info("Temporizador concluído, iniciando o jogo", sala=codigo_partida, evento="fim_contagem", jogadores=len(partida.clientes_prontos))
+            partida.iniciar_jogo()
+        elif not partida.sorteio_iniciado:
+            log.info("Jogadores insuficientes após o temporizador, cancelando a partida", sala=codigo_partida, evento="cancelada")
+            partida.finalizar_jogo('JOGO_CANCELADO')
+            self.remover_partida(codigo_partida, "Cancelada: jogadores insuficientes após temporizador")
+
+    async def servir(self):
+        """
+        Aceita conexões até o servidor ser encerrado
+        """
+        self.servidor = await asyncio.start_server(self.gerenciar_cliente, self.host, self.porta,
+                                                   reuse_address=True, backlog=1024)
+        log.info("Aguardando conexões de clientes (modo asyncio)", evento="aguardando_conexoes")
+        try:
+            async with self.servidor:
+                await self.servidor.serve_forever()
+        finally:
+            # Finaliza as partidas enquanto o loop ainda está ativo
+            self.finalizar_partidas()
+
+    def aguardar_conexoes(self):
+        """
+        Roda o loop de eventos do servidor
+        """
+        asyncio.run(self.servir())
+
+    def finalizar_partidas(self):
+        """
+        Finaliza todas as partidas ativas
+        """
+        with self.lock_partidas:
+            for codigo, partida in list(self.partidas.items()):
+                try:
+                    partida.finalizar_jogo('SERVIDOR_ENCERRADO')
+                except Exception:
+                    log.exception("Erro ao finalizar partida", sala=codigo, evento="erro_encerramento")
+            self.partidas.clear()
+
+    def encerrar_servidor(self):
+        """
+        Encerra o servidor; as partidas são finalizadas ao sair do loop de eventos
+        """
+        log.info("Encerrando o servidor", evento="encerramento")
+        self.aceitando_conexoes = False
+        self.finalizar_partidas()
+
+        if self.servidor_metricas:
+            self.servidor_metricas.shutdown()
+
+        # Grava os eventos pendentes do registro
+        if self.registro:
+            self.registro.fechar()
@@ -0,0 +1,238 @@
+"""
+Simulação acelerada de partidas do ServidorBingo com relógio virtual
+
+Usado por `python -m bingo_load virtual`. As partidas, a contagem de espera e
+os sorteios são os do servidor real; só o relógio (RelogioVirtual) e a entrega
+dos quadros (direto aos jogadores simulados, sem sockets) mudam. O agendador
+roda sem thread e salta de evento em evento, sem nenhuma espera real.
+
+O custo é o do próprio servidor: cerca de 0,1 ms para cada jogador que entra
+(emissão e indexação da cartela) e 20 a 30 µs por sorteio (lock, marcação pelo
+índice, agendamento e difusão). Os jogadores não marcam cópias das cartelas:
+o índice do servidor avisa quem completou um padrão. Em um núcleo, são cerca
+de 550 a 600 partidas por segundo com 10 jogadores e 700 com 4 (dezenas de
+milhares de vezes o tempo real). As partidas são divididas entre processos
+independentes (padrão: um por núcleo), e a taxa total é a soma da de cada um:
+milhares de partidas por segundo a partir de 4 núcleos.
+"""
+import contextlib
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from agendador import Agendador
+from relogio import RelogioVirtual
+from registro_eventos import RegistroEventos
+from partida import PartidaBingo
+from servidor import ServidorBingo
+from protocolo import CABECALHO, TIPO_NUMERO, TIPO_TEXTO
+from bingo_load import formatar_percentis
+from logs import configurar_logs
+
+# Mensagens que encerram a partida para o jogador
+MENSAGENS_FINAIS = ('BINGO_VENCEDOR', 'JOGO_CANCELADO', 'FIM_JOGO', 'TODOS_DESCONECTADOS', 'SERVIDOR_ENCERRADO')
+
+class DifusorSimulado:
+    """
+    Difusor sem sockets nem threads: entrega cada quadro direto ao jogador simulado
+    """
+    def __init__(self, partida):
+        self.partida = partida
+        self.jogadores = {}
+        self.quadros = 0
+
+    def registrar(self, jogador):
+        self.jogadores[jogador] = jogador
+
+    def remover(self, jogador):
+        self.jogadores.pop(jogador, None)
+
+    def enviar(self, jogador, *quadros):
+        if jogador in self.jogadores:
+            for quadro in quadros:
+                self.quadros += 1
+                jogador.receber(quadro)
+        return True
+
+    def enviar_para_todos(self, quadro):
+        # Um número sorteado só interessa aos jogadores que completaram um padrão,
+        # que o índice do servidor já conhece
+        if quadro[0] == TIPO_NUMERO:
+            self.quadros += len(self.jogadores)
+            for jogador in self.partida.cartelas_completas:
+                jogador.completou_padrao()
+            return
+        for jogador in list(self.jogadores):
+            self.quadros += 1
+            jogador.receber(quadro)
+
+    def fechar_todos(self):
+        self.jogadores.clear()
+
+class PartidaSimulada(PartidaBingo):
+    def criar_difusor(self):
+        return DifusorSimulado(self)
+
+class ServidorSimulado(ServidorBingo):
+    """
+    ServidorBingo sem socket de escuta; as partidas entregam os quadros aos jogadores simulados
+    """
+    classe_partida = PartidaSimulada
+
+    def criar_socket_servidor(self):
+        return None
+
+class JogadorSimulado:
+    """
+    Jogador em processo: pede BINGO tempo_reacao depois de completar um padrão
+
+    Em vez de marcar cópias das cartelas, como o cliente real, o jogador é avisado
+    pelo difusor a partir do índice do servidor (cartelas_completas); o pedido
+    passa pela mesma verificação de um pedido pela rede.
+    """
+    def __init__(self, nome, simulacao, partida):
+        self.nome = nome
+        self.simulacao = simulacao
+        self.partida = partida
+        self.bingo_enviado = False
+
+    def completou_padrao(self):
+        if not self.bingo_enviado:
+            self.bingo_enviado = True
+            self.simulacao.agendador.agendar(self.simulacao.tempo_reacao, self.gritar_bingo)
+
+    def receber(self, quadro):
+        tipo = quadro[0]
+        conteudo = quadro[CABECALHO.size:]
+        if tipo == TIPO_TEXTO:
+            texto = conteudo.decode('utf-8')
+            if texto.startswith(MENSAGENS_FINAIS):
+                self.simulacao.registrar_fim(self.partida, texto)
+
+    def gritar_bingo(self):
+        if self.partida.verificar_bingo(self):
+            self.simulacao.servidor.remover_partida(self.partida.codigo_partida, "Finalizada: jogador fez bingo")
+
+class Simulacao:
+    def __init__(self, partidas, jogadores, padroes, tempo_espera=10, tempo_sorteio=3, tempo_reacao=0.5,
+                 max_jogadores=None, lote=1000, registro=None, primeira=0):
+        self.total_partidas = partidas
+        self.jogadores_por_partida = jogadores
+        self.tempo_sorteio = tempo_sorteio
+        self.tempo_reacao = tempo_reacao
+        self.lote = lote
+
+        self.relogio = RelogioVirtual()
+        self.agendador = Agendador(self.relogio, thread=False)
+        self.servidor = ServidorSimulado(min_clientes=2, max_clientes=max_jogadores or jogadores + 1,
+                                         tempo_espera=tempo_espera, padroes=padroes, agendador=self.agendador,
+                                         registro=registro)
+
+        # Instante virtual de criação de cada partida e o resultado de cada uma
+        self.inicios = {}
+        self.resultados = {}
+        self.quadros = 0
+        self.eventos = 0
+
+        # Índice da primeira partida: os processos simulam faixas diferentes de códigos
+        self.primeira = primeira
+
+    def criar_partida(self, indice):
+        codigo, partida = self.servidor.criar_ou_obter_partida(f"sim_{indice}")
+        partida.tempo_para_sorteio = self.tempo_sorteio
+        self.inicios[codigo] = self.relogio.agora()
+
+        # Mesma sequência de gerenciar_cliente após o PRONTO de cada jogador
+        for numero in range(self.jogadores_por_partida):
+            jogador = JogadorSimulado(f"{codigo}_j{numero}", self, partida)
+            resultado = partida.adicionar_cliente(jogador, jogador.nome)
+            if resultado == "iniciar_temporizador":
+                self.servidor.iniciar_temporizador(partida)
+            elif resultado is True:
+                partida.iniciar_jogo()
+
+    def registrar_fim(self, partida, texto):
+        codigo = partida.codigo_partida
+        if codigo in self.resultados:
+            return
+        self.resultados[codigo] = (texto.split(':', 1)[0], len(partida.numeros_sorteados),
+                                   self.relogio.agora() - self.inicios[codigo])
+        self.quadros += partida.difusor.quadros
+
+    def executar(self):
+        """
+        Roda todas as partidas em lotes, cada lote até a última partida terminar
+
+        :return: Duração real em segundos
+        """
+        inicio = time.perf_counter()
+        ultima = self.primeira + self.total_partidas
+        for primeiro in range(self.primeira, ultima, self.lote):
+            for indice in range(primeiro, min(primeiro + self.lote, ultima)):
+                self.criar_partida(indice)
+            self.eventos += self.agendador.executar_pendentes()
+        return time.perf_counter() - inicio
+
+def simular(primeira, partidas, jogadores, padroes, tempo_espera, tempo_sorteio, tempo_reacao, max_jogadores,
+            lote, caminho_registro, log_servidor):
+    """
+    Roda, em um processo, as partidas de índice primeira a primeira + partidas - 1
+
+    :return: (resultados, eventos do agendador, quadros entregues); cada resultado
+             é (motivo do fim, sorteios, tempo virtual)
+    """
+    # Os logs do servidor e das partidas só são ligados com --log-servidor
+    if log_servidor:
+        configurar_logs()
+    with contextlib.ExitStack() as pilha:
+
+        # Instantes do registro no relógio virtual, para que a reprodução mostre a linha do tempo simulada
+        # ('{pid}' no caminho dá um arquivo a cada processo)
+        registro = None
+        if caminho_registro:
+            registro = RegistroEventos(caminho_registro.replace('{pid}', str(os.getpid())))
+            pilha.callback(registro.fechar)
+
+        simulacao = Simulacao(partidas, jogadores, padroes, tempo_espera, tempo_sorteio, tempo_reacao,
+                              max_jogadores, lote, registro, primeira)
+        if registro:
+            registro.relogio = simulacao.relogio.agora
+        simulacao.executar()
+    return list(simulacao.resultados.values()), simulacao.eventos, simulacao.quadros
+
+def relatorio(partes, partidas, jogadores, processos, duracao):
+    resultados = [resultado for parte in partes for resultado in parte[0]]
+    print("\n=== Simulação com relógio virtual ===")
+    print(f"Partidas: {partidas} com {jogadores} jogadores em {processos} processo(s) | "
+          f"duração real: {duracao:.2f}s ({partidas / duracao:.0f} partidas/s)")
+    tempos = [virtual for _, _, virtual in resultados]
+    print(f"Tempo virtual simulado: {sum(tempos):.0f}s ({sum(tempos) / duracao:.0f}x o tempo real) | "
+          f"por partida: {formatar_percentis(tempos, unidade=1, sufixo='s')}")
+    print(f"Sorteios por partida: {formatar_percentis([sorteios for _, sorteios, _ in resultados], unidade=1, sufixo='')}")
+    print(f"Resultados: {dict(Counter(motivo for motivo, _, _ in resultados))}")
+    print(f"Eventos do agendador: {sum(parte[1] for parte in partes)} | "
+          f"quadros entregues: {sum(parte[2] for parte in partes)}")
+    if len(resultados) < partidas:
+        print(f"Partidas sem resultado: {partidas - len(resultados)}")
+
+def executar(argumentos):
+    """
+    Divide as partidas entre os processos (padrão: um por núcleo) e junta os resultados
+    """
+    processos = min(argumentos.processos or os.cpu_count() or 1, argumentos.partidas)
+    if argumentos.registro and processos > 1 and '{pid}' not in argumentos.registro:
+        raise SystemExit("Com mais de um processo, use {pid} no caminho de --registro (um arquivo por processo)")
+    divisao = [argumentos.partidas // processos + (1 if indice < argumentos.partidas % processos else 0)
+               for indice in range(processos)]
+    primeiras = [sum(divisao[:indice]) for indice in range(processos)]
+    parametros = (argumentos.jogadores, argumentos.padroes.split(","), argumentos.tempo_espera,
+                  argumentos.tempo_sorteio, argumentos.tempo_reacao, argumentos.max_jogadores, argumentos.lote,
+                  argumentos.registro, argumentos.log_servidor)
+
+    inicio = time.perf_counter()
+    if processos == 1:
+        partes = [simular(0, argumentos.partidas, *parametros)]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            partes = list(executor.map(simular, primeiras, divisao, *[[parametro] * processos for parametro in parametros]))
+    relatorio(partes, argumentos.partidas, argumentos.jogadores, processos, time.perf_counter() - inicio)